@@ -112,7 +112,7 @@ class UniverseApplication( object, config.ConfiguresGalaxyMixin ):
             permitted_actions=self.security_agent.permitted_actions )
         # Load quota management.
         if self.config.enable_quotas:
-            self.quota_agent = galaxy.quota.QuotaAgent( self.model )
+            self.quota_agent = galaxy.quota.QuotaAgent( self.model, cache_ttl=self.config.quota_cache_ttl )
         else:
             self.quota_agent = galaxy.quota.NoQuotaAgent( self.model )
         # Heartbeat for thread profiling
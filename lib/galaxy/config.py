@@ -16,6 +16,7 @@ import tempfile
 from datetime import timedelta
 from galaxy import eggs
 from galaxy.exceptions import ConfigurationError
+from galaxy.util import ExecutionTimer
 from galaxy.util import listify
 from galaxy.util import string_as_bool
 from galaxy.util.dbkeys import GenomeBuilds
@@ -83,6 +84,7 @@ class Configuration( object ):
         # Galaxy OpenID settings
         self.enable_openid = string_as_bool( kwargs.get( 'enable_openid', False ) )
         self.enable_quotas = string_as_bool( kwargs.get( 'enable_quotas', False ) )
+        self.quota_cache_ttl = int( kwargs.get( 'quota_cache_ttl', 60 ) )
         self.enable_unique_workflow_defaults = string_as_bool( kwargs.get( 'enable_unique_workflow_defaults', False ) )
         self.tool_path = resolve_path( kwargs.get( "tool_path", "tools" ), self.root )
         self.tool_data_path = resolve_path( kwargs.get( "tool_data_path", "tool-data" ), os.getcwd() )
@@ -162,8 +164,22 @@ class Configuration( object ):
         self.collect_outputs_from = [ x.strip() for x in kwargs.get( 'collect_outputs_from', 'new_file_path,job_working_directory' ).lower().split(',') ]
         self.template_path = resolve_path( kwargs.get( "template_path", "templates" ), self.root )
         self.template_cache = resolve_path( kwargs.get( "template_cache_path", "database/compiled_templates" ), self.root )
+        self.tool_load_workers = int( kwargs.get( "tool_load_workers", "0" ) )
+        self.tool_search_index_dir = kwargs.get( "tool_search_index_dir", None )
+        if self.tool_search_index_dir:
+            self.tool_search_index_dir = resolve_path( self.tool_search_index_dir, self.root )
+        self.lazy_load_tools = string_as_bool( kwargs.get( "lazy_load_tools", "False" ) )
+        self.lazy_load_tools_cache_size = int( kwargs.get( "lazy_load_tools_cache_size", "200" ) )
+        self.tool_cache_data_dir = kwargs.get( "tool_cache_data_dir", None )
+        if self.tool_cache_data_dir:
+            self.tool_cache_data_dir = resolve_path( self.tool_cache_data_dir, self.root )
         self.local_job_queue_workers = int( kwargs.get( "local_job_queue_workers", "5" ) )
         self.cluster_job_queue_workers = int( kwargs.get( "cluster_job_queue_workers", "3" ) )
+        self.job_preparation_workers = int( kwargs.get( "job_preparation_workers", "0" ) )
+        self.job_preparation_queue_size = int( kwargs.get( "job_preparation_queue_size", "100" ) )
+        self.job_status_poll_max_interval = int( kwargs.get( "job_status_poll_max_interval", "0" ) )
+        self.job_finishing_workers = int( kwargs.get( "job_finishing_workers", "0" ) )
+        self.job_finishing_output_threads = int( kwargs.get( "job_finishing_output_threads", "1" ) )
         self.job_queue_cleanup_interval = int( kwargs.get("job_queue_cleanup_interval", "5") )
         self.cluster_files_directory = os.path.abspath( kwargs.get( "cluster_files_directory", "database/pbs" ) )
         self.job_working_directory = resolve_path( kwargs.get( "job_working_directory", "database/job_working_directory" ), self.root )
@@ -207,6 +223,9 @@ class Configuration( object ):
         self.smtp_password = kwargs.get( 'smtp_password', None )
         self.smtp_ssl = kwargs.get( 'smtp_ssl', None )
         self.track_jobs_in_database = kwargs.get( 'track_jobs_in_database', 'None' )
+        self.event_driven_job_readiness = string_as_bool( kwargs.get( 'event_driven_job_readiness', 'False' ) )
+        self.job_readiness_reconcile_interval = int( kwargs.get( 'job_readiness_reconcile_interval', 60 ) )
+        self.job_handler_max_jobs_per_iteration = int( kwargs.get( 'job_handler_max_jobs_per_iteration', 0 ) )
         self.start_job_runners = listify(kwargs.get( 'start_job_runners', '' ))
         self.expose_dataset_path = string_as_bool( kwargs.get( 'expose_dataset_path', 'False' ) )
         # External Service types used in sample tracking
@@ -236,6 +255,8 @@ class Configuration( object ):
 
         # Per-user Job concurrency limitations
         self.cache_user_job_count = string_as_bool( kwargs.get( 'cache_user_job_count', False ) )
+        self.track_running_job_counts = string_as_bool( kwargs.get( 'track_running_job_counts', False ) )
+        self.running_job_count_reconcile_interval = int( kwargs.get( 'running_job_count_reconcile_interval', 60 ) )
         self.user_job_limit = int( kwargs.get( 'user_job_limit', 0 ) )
         self.registered_user_job_limit = int( kwargs.get( 'registered_user_job_limit', self.user_job_limit ) )
         self.anonymous_user_job_limit = int( kwargs.get( 'anonymous_user_job_limit', self.user_job_limit ) )
@@ -762,7 +783,15 @@ class ConfiguresGalaxyMixin:
         # Call this when tools are added or removed.
         import galaxy.tools.search
         index_help = getattr( self.config, "index_tool_help", True )
-        self.toolbox_search = galaxy.tools.search.ToolBoxSearch( self.toolbox, index_help )
+        index_timer = ExecutionTimer()
+        toolbox_search = getattr( self, "toolbox_search", None )
+        if toolbox_search is not None and toolbox_search.toolbox is self.toolbox:
+            # Only (re)index the tools that changed.
+            toolbox_search.build_index( index_help )
+        else:
+            index_dir = getattr( self.config, "tool_search_index_dir", None )
+            self.toolbox_search = galaxy.tools.search.ToolBoxSearch( self.toolbox, index_help, index_dir=index_dir )
+        log.info( "Built the tool search index %s" % index_timer )
 
     def _configure_tool_data_tables( self, from_shed_config ):
         from galaxy.tools.data import ToolDataTableManager
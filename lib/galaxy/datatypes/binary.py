@@ -172,6 +172,8 @@ class Bam( Binary ):
     """Class describing a BAM binary file"""
     edam_format = "format_2572"
     file_ext = "bam"
+    # BGZF compressed
+    sniff_prefixes = ( '\x1f\x8b', )
     track_type = "ReadTrack"
     data_sources = { "data": "bai", "index": "bigwig" }
 
@@ -568,6 +570,7 @@ class Sff( Binary ):
     """ Standard Flowgram Format (SFF) """
     edam_format = "format_3284"
     file_ext = "sff"
+    sniff_prefixes = ( '.sff', )
 
     def __init__( self, **kwd ):
         Binary.__init__( self, **kwd )
@@ -659,6 +662,7 @@ class TwoBit (Binary):
     """Class describing a TwoBit format nucleotide file"""
     edam_format = "format_3009"
     file_ext = "twobit"
+    sniff_prefixes = ( struct.pack( ">L", TWOBIT_MAGIC_NUMBER ), struct.pack( ">L", TWOBIT_MAGIC_NUMBER_SWAP ) )
 
     def sniff(self, filename):
         try:
@@ -695,6 +699,7 @@ class SQlite ( Binary ):
     MetadataElement( name="table_columns", default={}, param=DictParameter, desc="Database Table Columns", readonly=True, visible=True, no_value={} )
     MetadataElement( name="table_row_count", default={}, param=DictParameter, desc="Database Table Row Count", readonly=True, visible=True, no_value={} )
     file_ext = "sqlite"
+    sniff_prefixes = ( 'SQLite format 3\0', )
 
     def init_meta( self, dataset, copy_from=None ):
         Binary.init_meta( self, dataset, copy_from=copy_from )
@@ -787,6 +792,7 @@ class GeminiSQLite( SQlite ):
     MetadataElement( name="gemini_version", default='0.10.0' , param=MetadataParameter, desc="Gemini Version",
                      readonly=True, visible=True, no_value='0.10.0' )
     file_ext = "gemini.sqlite"
+    sniff_prefixes = SQlite.sniff_prefixes
 
     def set_meta( self, dataset, overwrite = True, **kwd ):
         super( GeminiSQLite, self ).set_meta( dataset, overwrite = overwrite, **kwd )
@@ -859,6 +865,7 @@ Binary.register_sniffable_binary_format("xlsx", "xlsx", Xlsx)
 class Sra( Binary ):
     """ Sequence Read Archive (SRA) datatype originally from mdshw5/sra-tools-galaxy"""
     file_ext = 'sra'
+    sniff_prefixes = ( 'NCBI.sra', )
 
     def __init__( self, **kwd ):
         Binary.__init__( self, **kwd )
@@ -896,6 +903,8 @@ Binary.register_sniffable_binary_format('sra', 'sra', Sra)
 class RData( Binary ):
     """Generic R Data file datatype implementation"""
     file_ext = 'rdata'
+    # Uncompressed or gzip compressed
+    sniff_prefixes = ( 'RDX2\nX\n', '\x1f\x8b' )
 
     def __init__( self, **kwd ):
         Binary.__init__( self, **kwd )
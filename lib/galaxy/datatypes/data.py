@@ -10,6 +10,7 @@ from cgi import escape
 from inspect import isclass
 from galaxy import util
 from galaxy.datatypes.metadata import MetadataElement #import directly to maintain ease of use in Datatype class definitions
+from galaxy.datatypes.util import line_scanner
 from galaxy.util import inflector
 from galaxy.util.bunch import Bunch
 from galaxy.util.odict import odict
@@ -95,6 +96,10 @@ class Data( object ):
     primary_file_name = 'index'
     #A per datatype setting (inherited): max file size (in bytes) for setting optional metadata
     _max_optional_metadata_filesize = None
+    #Can set_meta be split into get_meta_chunk/set_meta_from_chunks (see can_set_meta_in_chunks)
+    chunked_set_meta = False
+    #Approximate size (in bytes) of the chunks the metadata of big datasets is set in
+    set_meta_chunk_size = 2 ** 27
 
     # Trackster track type.
     track_type = None
@@ -102,6 +107,11 @@ class Data( object ):
     # Data sources.
     data_sources = {}
 
+    # Strings files of this datatype always start with (e.g. magic numbers),
+    # if any. The sniff method is only called for files starting with one of
+    # them, they apply to the class defining sniff only.
+    sniff_prefixes = None
+
     def __init__(self, **kwd):
         """Initialize the datatype"""
         object.__init__(self, **kwd)
@@ -147,6 +157,34 @@ class Data( object ):
     def set_meta( self, dataset, overwrite = True, **kwd ):
         """Unimplemented method, allows guessing of metadata from contents of file"""
         return True
+    def can_set_meta_in_chunks( self, dataset ):
+        """
+        Can the metadata of dataset be set by computing it for byte ranges of
+        the dataset's file with get_meta_chunk (possibly in parallel) and
+        merging those with set_meta_from_chunks instead of calling set_meta?
+
+        Only if the class implementing set_meta has set chunked_set_meta, so
+        subclasses overriding set_meta don't inherit the chunked version, and
+        the dataset is bigger than set_meta_chunk_size.
+        """
+        for cls in type( self ).__mro__:
+            if 'set_meta' in cls.__dict__:
+                if not cls.__dict__.get( 'chunked_set_meta', False ):
+                    return False
+                break
+        return dataset.get_size() > self.set_meta_chunk_size
+    def get_meta_chunk( self, dataset, start=0, end=None, **kwd ):
+        """
+        Compute the partial metadata of the lines of dataset starting in the
+        byte range start to end, to be merged by set_meta_from_chunks.
+        """
+        raise NotImplementedError( "Datatype %s can't set metadata in chunks" % self.__class__.__name__ )
+    def set_meta_from_chunks( self, dataset, chunks, **kwd ):
+        """
+        Set the metadata of dataset from the partial metadata get_meta_chunk
+        computed for consecutive byte ranges covering the dataset.
+        """
+        raise NotImplementedError( "Datatype %s can't set metadata in chunks" % self.__class__.__name__ )
     def missing_meta( self, dataset, check = [], skip = [] ):
         """
         Checks for empty metadata values, Returns True if non-optional metadata is missing
@@ -679,11 +717,17 @@ class Text( Data ):
     def get_mime(self):
         """Returns the mime type of the datatype"""
         return 'text/plain'
+    chunked_set_meta = True
+
     def set_meta( self, dataset, **kwd ):
         """
         Set the number of lines of data in dataset.
         """
         dataset.metadata.data_lines = self.count_data_lines(dataset)
+    def get_meta_chunk( self, dataset, start=0, end=None, **kwd ):
+        return dict( data_lines=self.count_data_lines( dataset, start=start, end=end ) )
+    def set_meta_from_chunks( self, dataset, chunks, **kwd ):
+        dataset.metadata.data_lines = sum( chunk[ 'data_lines' ] for chunk in chunks )
     def estimate_file_lines( self, dataset ):
         """
         Perform a rough estimate by extrapolating number of lines from a small read.
@@ -695,16 +739,17 @@ class Text( Data ):
         sample_lines = dataset_read.count('\n')
         est_lines = int(sample_lines * (float(dataset.get_size()) / float(sample_size)))
         return est_lines
-    def count_data_lines(self, dataset):
+    def count_data_lines(self, dataset, start=0, end=None):
         """
-        Count the number of lines of data in dataset,
-        skipping all blank lines and comments.
+        Count the number of lines of data in dataset (starting in the byte
+        range start to end), skipping all blank lines and comments.
         """
         data_lines = 0
-        for line in file( dataset.file_name ):
-            line = line.strip()
-            if line and not line.startswith( '#' ):
-                data_lines += 1
+        for lines in line_scanner.read_line_blocks( dataset.file_name, start=start, end=end ):
+            for line in lines:
+                line = line.strip()
+                if line and not line.startswith( '#' ):
+                    data_lines += 1
         return data_lines
     def set_peek( self, dataset, line_count=None, is_multi_byte=False, WIDTH=256, skipchars=[] ):
         """
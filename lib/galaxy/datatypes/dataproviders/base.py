@@ -8,6 +8,7 @@ Base class(es) for all DataProviders.
 #   (which provides traceability/versioning/reproducibility)
 
 from collections import deque
+import os
 import exceptions
 
 _TODO = """
@@ -96,6 +97,16 @@ class DataProvider( object ):
             raise exceptions.InvalidDataProviderSource( source )
         return source
 
+    def line_offset_index( self, key, line_filter=None ):
+        """
+        Return a `line.LineOffsetIndex` over the lines of the file this provider
+        reads from, counting only those lines for which `line_filter` is true,
+        or `None` if the file can't be indexed.
+
+        Meant to be overridden by providers that read directly from a file.
+        """
+        return None
+
     #TODO: (this might cause problems later...)
     #TODO: some providers (such as chunk's seek and read) rely on this... remove
     def __getattr__( self, name ):
@@ -251,6 +262,8 @@ class LimitedOffsetDataProvider( FilteredDataProvider ):
             return
             yield
 
+        if self.offset:
+            self.seek_to_offset()
         parent_gen = super( LimitedOffsetDataProvider, self ).__iter__()
         for datum in parent_gen:
             self.num_data_returned -= 1
@@ -264,17 +277,25 @@ class LimitedOffsetDataProvider( FilteredDataProvider ):
             if self.limit != None and self.num_data_returned >= self.limit:
                 break
 
-    #TODO: skipping lines is inefficient - somehow cache file position/line_num pair and allow provider
-    #   to seek to a pos/line and then begin providing lines
-    # the important catch here is that we need to have accurate pos/line pairs
-    #   in order to preserve the functionality of limit and offset
-    #if file_seek and len( file_seek ) == 2:
-    #    seek_pos, new_line_num = file_seek
-    #    self.seek_and_set_curr_line( seek_pos, new_line_num )
-
-    #def seek_and_set_curr_line( self, file_seek, new_curr_line_num ):
-    #    self.seek( file_seek, os.SEEK_SET )
-    #    self.curr_line_num = new_curr_line_num
+    def seek_to_offset( self ):
+        """
+        Move the source as close to (but not past) the `offset`-th valid datum
+        as possible without reading it and set `num_valid_data_read` to match.
+
+        Meant to be overridden in subclasses that know how - does nothing by default.
+        """
+        pass
+
+    def seek_and_set_curr_line( self, file_seek, new_num_valid_data_read ):
+        """
+        Seek the source to `file_seek` and start counting valid data from
+        `new_num_valid_data_read`.
+
+        The position/count pair has to be accurate in order to preserve the
+        functionality of limit and offset.
+        """
+        self.source.seek( file_seek, os.SEEK_SET )
+        self.num_valid_data_read = new_num_valid_data_read
 
 
 class MultiSourceDataProvider( DataProvider ):
@@ -314,6 +314,10 @@ class ColumnarDataProvider( line.RegexLineDataProvider ):
                 return None
         return columns
 
+    def can_seek_to_offset( self ):
+        return ( super( ColumnarDataProvider, self ).can_seek_to_offset()
+             and not self.column_filters )
+
 
 class DictDataProvider( ColumnarDataProvider ):
     """
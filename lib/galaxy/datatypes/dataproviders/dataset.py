@@ -54,6 +54,25 @@ class DatasetDataProvider( base.DataProvider ):
         #TODO: this might be a good place to interface with the object_store...
         super( DatasetDataProvider, self ).__init__( open( dataset.file_name, 'rb' ) )
 
+    @classmethod
+    def get_line_offset_index( cls, dataset, key, line_filter=None ):
+        """
+        Convenience class method to get a line offset index for a dataset's file.
+
+        The index is stored next to the dataset's file, named with `key`, which
+        should identify the lines `line_filter` counts.
+        :returns: a `line.LineOffsetIndex` or `None` for datasets whose files
+            are outside Galaxy's control (e.g. linked library datasets)
+        """
+        if getattr( getattr( dataset, 'dataset', None ), 'external_filename', None ):
+            return None
+        file_name = dataset.file_name
+        index_file_name = '%s.%s.line_index' % ( file_name, key )
+        return line.LineOffsetIndex( file_name, index_file_name, line_filter=line_filter )
+
+    def line_offset_index( self, key, line_filter=None ):
+        return self.get_line_offset_index( self.dataset, key, line_filter=line_filter )
+
     #TODO: this is a bit of a mess
     @classmethod
     def get_column_metadata_from_dataset( cls, dataset ):
@@ -2,15 +2,18 @@
 Dataproviders that iterate over lines from their sources.
 """
 
+import array
 import collections
+import hashlib
 import os
 import re
+import struct
+import tempfile
 
 import base
 
 _TODO = """
-line offsets (skip to some place in a file) needs to work more efficiently than simply iterating till we're there
-    capture tell() when provider is done
+capture tell() when provider is done
         def stop( self ): self.endpoint = source.tell(); raise StopIteration()
 a lot of the hierarchy here could be flattened since we're implementing pipes
 """
@@ -83,6 +86,40 @@ class FilteredLineDataProvider( base.LimitedOffsetDataProvider ):
 
         return super( FilteredLineDataProvider, self ).filter( line )
 
+    def can_seek_to_offset( self ):
+        """
+        Can the offset-th valid line be found using a line offset index?
+
+        Only when lines are filtered by the settings above alone: any other
+        filtering would need to be applied to every line before the offset.
+        """
+        return self.filter_fn is None
+
+    def seek_to_offset( self ):
+        """
+        Seek to the closest indexed line at or before `offset` if the source
+        can provide a line offset index.
+        """
+        # plain files and other iterables can't provide an index
+        get_line_index = getattr( self.source, 'line_offset_index', None )
+        if not get_line_index or not self.can_seek_to_offset():
+            return
+        # filter_fn is None here so this only applies the line settings above
+        line_filter = lambda line: FilteredLineDataProvider.filter( self, line ) is not None
+        line_index = get_line_index( self.line_index_key(), line_filter )
+        if line_index is None:
+            return
+        num_lines, position = line_index.find( self.offset )
+        if num_lines:
+            self.seek_and_set_curr_line( position, num_lines )
+
+    def line_index_key( self ):
+        """
+        Return a short key that identifies the lines these settings count as valid.
+        """
+        settings = ( self.strip_lines, self.strip_newlines, self.provide_blank, self.comment_char )
+        return hashlib.md5( repr( settings ) ).hexdigest()[:8]
+
 
 class RegexLineDataProvider( FilteredLineDataProvider ):
     """
@@ -129,6 +166,136 @@ class RegexLineDataProvider( FilteredLineDataProvider ):
             return line if not matches else None
         return line if matches else None
 
+    def can_seek_to_offset( self ):
+        return ( super( RegexLineDataProvider, self ).can_seek_to_offset()
+             and not self.compiled_regex_list )
+
+
+# ----------------------------------------------------------------------------- line offset index
+class LineOffsetIndex( object ):
+    """
+    A sparse index of the byte offsets of every `interval`-th line of a file.
+
+    Allows providers to seek close to a line deep into a large file instead of
+    reading every line before it. The index is built on first use and written to
+    `index_file_name` as a short header followed by an array of offsets (entry `i`
+    is the offset of line `i * interval`), so later lookups read a single entry.
+    The index is rebuilt when the size or modification time of the file changes.
+
+    Only lines for which `line_filter` returns true are counted (all lines if
+    `line_filter` is `None`).
+    """
+    DEFAULT_INTERVAL = 1000
+    MAGIC = 'GXLINEIX'
+    # magic, interval, offset item size, file size, file modification time
+    HEADER_FORMAT = '!8sIIQd'
+    HEADER_SIZE = struct.calcsize( HEADER_FORMAT )
+    TYPECODE = 'L'
+
+    def __init__( self, file_name, index_file_name, line_filter=None, interval=DEFAULT_INTERVAL ):
+        self.file_name = file_name
+        self.index_file_name = index_file_name
+        self.line_filter = line_filter
+        self.interval = interval
+        # used only when the index can't be written next to the file
+        self._offsets = None
+
+    def find( self, num_lines ):
+        """
+        Return a ( `line number`, `byte offset` ) pair for the indexed line closest
+        to, but not past, line number `num_lines` (0-based).
+
+        ( 0, 0 ) is returned for lines before the first indexed line past the
+        start of the file - files are not indexed for those.
+        """
+        if num_lines < self.interval:
+            return ( 0, 0 )
+        try:
+            stat = os.stat( self.file_name )
+        except OSError:
+            return ( 0, 0 )
+        entry = num_lines // self.interval
+        offset = self._read_entry( entry, stat )
+        if offset is None:
+            self._offsets = self.build()
+            self._write( self._offsets, stat )
+            offset = self._read_entry( entry, stat )
+        if offset is None:
+            return ( 0, 0 )
+        return offset
+
+    def build( self ):
+        """
+        Read the file and return an array of the offsets of every `interval`-th line.
+        """
+        offsets = array.array( self.TYPECODE )
+        position = 0
+        num_lines = 0
+        with open( self.file_name, 'rb' ) as source:
+            for line in source:
+                if self.line_filter is None or self.line_filter( line ):
+                    if num_lines % self.interval == 0:
+                        offsets.append( position )
+                    num_lines += 1
+                position += len( line )
+        return offsets
+
+    def _header( self, stat ):
+        item_size = array.array( self.TYPECODE ).itemsize
+        return ( self.MAGIC, self.interval, item_size, stat.st_size, stat.st_mtime )
+
+    def _read_entry( self, entry, stat ):
+        """
+        Return the ( `line number`, `byte offset` ) pair for the last entry at or
+        before `entry` or `None` if there is no up to date index.
+        """
+        offsets = self._offsets
+        if offsets is not None:
+            if not offsets:
+                return ( 0, 0 )
+            entry = min( entry, len( offsets ) - 1 )
+            return ( entry * self.interval, offsets[ entry ] )
+        try:
+            with open( self.index_file_name, 'rb' ) as index_file:
+                header = index_file.read( self.HEADER_SIZE )
+                if len( header ) != self.HEADER_SIZE:
+                    return None
+                if struct.unpack( self.HEADER_FORMAT, header ) != self._header( stat ):
+                    return None
+                item_size = array.array( self.TYPECODE ).itemsize
+                index_file.seek( 0, os.SEEK_END )
+                num_entries = ( index_file.tell() - self.HEADER_SIZE ) // item_size
+                if not num_entries:
+                    return ( 0, 0 )
+                entry = min( entry, num_entries - 1 )
+                index_file.seek( self.HEADER_SIZE + entry * item_size )
+                offset = array.array( self.TYPECODE )
+                offset.fromstring( index_file.read( item_size ) )
+                return ( entry * self.interval, offset[0] )
+        except ( IOError, OSError, struct.error ):
+            return None
+
+    def _write( self, offsets, stat ):
+        """
+        Write the index next to the file, replacing any old one; if it can't be
+        written keep using the offsets already read.
+        """
+        index_dir = os.path.dirname( self.index_file_name ) or os.curdir
+        temp_file_name = None
+        try:
+            fd, temp_file_name = tempfile.mkstemp( dir=index_dir, prefix='.line_index_' )
+            with os.fdopen( fd, 'wb' ) as index_file:
+                index_file.write( struct.pack( self.HEADER_FORMAT, *self._header( stat ) ) )
+                offsets.tofile( index_file )
+            os.rename( temp_file_name, self.index_file_name )
+        except ( IOError, OSError ), write_err:
+            log.debug( 'unable to write line offset index %s: %s', self.index_file_name, write_err )
+            if temp_file_name and os.path.exists( temp_file_name ):
+                os.remove( temp_file_name )
+            return
+        # lookups go through the file from here on
+        self._offsets = None
+
 
 # ============================================================================= MICELLAINEOUS OR UNIMPLEMENTED
 # ----------------------------------------------------------------------------- block data providers
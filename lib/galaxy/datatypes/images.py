@@ -63,6 +63,7 @@ class Image( data.Data ):
 
 class Jpg( Image ):
     file_ext = "jpg"
+    sniff_prefixes = ( '\xff', )
 
     def sniff(self, filename, image=None):
         """Determine if the file is in jpg format."""
@@ -71,6 +72,7 @@ class Jpg( Image ):
 
 class Png( Image ):
     file_ext = "png"
+    sniff_prefixes = ( '\x89PNG\r\n\x1a\n', )
 
     def sniff(self, filename, image=None):
         """Determine if the file is in png format."""
@@ -79,6 +81,7 @@ class Png( Image ):
 
 class Tiff( Image ):
     file_ext = "tiff"
+    sniff_prefixes = ( 'II', 'MM' )
 
     def sniff(self, filename, image=None):
         """Determine if the file is in tiff format."""
@@ -87,6 +90,7 @@ class Tiff( Image ):
 
 class Bmp( Image ):
     file_ext = "bmp"
+    sniff_prefixes = ( 'BM', )
 
     def sniff(self, filename, image=None):
         """Determine if the file is in bmp format."""
@@ -96,6 +100,7 @@ class Bmp( Image ):
 class Gif( Image ):
     edam_format = "format_3467"
     file_ext = "gif"
+    sniff_prefixes = ( 'GIF87a', 'GIF89a' )
 
     def sniff(self, filename, image=None):
         """Determine if the file is in gif format."""
@@ -128,6 +133,7 @@ class Pcx( Image ):
 
 class Ppm( Image ):
     file_ext = "ppm"
+    sniff_prefixes = ( 'P', )
 
     def sniff(self, filename, image=None):
         """Determine if the file is in ppm format."""
@@ -136,6 +142,7 @@ class Ppm( Image ):
 
 class Psd( Image ):
     file_ext = "psd"
+    sniff_prefixes = ( '8BPS', )
 
     def sniff(self, filename, image=None):
         """Determine if the file is in psd format."""
@@ -168,6 +175,7 @@ class Rgb( Image ):
 
 class Pbm( Image ):
     file_ext = "pbm"
+    sniff_prefixes = ( 'P', )
 
     def sniff(self, filename, image=None):
         """Determine if the file is in PBM format"""
@@ -176,6 +184,7 @@ class Pbm( Image ):
 
 class Pgm( Image ):
     file_ext = "pgm"
+    sniff_prefixes = ( 'P', )
 
     def sniff(self, filename, image=None):
         """Determine if the file is in PGM format"""
@@ -193,6 +202,7 @@ class Eps( Image ):
 
 class Rast( Image ):
     file_ext = "rast"
+    sniff_prefixes = ( '\x59\xa6\x6a\x95', )
 
     def sniff(self, filename, image=None):
         """Determine if the file is in rast format"""
@@ -14,8 +14,9 @@ import urllib
 from bx.intervals.io import *
 from galaxy.datatypes import metadata
 from galaxy.datatypes.metadata import MetadataElement
-from galaxy.datatypes.tabular import Tabular
+from galaxy.datatypes.tabular import Tabular, TabularMetadataVisitor
 from galaxy.datatypes.util.gff_util import parse_gff_attributes
+from galaxy.datatypes.util import line_scanner
 import math
 import dataproviders
 
@@ -43,6 +44,31 @@ for key, value in alias_spec.items():
 VIEWPORT_READLINE_BUFFER_SIZE = 1048576 # 1MB
 VIEWPORT_MAX_READS_PER_LINE = 10
 
+
+class IntervalColumnsVisitor( line_scanner.FirstLinesVisitor ):
+    """
+    Sets the chromosome, start, end and strand columns of an interval dataset
+    from its header or first data line while the dataset is scanned.
+    """
+    num_check_lines = 100 # only check up to this many non empty lines
+
+    def __init__( self, datatype, dataset, overwrite = True, first_line_is_header = False ):
+        self.datatype = datatype
+        self.dataset = dataset
+        self.overwrite = overwrite
+        self.first_line_is_header = first_line_is_header
+        self.empty_line_count = 0
+
+    def visit_line( self, line_number, line ):
+        line = line.rstrip( '\r\n' )
+        if not line:
+            self.empty_line_count += 1
+            return False
+        metadata_is_set = self.datatype.set_column_metadata_from_line( self.dataset, line, overwrite = self.overwrite, first_line_is_header = self.first_line_is_header )
+        # Our metadata is set or we examined 100 non-empty lines
+        return metadata_is_set or ( line_number - self.empty_line_count ) > self.num_check_lines
+
+
 @dataproviders.decorators.has_dataproviders
 class Interval( Tabular ):
     """Tab delimited data containing interval information"""
@@ -68,66 +94,63 @@ class Interval( Tabular ):
         Tabular.init_meta( self, dataset, copy_from=copy_from )
     def set_meta( self, dataset, overwrite = True, first_line_is_header = False, **kwd ):
         """Tries to guess from the line the location number of the column for the chromosome, region start-end and strand"""
-        Tabular.set_meta( self, dataset, overwrite = overwrite, skip = 0 )
-        if dataset.has_data():
-            empty_line_count = 0
-            num_check_lines = 100 # only check up to this many non empty lines
-            for i, line in enumerate( file( dataset.file_name ) ):
-                line = line.rstrip( '\r\n' )
-                if line:
-                    if ( first_line_is_header or line[0] == '#' ):
-                        self.init_meta( dataset )
-                        line = line.strip( '#' )
-                        elems = line.split( '\t' )
-                        for meta_name, header_list in alias_spec.iteritems():
-                            for header_val in header_list:
-                                if header_val in elems:
-                                    #found highest priority header to meta_name
-                                    setattr( dataset.metadata, meta_name, elems.index( header_val ) + 1 )
-                                    break #next meta_name
-                        break  # Our metadata is set, so break out of the outer loop
-                    else:
-                        # Header lines in Interval files are optional. For example, BED is Interval but has no header.
-                        # We'll make a best guess at the location of the metadata columns.
-                        metadata_is_set = False
-                        elems = line.split( '\t' )
-                        if len( elems ) > 2:
-                            for str in data.col1_startswith:
-                                if line.lower().startswith( str ):
-                                    if overwrite or not dataset.metadata.element_is_set( 'chromCol' ):
-                                        dataset.metadata.chromCol = 1
-                                    try:
-                                        int( elems[1] )
-                                        if overwrite or not dataset.metadata.element_is_set( 'startCol' ):
-                                            dataset.metadata.startCol = 2
-                                    except:
-                                        pass # Metadata default will be used
-                                    try:
-                                        int( elems[2] )
-                                        if overwrite or not dataset.metadata.element_is_set( 'endCol' ):
-                                            dataset.metadata.endCol = 3
-                                    except:
-                                        pass # Metadata default will be used
-                                    #we no longer want to guess that this column is the 'name', name must now be set manually for interval files
-                                    #we will still guess at the strand, as we can make a more educated guess
-                                    #if len( elems ) > 3:
-                                    #    try:
-                                    #        int( elems[3] )
-                                    #    except:
-                                    #        if overwrite or not dataset.metadata.element_is_set( 'nameCol' ):
-                                    #            dataset.metadata.nameCol = 4
-                                    if len( elems ) < 6 or elems[5] not in data.valid_strand:
-                                        if overwrite or not dataset.metadata.element_is_set(  'strandCol' ):
-                                            dataset.metadata.strandCol = 0
-                                    else:
-                                        if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
-                                            dataset.metadata.strandCol = 6
-                                    metadata_is_set = True
-                                    break
-                        if metadata_is_set or ( i - empty_line_count ) > num_check_lines:
-                            break # Our metadata is set or we examined 100 non-empty lines, so break out of the outer loop
-                else:
-                    empty_line_count += 1
+        column_visitor = IntervalColumnsVisitor( self, dataset, overwrite = overwrite, first_line_is_header = first_line_is_header )
+        self.scan_for_metadata( dataset, [ TabularMetadataVisitor( dataset, skip = 0 ), column_visitor ] )
+    def set_column_metadata_from_line( self, dataset, line, overwrite = True, first_line_is_header = False ):
+        """
+        Tries to guess the location number of the columns from a single non-empty line (without its newline),
+        returns True if they were set.
+        """
+        if ( first_line_is_header or line[0] == '#' ):
+            self.init_meta( dataset )
+            line = line.strip( '#' )
+            elems = line.split( '\t' )
+            for meta_name, header_list in alias_spec.iteritems():
+                for header_val in header_list:
+                    if header_val in elems:
+                        #found highest priority header to meta_name
+                        setattr( dataset.metadata, meta_name, elems.index( header_val ) + 1 )
+                        break #next meta_name
+            return True  # Our metadata is set
+        else:
+            # Header lines in Interval files are optional. For example, BED is Interval but has no header.
+            # We'll make a best guess at the location of the metadata columns.
+            metadata_is_set = False
+            elems = line.split( '\t' )
+            if len( elems ) > 2:
+                for str in data.col1_startswith:
+                    if line.lower().startswith( str ):
+                        if overwrite or not dataset.metadata.element_is_set( 'chromCol' ):
+                            dataset.metadata.chromCol = 1
+                        try:
+                            int( elems[1] )
+                            if overwrite or not dataset.metadata.element_is_set( 'startCol' ):
+                                dataset.metadata.startCol = 2
+                        except:
+                            pass # Metadata default will be used
+                        try:
+                            int( elems[2] )
+                            if overwrite or not dataset.metadata.element_is_set( 'endCol' ):
+                                dataset.metadata.endCol = 3
+                        except:
+                            pass # Metadata default will be used
+                        #we no longer want to guess that this column is the 'name', name must now be set manually for interval files
+                        #we will still guess at the strand, as we can make a more educated guess
+                        #if len( elems ) > 3:
+                        #    try:
+                        #        int( elems[3] )
+                        #    except:
+                        #        if overwrite or not dataset.metadata.element_is_set( 'nameCol' ):
+                        #            dataset.metadata.nameCol = 4
+                        if len( elems ) < 6 or elems[5] not in data.valid_strand:
+                            if overwrite or not dataset.metadata.element_is_set(  'strandCol' ):
+                                dataset.metadata.strandCol = 0
+                        else:
+                            if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
+                                dataset.metadata.strandCol = 6
+                        metadata_is_set = True
+                        break
+        return metadata_is_set
     def displayable( self, dataset ):
         try:
             return dataset.has_data() \
@@ -396,29 +419,29 @@ class Bed( Interval ):
 
     def set_meta( self, dataset, overwrite = True, **kwd ):
         """Sets the metadata information for datasets previously determined to be in bed format."""
-        i = 0
         if dataset.has_data():
-            for i, line in enumerate( file(dataset.file_name) ):
-                metadata_set = False
-                line = line.rstrip('\r\n')
-                if line and not line.startswith('#'):
-                    elems = line.split('\t')
-                    if len(elems) > 2:
-                        for startswith in data.col1_startswith:
-                            if line.lower().startswith( startswith ):
-                                if len( elems ) > 3:
-                                    if overwrite or not dataset.metadata.element_is_set( 'nameCol' ):
-                                        dataset.metadata.nameCol = 4
-                                if len(elems) < 6:
-                                    if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
-                                        dataset.metadata.strandCol = 0
-                                else:
-                                    if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
-                                        dataset.metadata.strandCol = 6
-                                metadata_set = True
-                                break
-                if metadata_set: break
-            Tabular.set_meta( self, dataset, overwrite = overwrite, skip = i )
+            # the first line setting the name and strand columns is the first data line
+            skip_visitor = line_scanner.FirstLineVisitor( lambda line: self.set_name_and_strand_metadata_from_line( dataset, line, overwrite = overwrite ) )
+            self.scan_for_metadata( dataset, [ skip_visitor, TabularMetadataVisitor( dataset, skip_visitor = skip_visitor ) ] )
+    def set_name_and_strand_metadata_from_line( self, dataset, line, overwrite = True ):
+        """
+        Sets the name and strand columns if line is a bed data line, returns True if they were set.
+        """
+        line = line.rstrip('\r\n')
+        if line and not line.startswith('#'):
+            elems = line.split('\t')
+            if len(elems) > 2 and line.lower().startswith( tuple( data.col1_startswith ) ):
+                if len( elems ) > 3:
+                    if overwrite or not dataset.metadata.element_is_set( 'nameCol' ):
+                        dataset.metadata.nameCol = 4
+                if len(elems) < 6:
+                    if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
+                        dataset.metadata.strandCol = 0
+                else:
+                    if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
+                        dataset.metadata.strandCol = 6
+                return True
+        return False
 
     def as_ucsc_display_file( self, dataset, **kwd ):
         """Returns file contents with only the bed data. If bed 6+, treat as interval."""
@@ -594,6 +617,49 @@ class _RemoteCallMixin:
         return link
 
 
+class GffAttributesVisitor( line_scanner.FirstLinesVisitor ):
+    """
+    Sets the attribute metadata of a GFF dataset while the dataset is scanned.
+    """
+    # Use first N lines to set metadata for dataset attributes. Attributes
+    # not found in the first N lines will not have metadata.
+    num_lines = 200
+
+    def __init__( self, dataset ):
+        self.dataset = dataset
+        self.attribute_types = {}
+
+    def visit_line( self, line_number, line ):
+        if line and not line.startswith( '#' ):
+            elems = line.split( '\t' )
+            if len( elems ) == 9:
+                try:
+                    # Loop through attributes to set types.
+                    for name, value in parse_gff_attributes( elems[8] ).items():
+                        # Default type is string.
+                        value_type = "str"
+                        try:
+                            # Try int.
+                            int( value )
+                            value_type = "int"
+                        except:
+                            try:
+                                # Try float.
+                                float( value )
+                                value_type = "float"
+                            except:
+                                pass
+                        self.attribute_types[ name ] = value_type
+                except:
+                    pass
+        return False
+
+    def finish( self ):
+        # Set attribute metadata and then set additional metadata.
+        self.dataset.metadata.attribute_types = self.attribute_types
+        self.dataset.metadata.attributes = len( self.attribute_types )
+
+
 @dataproviders.decorators.has_dataproviders
 class Gff( Tabular, _RemoteCallMixin ):
     """Tab delimited data in Gff format"""
@@ -620,57 +686,28 @@ class Gff( Tabular, _RemoteCallMixin ):
         """
         Sets metadata elements for dataset's attributes.
         """
-
-        # Use first N lines to set metadata for dataset attributes. Attributes
-        # not found in the first N lines will not have metadata.
-        num_lines = 200
-        attribute_types = {}
-        for i, line in enumerate( file ( dataset.file_name ) ):
-            if line and not line.startswith( '#' ):
-                elems = line.split( '\t' )
-                if len( elems ) == 9:
-                    try:
-                        # Loop through attributes to set types.
-                        for name, value in parse_gff_attributes( elems[8] ).items():
-                            # Default type is string.
-                            value_type = "str"
-                            try:
-                                # Try int.
-                                int( value )
-                                value_type = "int"
-                            except:
-                                try:
-                                    # Try float.
-                                    float( value )
-                                    value_type = "float"
-                                except:
-                                    pass
-                            attribute_types[ name ] = value_type
-                    except:
-                        pass
-                if i + 1 == num_lines:
-                    break
-
-        # Set attribute metadata and then set additional metadata.
-        dataset.metadata.attribute_types = attribute_types
-        dataset.metadata.attributes = len( attribute_types )
+        self.scan_for_metadata( dataset, [ GffAttributesVisitor( dataset ) ] )
 
     def set_meta( self, dataset, overwrite = True, **kwd ):
-        self.set_attribute_metadata( dataset )
-
-        i = 0
-        for i, line in enumerate( file ( dataset.file_name ) ):
-            line = line.rstrip('\r\n')
-            if line and not line.startswith( '#' ):
-                elems = line.split( '\t' )
-                if len(elems) == 9:
-                    try:
-                        int( elems[3] )
-                        int( elems[4] )
-                        break
-                    except:
-                        pass
-        Tabular.set_meta( self, dataset, overwrite = overwrite, skip = i )
+        skip_visitor = line_scanner.FirstLineVisitor( self.is_data_line )
+        visitors = [ GffAttributesVisitor( dataset ), skip_visitor, TabularMetadataVisitor( dataset, skip_visitor = skip_visitor ) ]
+        self.scan_for_metadata( dataset, visitors )
+
+    def is_data_line( self, line ):
+        """
+        Is line (with its newline) the first line of the dataset's data?
+        """
+        line = line.rstrip('\r\n')
+        if line and not line.startswith( '#' ):
+            elems = line.split( '\t' )
+            if len(elems) == 9:
+                try:
+                    int( elems[3] )
+                    int( elems[4] )
+                    return True
+                except:
+                    pass
+        return False
 
     def display_peek( self, dataset ):
         """Returns formated html of peek"""
@@ -854,34 +891,31 @@ class Gff3( Gff ):
     def __init__(self, **kwd):
         """Initialize datatype, by adding GBrowse display app"""
         Gff.__init__(self, **kwd)
-    def set_meta( self, dataset, overwrite = True, **kwd ):
-        self.set_attribute_metadata( dataset )
-
-        i = 0
-        for i, line in enumerate( file ( dataset.file_name ) ):
-            line = line.rstrip('\r\n')
-            if line and not line.startswith( '#' ):
-                elems = line.split( '\t' )
-                valid_start = False
-                valid_end = False
-                if len( elems ) == 9:
-                    try:
-                        start = int( elems[3] )
+    def is_data_line( self, line ):
+        line = line.rstrip('\r\n')
+        if line and not line.startswith( '#' ):
+            elems = line.split( '\t' )
+            valid_start = False
+            valid_end = False
+            start = end = None
+            if len( elems ) == 9:
+                try:
+                    start = int( elems[3] )
+                    valid_start = True
+                except:
+                    if elems[3] == '.':
                         valid_start = True
-                    except:
-                        if elems[3] == '.':
-                            valid_start = True
-                    try:
-                        end = int( elems[4] )
+                try:
+                    end = int( elems[4] )
+                    valid_end = True
+                except:
+                    if elems[4] == '.':
                         valid_end = True
-                    except:
-                        if elems[4] == '.':
-                            valid_end = True
-                    strand = elems[6]
-                    phase = elems[7]
-                    if valid_start and valid_end and start < end and strand in self.valid_gff3_strand and phase in self.valid_gff3_phase:
-                        break
-        Tabular.set_meta( self, dataset, overwrite = overwrite, skip = i )
+                strand = elems[6]
+                phase = elems[7]
+                if valid_start and valid_end and start < end and strand in self.valid_gff3_strand and phase in self.valid_gff3_phase:
+                    return True
+        return False
     def sniff( self, filename ):
         """
         Determines whether the file is in gff version 3 format
@@ -1120,29 +1154,29 @@ class Wiggle( Tabular, _RemoteCallMixin ):
         return Tabular.make_html_table( self, dataset, skipchars=['track', '#'] )
     def set_meta( self, dataset, overwrite = True, **kwd ):
         max_data_lines = None
-        i = 0
-        for i, line in enumerate( file ( dataset.file_name ) ):
-            line = line.rstrip('\r\n')
-            if line and not line.startswith( '#' ):
-                elems = line.split( '\t' )
-                try:
-                    float( elems[0] ) #"Wiggle track data values can be integer or real, positive or negative values"
-                    break
-                except:
-                    do_break = False
-                    for col_startswith in data.col1_startswith:
-                        if elems[0].lower().startswith( col_startswith ):
-                            do_break = True
-                            break
-                    if do_break:
-                        break
         if self.max_optional_metadata_filesize >= 0 and dataset.get_size() > self.max_optional_metadata_filesize:
             #we'll arbitrarily only use the first 100 data lines in this wig file to calculate tabular attributes (column types)
             #this should be sufficient, except when we have mixed wig track types (bed, variable, fixed),
             #    but those cases are not a single table that would have consistant column definitions
             #optional metadata values set in Tabular class will be 'None'
             max_data_lines = 100
-        Tabular.set_meta( self, dataset, overwrite = overwrite, skip = i, max_data_lines = max_data_lines )
+        skip_visitor = line_scanner.FirstLineVisitor( self.is_data_line )
+        self.scan_for_metadata( dataset, [ skip_visitor, TabularMetadataVisitor( dataset, max_data_lines = max_data_lines, skip_visitor = skip_visitor ) ] )
+    def is_data_line( self, line ):
+        """
+        Is line (with its newline) the first line of the dataset's data?
+        """
+        line = line.rstrip('\r\n')
+        if line and not line.startswith( '#' ):
+            elems = line.split( '\t' )
+            try:
+                float( elems[0] ) #"Wiggle track data values can be integer or real, positive or negative values"
+                return True
+            except:
+                for col_startswith in data.col1_startswith:
+                    if elems[0].lower().startswith( col_startswith ):
+                        return True
+        return False
     def sniff( self, filename ):
         """
         Determines wether the file is in wiggle format
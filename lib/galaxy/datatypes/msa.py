@@ -3,13 +3,17 @@ from galaxy.datatypes.binary import Binary
 from galaxy.datatypes.data import get_file_peek
 from galaxy.datatypes.data import nice_size
 from galaxy.datatypes.metadata import MetadataElement
+from galaxy.datatypes.sniff import get_file_prefix
 from galaxy.datatypes.util import generic_util
 import os
+import re
 
 
 import logging
 log = logging.getLogger(__name__)
 
+STOCKHOLM_HEADER = re.compile( r'^#[ \t\r\f\v+]STOCKHOLM[ \t\r\f\v+]1.0', re.MULTILINE )
+
 
 class Hmmer( Text ):
     file_ext = "hmm"
@@ -30,6 +34,7 @@ class Hmmer( Text ):
 
 
 class Hmmer2( Hmmer ):
+    sniff_prefixes = ( 'HMMER2.0', )
 
     def sniff(self, filename):
         """HMMER2 files start with HMMER2.0
@@ -40,6 +45,7 @@ class Hmmer2( Hmmer ):
 
 
 class Hmmer3( Hmmer ):
+    sniff_prefixes = ( 'HMMER3/f', )
 
     def sniff(self, filename):
         """HMMER3 files start with HMMER3/f
@@ -103,10 +109,9 @@ class Stockholm_1_0( Text ):
             dataset.blurb = 'file purged from disc'
 
     def sniff( self, filename ):
-        if generic_util.count_special_lines('^#[[:space:]+]STOCKHOLM[[:space:]+]1.0', filename) > 0:
-            return True
-        else:
-            return False
+        # Stockholm files start with this header, so rather than grepping the
+        # complete file only its start (see galaxy.datatypes.sniff) is searched.
+        return get_file_prefix( filename ).search( STOCKHOLM_HEADER )
 
     def set_meta( self, dataset, **kwd ):
         """
@@ -170,6 +175,7 @@ class Stockholm_1_0( Text ):
 
 class MauveXmfa( Text ):
     file_ext = "xmfa"
+    sniff_prefixes = ( '#FormatVersion Mauve1', )
 
     MetadataElement( name="number_of_models", default=0, desc="Number of alignmened sequences", readonly=True, visible=True, optional=True, no_value=0 )
 
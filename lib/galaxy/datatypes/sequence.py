@@ -18,6 +18,7 @@ from galaxy.datatypes.checkers import is_gzip
 from galaxy.datatypes.sniff import get_test_fname, get_headers
 from galaxy.datatypes.metadata import MetadataElement
 from galaxy.datatypes.util.image_util import check_image_type
+from galaxy.datatypes.util import line_scanner
 
 try:
     eggs.require( "bx-python" )
@@ -77,24 +78,31 @@ class Sequence( data.Text ):
     """Add metadata elements"""
     MetadataElement( name="sequences", default=0, desc="Number of sequences", readonly=True, visible=False, optional=True, no_value=0 )
 
+    chunked_set_meta = True
+
     def set_meta( self, dataset, **kwd ):
         """
         Set the number of sequences and the number of data lines in dataset.
         """
+        self.set_meta_from_chunks( dataset, [ self.get_meta_chunk( dataset ) ], **kwd )
+    def get_meta_chunk( self, dataset, start=0, end=None, **kwd ):
         data_lines = 0
         sequences = 0
-        for line in file( dataset.file_name ):
-            line = line.strip()
-            if line and line.startswith( '#' ):
-                # We don't count comment lines for sequence data types
-                continue
-            if line and line.startswith( '>' ):
-                sequences += 1
-                data_lines +=1
-            else:
-                data_lines += 1
-        dataset.metadata.data_lines = data_lines
-        dataset.metadata.sequences = sequences
+        for lines in line_scanner.read_line_blocks( dataset.file_name, start=start, end=end ):
+            for line in lines:
+                line = line.strip()
+                if line and line.startswith( '#' ):
+                    # We don't count comment lines for sequence data types
+                    continue
+                if line and line.startswith( '>' ):
+                    sequences += 1
+                    data_lines +=1
+                else:
+                    data_lines += 1
+        return dict( data_lines=data_lines, sequences=sequences )
+    def set_meta_from_chunks( self, dataset, chunks, **kwd ):
+        dataset.metadata.data_lines = sum( chunk[ 'data_lines' ] for chunk in chunks )
+        dataset.metadata.sequences = sum( chunk[ 'sequences' ] for chunk in chunks )
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
             dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
@@ -9,6 +9,7 @@ import registry
 import shutil
 import sys
 import tempfile
+import threading
 import zipfile
 
 from encodings import search_function as encodings_search_function
@@ -19,6 +20,17 @@ from galaxy.datatypes.binary import Binary
 
 log = logging.getLogger(__name__)
 
+# Number of bytes at the start of a file read once by guess_ext and shared by
+# the sniffers.
+SNIFF_PREFIX_BYTES = 2 ** 20
+
+# The FilePrefix of the file currently sniffed by guess_ext in this thread.
+_sniff_context = threading.local()
+# Sniff prefixes declared by datatype classes, see get_sniff_prefixes.
+_sniff_prefixes = {}
+# Sniff order of the default datatypes registry, loaded on first use.
+_default_sniff_order = []
+
 def get_test_fname(fname):
     """Returns test data filename"""
     path, name = os.path.split(__file__)
@@ -186,7 +198,7 @@ def get_headers( fname, sep, count=60, is_multi_byte=False ):
     [['chr7', '127475281', '127491632', 'NM_000230', '0', '+', '127486022', '127488767', '0', '3', '29,172,3225,', '0,10713,13126,'], ['chr7', '127486011', '127488900', 'D49487', '0', '+', '127486022', '127488767', '0', '2', '155,490,', '0,2399']]
     """
     headers = []
-    for idx, line in enumerate(file(fname)):
+    for idx, line in enumerate( _header_lines( fname, count ) ):
         line = line.rstrip('\n\r')
         if is_multi_byte:
             # TODO: fix this - sep is never found in line
@@ -197,6 +209,101 @@ def get_headers( fname, sep, count=60, is_multi_byte=False ):
             break
     return headers
 
+def _header_lines( fname, count ):
+    """
+    Return an iterable over the first lines of fname, taken from the prefix of
+    the file being sniffed when possible to avoid reopening it.
+    """
+    file_prefix = getattr( _sniff_context, 'file_prefix', None )
+    if file_prefix is not None and file_prefix.fname == fname:
+        lines = file_prefix.lines( count + 1 )
+        if lines is not None:
+            return lines
+    return file( fname )
+
+class FilePrefix( object ):
+    """
+    The first SNIFF_PREFIX_BYTES bytes of a file, read once so that they can
+    be checked against the prefixes declared by datatypes and shared by the
+    sniffers (see get_headers) instead of every sniffer reopening the file.
+
+    >>> fname = get_test_fname('interval.interval')
+    >>> file_prefix = FilePrefix(fname)
+    >>> file_prefix.startswith(('chr', '#'))
+    True
+    >>> file_prefix.lines(2) == [line for i, line in zip(range(2), file(fname))]
+    True
+    """
+    def __init__( self, fname ):
+        self.fname = fname
+        f = open( fname, 'rb' )
+        try:
+            self.contents_header = f.read( SNIFF_PREFIX_BYTES )
+            self.truncated = len( self.contents_header ) == SNIFF_PREFIX_BYTES and f.read( 1 ) != ''
+        finally:
+            f.close()
+        self._lines = None
+
+    def startswith( self, prefixes ):
+        return self.contents_header.startswith( prefixes )
+
+    def search( self, regex ):
+        """
+        Return whether the compiled regular expression regex matches anywhere
+        in the prefix.
+        """
+        return regex.search( self.contents_header ) is not None
+
+    def lines( self, count ):
+        """
+        Return the first count lines of the file (including line endings, as
+        when iterating over it) or None if they are not all in the prefix.
+        """
+        if self._lines is None:
+            self._lines = [ line + '\n' for line in self.contents_header.split( '\n' ) ]
+            # The last line has no line ending, and may be incomplete
+            last_line = self._lines.pop()[ :-1 ]
+            if last_line and not self.truncated:
+                self._lines.append( last_line )
+        if len( self._lines ) >= count or not self.truncated:
+            return self._lines[ :count ]
+        return None
+
+def get_file_prefix( fname ):
+    """
+    Return the FilePrefix of fname, shared with guess_ext while it is sniffing
+    fname.
+    """
+    file_prefix = getattr( _sniff_context, 'file_prefix', None )
+    if file_prefix is None or file_prefix.fname != fname:
+        file_prefix = FilePrefix( fname )
+    return file_prefix
+
+def get_sniff_prefixes( datatype ):
+    """
+    Return the sniff_prefixes declared by the class defining the sniff method
+    of datatype, or None. A prefix declared by a parent class doesn't apply to
+    a subclass overriding sniff without declaring its own.
+
+    >>> from galaxy.datatypes.binary import Sff
+    >>> from galaxy.datatypes.xml import GenericXml, Phyloxml
+    >>> get_sniff_prefixes(Sff())
+    ('.sff',)
+    >>> get_sniff_prefixes(GenericXml())
+    ('<?xml ',)
+    >>> get_sniff_prefixes(Phyloxml()) is None
+    True
+    """
+    datatype_class = datatype.__class__
+    if datatype_class not in _sniff_prefixes:
+        prefixes = None
+        for cls in datatype_class.__mro__:
+            if 'sniff' in cls.__dict__:
+                prefixes = cls.__dict__.get( 'sniff_prefixes', None )
+                break
+        _sniff_prefixes[ datatype_class ] = prefixes
+    return _sniff_prefixes[ datatype_class ]
+
 def is_column_based( fname, sep='\t', skip=0, is_multi_byte=False ):
     """
     Checks whether the file is column based with respect to a separator
@@ -302,9 +409,22 @@ def guess_ext( fname, sniff_order=None, is_multi_byte=False ):
     'bam'
     """
     if sniff_order is None:
-        datatypes_registry = registry.Registry()
-        datatypes_registry.load_datatypes()
-        sniff_order = datatypes_registry.sniff_order
+        if not _default_sniff_order:
+            datatypes_registry = registry.Registry()
+            datatypes_registry.load_datatypes()
+            _default_sniff_order[:] = datatypes_registry.sniff_order
+        sniff_order = _default_sniff_order
+    # Read the start of the file once, it is used to skip the sniffers of
+    # datatypes declaring prefixes the file doesn't start with and is shared
+    # with the sniffers reading the first lines with get_headers.
+    file_prefix = FilePrefix( fname )
+    _sniff_context.file_prefix = file_prefix
+    try:
+        return _guess_ext( fname, file_prefix, sniff_order, is_multi_byte )
+    finally:
+        _sniff_context.file_prefix = None
+
+def _guess_ext( fname, file_prefix, sniff_order, is_multi_byte ):
     for datatype in sniff_order:
         """
         Some classes may not have a sniff function, which is ok.  In fact, the
@@ -314,6 +434,9 @@ def guess_ext( fname, sniff_order=None, is_multi_byte=False ):
         from this function after all other datatypes in sniff_order have not been
         successfully discovered.
         """
+        sniff_prefixes = get_sniff_prefixes( datatype )
+        if sniff_prefixes and not file_prefix.startswith( sniff_prefixes ):
+            continue
         try:
             if datatype.sniff( fname ):
                 return datatype.file_ext
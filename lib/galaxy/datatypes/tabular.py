@@ -7,6 +7,7 @@ pkg_resources.require( "bx-python" )
 import gzip
 import logging
 import os
+import sys
 import csv
 from cgi import escape
 from galaxy import util
@@ -14,7 +15,9 @@ from galaxy.datatypes import data
 from galaxy.datatypes import metadata
 from galaxy.datatypes.checkers import is_gzip
 from galaxy.datatypes.metadata import MetadataElement
-from galaxy.datatypes.sniff import get_headers, get_test_fname
+from galaxy.datatypes.sniff import get_file_prefix, get_headers, get_test_fname
+from galaxy.datatypes.util import column_types as column_types_util
+from galaxy.datatypes.util import line_scanner
 from galaxy.util.json import dumps
 import dataproviders
 
@@ -223,9 +226,135 @@ class TabularData( data.Text ):
         return dataproviders.dataset.DatasetDictDataProvider( dataset, deliminator=delimiter, **settings )
 
 
+class TabularMetadataVisitor( line_scanner.LineVisitor ):
+    """
+    Sets the metadata `Tabular.set_meta` sets (see there for `skip` and
+    `max_data_lines`) while the dataset is scanned.
+
+    Datatypes that find the number of lines to skip while scanning the dataset
+    pass the `line_scanner.FirstLineVisitor` finding the first data line as
+    `skip_visitor`, it has to come before this visitor in the list scanned.
+    """
+
+    def __init__( self, dataset, skip=None, max_data_lines=100000, max_guess_type_data_lines=None, skip_visitor=None ):
+        self.dataset = dataset
+        if skip_visitor is not None:
+            # the number of lines to skip is found by skip_visitor
+            skip = 0
+        # Store original skip value to check with later
+        self.requested_skip = skip
+        self.skip = skip or 0
+        self.skip_visitor = skip_visitor
+        self.max_data_lines = max_data_lines
+        self.max_guess_type_data_lines = max_guess_type_data_lines
+        self.data_lines = 0
+        self.comment_lines = 0
+        self.guesser = column_types_util.ColumnTypeGuesser()
+        self.first_line_column_types = [ column_types_util.DEFAULT_COLUMN_TYPE ]  # default value is one column of type str
+        self.position = 0  # bytes read up to and including the last line visited
+        self.last_line = None
+
+    def visit_lines( self, line_number, lines ):
+        if self.skip_visitor is not None and self.skip_visitor.found:
+            self.skip = self.skip_visitor.line_number
+            self.skip_visitor = None
+        max_data_lines = self.max_data_lines
+        if self.skip_visitor is not None and ( max_data_lines is None or max_data_lines > 0 ):
+            # all lines before the first data line are skipped
+            self.comment_lines += len( lines )
+            self.position += sum( map( len, lines ) )
+            self.last_line = ( line_number + len( lines ) - 1, lines[ -1 ] )
+            return
+        # lines are skipped until the first data line is found
+        skip = self.skip if self.skip_visitor is None else sys.maxint
+        max_guess_type_data_lines = self.max_guess_type_data_lines
+        data_lines = self.data_lines
+        comment_lines = self.comment_lines
+        position = self.position
+        # NOTE: if skip > num_check_lines, we won't detect any metadata, and will use default
+        guess_lines = []
+        for i, line in enumerate( lines, line_number ):
+            position += len( line )
+            line = line.rstrip( '\r\n' )
+            if i < skip or not line or line.startswith( '#' ):
+                # We'll call blank lines comments
+                comment_lines += 1
+            else:
+                data_lines += 1
+                guess_type = max_guess_type_data_lines is None or data_lines <= max_guess_type_data_lines
+                if i == 0 and self.requested_skip is None:
+                    self._guess_header( line, guess_type )
+                elif guess_type:
+                    guess_lines.append( line )
+            if max_data_lines is not None and data_lines >= max_data_lines:
+                if position != self.dataset.get_size():
+                    data_lines = None  # Clear optional data_lines metadata value
+                    comment_lines = None  # Clear optional comment_lines metadata value; additional comment lines could appear below this point
+                self.done = True
+                break
+        self.guesser.update( guess_lines )
+        self.data_lines = data_lines
+        self.comment_lines = comment_lines
+        self.position = position
+        self.last_line = ( i, lines[ i - line_number ] )
+
+    def finish( self ):
+        if self.skip_visitor is not None and self.last_line is not None and not self.done:
+            # the first data line wasn't found, so the data starts at the last line
+            i, line = self.last_line
+            self.skip_visitor = None
+            self.skip = i
+            self.comment_lines -= 1
+            self.position -= len( line )
+            self.visit_lines( i, [ line ] )
+        column_types = self.guesser.column_types
+        first_line_column_types = self.first_line_column_types
+        default_column_type = column_types_util.DEFAULT_COLUMN_TYPE
+        # we error on the larger number of columns
+        # first we pad our column_types by using data from first line
+        if len( first_line_column_types ) > len( column_types ):
+            for column_type in first_line_column_types[len( column_types ):]:
+                column_types.append( column_type )
+        # Now we fill any unknown (None) column_types with data from first line
+        for i in range( len( column_types ) ):
+            if column_types[i] is None:
+                if len( first_line_column_types ) <= i or first_line_column_types[i] is None:
+                    column_types[i] = default_column_type
+                else:
+                    column_types[i] = first_line_column_types[i]
+        # Set the discovered metadata values for the dataset
+        self.dataset.metadata.data_lines = self.data_lines
+        self.dataset.metadata.comment_lines = self.comment_lines
+        self.dataset.metadata.column_types = column_types
+        self.dataset.metadata.columns = len( column_types )
+        self.dataset.metadata.delimiter = '\t'
+
+    def _guess_header( self, line, guess_type ):
+        # This is our first line, people seem to like to upload files that have a header line, but do not
+        # start with '#' (i.e. all column types would then most likely be detected as str).  We will assume
+        # that the first line is always a header (this was previous behavior - it was always skipped).  When
+        # the requested skip is None, we only use the data from the first line if we have no other data for
+        # a column.  This is far from perfect, as
+        # 1,2,3	1.1	2.2	qwerty
+        # 0	0		1,2,3
+        # will be detected as
+        # "column_types": ["int", "int", "float", "list"]
+        # instead of
+        # "column_types": ["list", "float", "float", "str"]  *** would seem to be the 'Truth' by manual
+        # observation that the first line should be included as data.  The old method would have detected as
+        # "column_types": ["int", "int", "str", "list"]
+        first_line_guesser = column_types_util.ColumnTypeGuesser()
+        if guess_type:
+            first_line_guesser.update( [ line ] )
+        self.first_line_column_types = first_line_guesser.column_types
+        self.guesser = column_types_util.ColumnTypeGuesser( [ None for col in self.first_line_column_types ] )
+
+
 @dataproviders.decorators.has_dataproviders
 class Tabular( TabularData ):
     """Tab delimited data"""
+    # Approximate number of bytes of lines set_meta reads and guesses column types for at a time
+    set_meta_block_size = 2 ** 20
 
     def set_meta( self, dataset, overwrite=True, skip=None, max_data_lines=100000, max_guess_type_data_lines=None, **kwd ):
         """
@@ -252,129 +381,23 @@ class Tabular( TabularData ):
            Since metadata can now be processed on cluster nodes, we've merged the line count portion
            of the set_peek() processing here, and we now check the entire contents of the file.
         """
-        # Store original skip value to check with later
-        requested_skip = skip
-        if skip is None:
-            skip = 0
-        column_type_set_order = [ 'int', 'float', 'list', 'str'  ]  # Order to set column types in
-        default_column_type = column_type_set_order[-1]  # Default column type is lowest in list
-        column_type_compare_order = list( column_type_set_order )  # Order to compare column types
-        column_type_compare_order.reverse()
-
-        def type_overrules_type( column_type1, column_type2 ):
-            if column_type1 is None or column_type1 == column_type2:
-                return False
-            if column_type2 is None:
-                return True
-            for column_type in column_type_compare_order:
-                if column_type1 == column_type:
-                    return True
-                if column_type2 == column_type:
-                    return False
-            # neither column type was found in our ordered list, this cannot happen
-            raise "Tried to compare unknown column types"
-
-        def is_int( column_text ):
-            try:
-                int( column_text )
-                return True
-            except:
-                return False
+        visitor = TabularMetadataVisitor( dataset, skip=skip, max_data_lines=max_data_lines, max_guess_type_data_lines=max_guess_type_data_lines )
+        self.scan_for_metadata( dataset, [ visitor ] )
 
-        def is_float( column_text ):
-            try:
-                float( column_text )
-                return True
-            except:
-                if column_text.strip().lower() == 'na':
-                    return True  # na is special cased to be a float
-                return False
-
-        def is_list( column_text ):
-            return "," in column_text
-
-        def is_str( column_text ):
-            # anything, except an empty string, is True
-            if column_text == "":
-                return False
-            return True
-        is_column_type = {}  # Dict to store column type string to checking function
-        for column_type in column_type_set_order:
-            is_column_type[column_type] = locals()[ "is_%s" % ( column_type ) ]
-
-        def guess_column_type( column_text ):
-            for column_type in column_type_set_order:
-                if is_column_type[column_type]( column_text ):
-                    return column_type
-            return None
-        data_lines = 0
-        comment_lines = 0
-        column_types = []
-        first_line_column_types = [default_column_type]  # default value is one column of type str
-        if dataset.has_data():
-            # NOTE: if skip > num_check_lines, we won't detect any metadata, and will use default
-            dataset_fh = open( dataset.file_name )
-            i = 0
-            while True:
-                line = dataset_fh.readline()
-                if not line:
-                    break
-                line = line.rstrip( '\r\n' )
-                if i < skip or not line or line.startswith( '#' ):
-                    # We'll call blank lines comments
-                    comment_lines += 1
-                else:
-                    data_lines += 1
-                    if max_guess_type_data_lines is None or data_lines <= max_guess_type_data_lines:
-                        fields = line.split( '\t' )
-                        for field_count, field in enumerate( fields ):
-                            if field_count >= len( column_types ):  # found a previously unknown column, we append None
-                                column_types.append( None )
-                            column_type = guess_column_type( field )
-                            if type_overrules_type( column_type, column_types[field_count] ):
-                                column_types[field_count] = column_type
-                    if i == 0 and requested_skip is None:
-                        # This is our first line, people seem to like to upload files that have a header line, but do not
-                        # start with '#' (i.e. all column types would then most likely be detected as str).  We will assume
-                        # that the first line is always a header (this was previous behavior - it was always skipped).  When
-                        # the requested skip is None, we only use the data from the first line if we have no other data for
-                        # a column.  This is far from perfect, as
-                        # 1,2,3	1.1	2.2	qwerty
-                        # 0	0		1,2,3
-                        # will be detected as
-                        # "column_types": ["int", "int", "float", "list"]
-                        # instead of
-                        # "column_types": ["list", "float", "float", "str"]  *** would seem to be the 'Truth' by manual
-                        # observation that the first line should be included as data.  The old method would have detected as
-                        # "column_types": ["int", "int", "str", "list"]
-                        first_line_column_types = column_types
-                        column_types = [ None for col in first_line_column_types ]
-                if max_data_lines is not None and data_lines >= max_data_lines:
-                    if dataset_fh.tell() != dataset.get_size():
-                        data_lines = None  # Clear optional data_lines metadata value
-                        comment_lines = None  # Clear optional comment_lines metadata value; additional comment lines could appear below this point
-                    break
-                i += 1
-            dataset_fh.close()
+    def scan_for_metadata( self, dataset, visitors ):
+        """
+        Read the dataset once (if it has data) handing its lines to the
+        `line_scanner.LineVisitor`s setting its metadata, then finish them.
 
-        # we error on the larger number of columns
-        # first we pad our column_types by using data from first line
-        if len( first_line_column_types ) > len( column_types ):
-            for column_type in first_line_column_types[len( column_types ):]:
-                column_types.append( column_type )
-        # Now we fill any unknown (None) column_types with data from first line
-        for i in range( len( column_types ) ):
-            if column_types[i] is None:
-                if len( first_line_column_types ) <= i or first_line_column_types[i] is None:
-                    column_types[i] = default_column_type
-                else:
-                    column_types[i] = first_line_column_types[i]
-        # Set the discovered metadata values for the dataset
-        dataset.metadata.data_lines = data_lines
-        dataset.metadata.comment_lines = comment_lines
-        dataset.metadata.column_types = column_types
-        dataset.metadata.columns = len( column_types )
-        dataset.metadata.delimiter = '\t'
+        Subclasses setting more metadata than `Tabular.set_meta` does add their
+        visitors here along with a `TabularMetadataVisitor` instead of reading
+        the dataset again.
+        """
+        if dataset.has_data():
+            line_scanner.scan_lines( dataset.file_name, visitors, block_size=self.set_meta_block_size )
+        else:
+            for visitor in visitors:
+                visitor.finish()
 
     def as_gbrowse_display_file( self, dataset, **kwd ):
         return open( dataset.file_name )
@@ -661,6 +684,7 @@ class Vcf( Tabular ):
     data_sources = { "data": "tabix", "index": "bigwig" }
 
     file_ext = 'vcf'
+    sniff_prefixes = ( '##fileformat=VCF', )
     column_names = [ 'Chrom', 'Pos', 'ID', 'Ref', 'Alt', 'Qual', 'Filter', 'Info', 'Format', 'data' ]
 
     MetadataElement( name="columns", default=10, desc="Number of columns", readonly=True, visible=False )
@@ -889,7 +913,7 @@ class CSV( TabularData ):
 
     def sniff( self, filename ):
         """ Return True if if recognizes dialect and header. """
-        if not csv.Sniffer().has_header(open(filename, 'r').read(self.peek_size)):
+        if not csv.Sniffer().has_header(get_file_prefix(filename).contents_header[:self.peek_size]):
             return False
         # Fetch at least three consecutive lines to be reasonably sure
         reader = csv.reader(open(filename, 'r'))
@@ -0,0 +1,182 @@
+"""
+Provides utilities for guessing the types of the columns of tabular data.
+
+Every value in a column is guessed as one of `COLUMN_TYPE_SET_ORDER` (or
+`None` for empty values) and the column gets the most general type guessed
+for any of its values ('str' overrules 'list' overrules 'float' overrules
+'int'). Blocks of rows are guessed a column at a time, and once a column has
+a type only the values that could change it need to be looked at: the values
+of a numeric column are checked to still parse as the column's type a block at
+a time, 'str' columns aren't looked at any more.
+"""
+
+try:
+    from galaxy import eggs
+    eggs.require( "numpy" )
+    import numpy
+except Exception:
+    # numpy only speeds guessing up
+    numpy = None
+
+COLUMN_TYPE_SET_ORDER = [ 'int', 'float', 'list', 'str' ]  # Order to set column types in
+DEFAULT_COLUMN_TYPE = COLUMN_TYPE_SET_ORDER[-1]  # Default column type is lowest in list
+COLUMN_TYPE_COMPARE_ORDER = list( reversed( COLUMN_TYPE_SET_ORDER ) )  # Order to compare column types
+NUMPY_TYPES = { 'int': 'int64', 'float': 'float64' }
+DIGITS = '0123456789'
+
+
+def type_overrules_type( column_type1, column_type2 ):
+    if column_type1 is None or column_type1 == column_type2:
+        return False
+    if column_type2 is None:
+        return True
+    for column_type in COLUMN_TYPE_COMPARE_ORDER:
+        if column_type1 == column_type:
+            return True
+        if column_type2 == column_type:
+            return False
+    # neither column type was found in our ordered list, this cannot happen
+    raise Exception( "Tried to compare unknown column types" )
+
+
+def is_int( column_text ):
+    try:
+        int( column_text )
+        return True
+    except:
+        return False
+
+
+def is_float( column_text ):
+    try:
+        float( column_text )
+        return True
+    except:
+        if column_text.strip().lower() == 'na':
+            return True  # na is special cased to be a float
+        return False
+
+
+def is_list( column_text ):
+    return "," in column_text
+
+
+def is_str( column_text ):
+    # anything, except an empty string, is True
+    if column_text == "":
+        return False
+    return True
+
+IS_COLUMN_TYPE = dict( int=is_int, float=is_float, list=is_list, str=is_str )
+
+
+def guess_column_type( column_text ):
+    """
+    >>> [ guess_column_type( text ) for text in [ '1', ' -2 ', '1.5', 'NA', '1e5', '1,2', 'chr1', '' ] ]
+    ['int', 'int', 'float', 'float', 'float', 'list', 'str', None]
+    """
+    for column_type in COLUMN_TYPE_SET_ORDER:
+        if IS_COLUMN_TYPE[ column_type ]( column_text ):
+            return column_type
+    return None
+
+
+class ColumnTypeGuesser( object ):
+    """
+    Guesses the types of the columns of tab separated lines, a block of lines
+    at a time.
+
+    >>> guesser = ColumnTypeGuesser()
+    >>> guesser.update( [ 'chr1\\t100\\t1', 'chr2\\t200\\t2.5\\t' ] )
+    >>> guesser.column_types
+    ['str', 'int', 'float', None]
+    >>> guesser.update( [ 'chr3\\t300\\tNA\\ta,b\\textra' ] )
+    >>> guesser.column_types
+    ['str', 'int', 'float', 'list', 'str']
+    """
+
+    def __init__( self, column_types=None, use_numpy=True ):
+        """
+        :param column_types: the types already guessed for the columns (`None`
+            for columns that have no type yet)
+        :param use_numpy: use numpy to check blocks of numeric values that aren't
+            plain numbers (e.g. 'nan' or '1e+05 ') if available
+        """
+        self.column_types = list( column_types or [] )
+        self.use_numpy = use_numpy and numpy is not None
+
+    def update( self, lines ):
+        """
+        Update the column types with the values in `lines` (without newlines).
+        """
+        if not lines:
+            return
+        rows = [ line.split( '\t' ) for line in lines ]
+        row_lengths = map( len, rows )
+        width = max( row_lengths )
+        if width > len( self.column_types ):
+            # found previously unknown columns
+            self.column_types.extend( [ None ] * ( width - len( self.column_types ) ) )
+        if min( row_lengths ) != width:
+            # missing values guess as None - which doesn't change a column's type
+            rows = [ row + [ '' ] * ( width - len( row ) ) for row in rows ]
+        # numpy drops trailing NUL characters, which would make it accept values
+        #   that aren't numbers
+        use_numpy = self.use_numpy and not any( '\0' in line for line in lines )
+        for index, values in enumerate( zip( *rows ) ):
+            self.column_types[ index ] = self.guess_block( values, self.column_types[ index ], use_numpy )
+
+    def guess_block( self, values, column_type, use_numpy=False ):
+        """
+        Return the most general of `column_type` and the types of `values`.
+        """
+        start = 0
+        while column_type != DEFAULT_COLUMN_TYPE:
+            if column_type in NUMPY_TYPES and self._all_parse_as( values[ start: ], column_type, use_numpy ):
+                return column_type
+            # find the next value that overrules the column type
+            for index in xrange( start, len( values ) ):
+                value_type = guess_column_type( values[ index ] )
+                if type_overrules_type( value_type, column_type ):
+                    column_type = value_type
+                    start = index + 1
+                    break
+            else:
+                return column_type
+        return column_type
+
+    def _all_parse_as( self, values, column_type, use_numpy=False ):
+        """
+        Do all non-empty `values` parse as `column_type` (or a less general type)?
+
+        `False` only means they might not.
+        """
+        if self._all_plain_numbers( values, column_type ):
+            return True
+        if not use_numpy:
+            return False
+        values = numpy.array( values )
+        values = values[ values != '' ]
+        try:
+            values.astype( NUMPY_TYPES[ column_type ] )
+        except ( ValueError, OverflowError, TypeError ):
+            return False
+        return True
+
+    def _all_plain_numbers( self, values, column_type ):
+        """
+        Are all non-empty `values` numbers made of digits with an optional
+        leading '-' (and a single '.' for 'float')?
+
+        These make up most numeric columns and are checked without parsing them.
+        """
+        text = '\n%s\n' % '\n'.join( values )
+        if '\n-\n' in text:
+            return False
+        text = text.replace( '\n-', '\n' )
+        rest = text.translate( None, DIGITS )
+        if column_type == 'float':
+            if '..' in rest or '\n.\n' in text:
+                return False
+            rest = rest.replace( '.', '' )
+        return not rest.strip( '\n' )
@@ -0,0 +1,155 @@
+"""
+Provides a way for datatypes to set several pieces of metadata in a single
+read of a dataset's file.
+
+Each piece of metadata is computed by a `LineVisitor` that is handed the lines
+of the file a block at a time by `scan_lines`, which stops reading as soon as
+every visitor has seen all the lines it needs.
+"""
+
+# Approximate number of bytes of lines read and handed to the visitors at a time
+BLOCK_SIZE = 2 ** 20
+
+
+class LineVisitor( object ):
+    """
+    Looks at the lines of a file as `scan_lines` reads them.
+    """
+    # set to True once the visitor needs no more lines
+    done = False
+
+    def visit_lines( self, line_number, lines ):
+        """
+        Look at a block of `lines` (with their newlines) of the file, the first
+        of which is line `line_number` (0-based).
+
+        Meant to be overridden.
+        """
+        pass
+
+    def finish( self ):
+        """
+        Called once after the last line the visitor needs was read (or the
+        whole file, whichever comes first).
+        """
+        pass
+
+
+class FirstLineVisitor( LineVisitor ):
+    """
+    Finds the first line of a file `predicate` is true for.
+
+    `line_number` is the 0-based number of that line - or of the last line of
+    the file (0 for empty files) if there is no such line, which is what the
+    datatypes that look for their first data line with
+
+        for i, line in enumerate( file( dataset.file_name ) ):
+
+    have used as the number of lines to skip.
+    """
+
+    def __init__( self, predicate ):
+        """
+        :param predicate: a function called with each line (with its newline)
+            until it returns True
+        """
+        self.predicate = predicate
+        self.line_number = 0
+        self.found = False
+
+    def visit_lines( self, line_number, lines ):
+        predicate = self.predicate
+        for i, line in enumerate( lines, line_number ):
+            if predicate( line ):
+                self.line_number = i
+                self.found = self.done = True
+                return
+        self.line_number = line_number + len( lines ) - 1
+
+
+class FirstLinesVisitor( LineVisitor ):
+    """
+    Calls `visit_line` with each of the first `num_lines` lines of a file.
+    """
+    num_lines = None
+
+    def visit_lines( self, line_number, lines ):
+        for i, line in enumerate( lines, line_number ):
+            if ( self.num_lines is not None and i >= self.num_lines ) or self.visit_line( i, line ):
+                self.done = True
+                break
+
+    def visit_line( self, line_number, line ):
+        """
+        Look at a single line, returning True if no more lines are needed.
+
+        Meant to be overridden.
+        """
+        return False
+
+
+def read_line_blocks( file_name, start=0, end=None, block_size=BLOCK_SIZE ):
+    """
+    Yield the lines (with their newlines) of `file_name` that start at or
+    after byte `start` and before byte `end` (if given) in blocks of about
+    `block_size` bytes.
+
+    Reading the byte ranges returned by `byte_ranges` this way reads every
+    line of a file exactly once.
+    """
+    with open( file_name ) as fh:
+        if start > 0:
+            # skip the rest of the line that started before start
+            fh.seek( start - 1 )
+            fh.readline()
+        position = fh.tell()
+        while end is None or position < end:
+            lines = fh.readlines( block_size )
+            if not lines:
+                break
+            if end is not None:
+                for i, line in enumerate( lines ):
+                    if position >= end:
+                        lines = lines[ :i ]
+                        break
+                    position += len( line )
+            yield lines
+
+
+def byte_ranges( size, chunk_size ):
+    """
+    Split `size` bytes into (start, end) ranges of `chunk_size` bytes (the last
+    one may be up to twice as long).
+
+    >>> byte_ranges( 10, 4 )
+    [(0, 4), (4, 10)]
+    >>> byte_ranges( 3, 4 )
+    [(0, 3)]
+    """
+    starts = range( 0, max( size - chunk_size, 0 ) + 1, chunk_size )
+    return zip( starts, starts[ 1: ] + [ size ] )
+
+
+def scan_lines( file_name, visitors, block_size=BLOCK_SIZE ):
+    """
+    Read `file_name` once, handing each block of lines to the `visitors` (in
+    order) that aren't done, until all of them are or the file ends, then
+    finish every visitor.
+    """
+    visitors = list( visitors )
+    active = [ visitor for visitor in visitors if not visitor.done ]
+    line_number = 0
+    if active:
+        blocks = read_line_blocks( file_name, block_size=block_size )
+        try:
+            for lines in blocks:
+                for visitor in active:
+                    visitor.visit_lines( line_number, lines )
+                line_number += len( lines )
+                active = [ visitor for visitor in active if not visitor.done ]
+                if not active:
+                    break
+        finally:
+            blocks.close()
+    for visitor in visitors:
+        visitor.finish()
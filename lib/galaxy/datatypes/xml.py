@@ -14,6 +14,7 @@ class GenericXml( data.Text ):
     """Base format class for any XML file."""
     edam_format = "format_2332"
     file_ext = "xml"
+    sniff_prefixes = ( '<?xml ', )
 
     def set_peek( self, dataset, is_multi_byte=False ):
         """Set the peek and blurb text"""
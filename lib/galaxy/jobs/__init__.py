@@ -16,6 +16,7 @@ import shutil
 import subprocess
 import sys
 import traceback
+from multiprocessing.pool import ThreadPool
 from galaxy import model, util
 from galaxy.datatypes import metadata
 from galaxy.exceptions import ObjectInvalid, ObjectNotFound
@@ -100,6 +101,66 @@ def config_exception(e, file):
     return Exception(message)
 
 
+def map_threaded( func, items, nthreads ):
+    """Apply ``func`` to every item using up to ``nthreads`` threads."""
+    if nthreads <= 1 or len( items ) <= 1:
+        return map( func, items )
+    pool = ThreadPool( min( nthreads, len( items ) ) )
+    try:
+        return pool.map( func, items )
+    finally:
+        pool.close()
+        pool.join()
+
+
+class OutputDatasetFiles( object ):
+    """
+    What is needed to handle the files of an output ``Dataset``, read from it
+    up front so that the files can be handled on other threads (see
+    ``map_threaded``) - these must not touch the dataset, or anything else
+    in the (thread's) SQLAlchemy session. Stands in for the dataset in calls
+    to the object store, outputs have been created in it (and so have their
+    ``object_store_id`` set) when the job was created.
+    """
+
+    def __init__( self, dataset, object_store ):
+        self.id = dataset.id
+        self.object_store_id = dataset.object_store_id
+        self.external_filename = dataset.external_filename
+        self.external_extra_files_path = getattr( dataset, "external_extra_files_path", None )
+        self.extra_files_dir = dataset._extra_files_path or "dataset_%d_files" % dataset.id
+        self.file_size = dataset.file_size
+        self.object_store = object_store
+
+    @property
+    def file_name( self ):
+        if self.external_filename:
+            return os.path.abspath( self.external_filename )
+        return self.object_store.get_filename( self )
+
+    def calculate_size( self ):
+        """As ``Dataset._calculate_size``."""
+        if self.external_filename:
+            try:
+                return os.path.getsize( self.external_filename )
+            except OSError:
+                return 0
+        return self.object_store.size( self )
+
+    def calculate_extra_files_size( self ):
+        """The size of the extra files, as in ``Dataset.set_total_size``."""
+        if not self.object_store.exists( self, extra_dir=self.extra_files_dir, dir_only=True ):
+            return 0
+        if self.external_extra_files_path:
+            extra_files_path = os.path.abspath( self.external_extra_files_path )
+        else:
+            extra_files_path = self.object_store.get_filename( self, dir_only=True, extra_dir=self.extra_files_dir )
+        size = 0
+        for root, dirs, files in os.walk( extra_files_path ):
+            size += sum( [ os.path.getsize( os.path.join( root, file ) ) for file in files if os.path.exists( os.path.join( root, file ) ) ] )
+        return size
+
+
 class JobConfiguration( object ):
     """A parser and interface to advanced job management features.
 
@@ -1001,6 +1062,7 @@ class JobWrapper( object ):
 
             self.sa_session.add( job )
             self.sa_session.flush()
+            self.queue.job_state_changed( job )
         # Perform email action even on failure.
         for pja in [pjaa.post_job_action for pjaa in job.post_job_actions if pjaa.post_job_action.action_type == "EmailAction"]:
             ActionBox.execute(self.app, self.sa_session, pja, job)
@@ -1031,6 +1093,7 @@ class JobWrapper( object ):
         job.set_state( model.Job.states.RESUBMITTED )
         self.sa_session.add( job )
         self.sa_session.flush()
+        self.queue.job_state_changed( job )
 
     def change_state( self, state, info=False ):
         job = self.get_job()
@@ -1048,6 +1111,7 @@ class JobWrapper( object ):
         job.set_state( state )
         self.sa_session.add( job )
         self.sa_session.flush()
+        self.queue.job_state_changed( job )
 
     def get_state( self ):
         job = self.get_job()
@@ -1074,12 +1138,15 @@ class JobWrapper( object ):
         job.job_runner_external_id = external_id
         self.sa_session.add(job)
         self.sa_session.flush()
+        self.queue.job_state_changed(job)
 
-    def finish( self, stdout, stderr, tool_exit_code=None, remote_working_directory=None ):
+    def finish( self, stdout, stderr, tool_exit_code=None, remote_working_directory=None, stdout_path=None, stderr_path=None ):
         """
         Called to indicate that the associated command has been run. Updates
         the output datasets based on stderr and stdout from the command, and
-        the contents of the output files.
+        the contents of the output files. If stdout and stderr are truncated,
+        the files containing the complete output may be passed as
+        ``stdout_path`` and ``stderr_path`` to check the tool's output.
         """
         finish_timer = util.ExecutionTimer()
         stdout = unicodify( stdout )
@@ -1111,7 +1178,7 @@ class JobWrapper( object ):
 
         # We set final_job_state to use for dataset management, but *don't* set
         # job.state until after dataset collection to prevent history issues
-        if ( self.check_tool_output( stdout, stderr, tool_exit_code, job ) ):
+        if ( self.check_tool_output( stdout, stderr, tool_exit_code, job, stdout_path=stdout_path, stderr_path=stderr_path ) ):
             final_job_state = job.states.OK
         else:
             final_job_state = job.states.ERROR
@@ -1139,6 +1206,129 @@ class JobWrapper( object ):
                         job.set_state( final_job_state )
                         return self.fail( "Job %s's output dataset(s) could not be read" % job.id )
 
+        self._finish_output_files( job )
+        # Sniffing, setting metadata and peeks read the output files, which may
+        # be large - do that before opening the transaction below so that it
+        # (and the locks it takes) is only held to write the changes.
+        failed_metadata = self._finish_output_datasets( job, final_job_state, remote_working_directory )
+        self.sa_session.begin()
+        try:
+            self._set_output_dataset_states( job, final_job_state, failed_metadata )
+            for pja in job.post_job_actions:
+                ActionBox.execute(self.app, self.sa_session, pja.post_job_action, job)
+            # Commit all the dataset and job changes above.  Dataset state
+            # changes will now be seen by the user.
+            self.sa_session.commit()
+        except Exception:
+            self.sa_session.rollback()
+            raise
+        # Save stdout and stderr
+        if len( job.stdout ) > DATABASE_MAX_STRING_SIZE:
+            log.info( "stdout for job %d is greater than %s, only a portion will be logged to database" % ( job.id, DATABASE_MAX_STRING_SIZE_PRETTY ) )
+        job.stdout = util.shrink_string_by_size( job.stdout, DATABASE_MAX_STRING_SIZE, join_by="\n..\n", left_larger=True, beginning_on_size_error=True )
+        if len( job.stderr ) > DATABASE_MAX_STRING_SIZE:
+            log.info( "stderr for job %d is greater than %s, only a portion will be logged to database" % ( job.id, DATABASE_MAX_STRING_SIZE_PRETTY ) )
+        job.stderr = util.shrink_string_by_size( job.stderr, DATABASE_MAX_STRING_SIZE, join_by="\n..\n", left_larger=True, beginning_on_size_error=True )
+        # The exit code will be null if there is no exit code to be set.
+        # This is so that we don't assign an exit code, such as 0, that
+        # is either incorrect or has the wrong semantics.
+        if None != tool_exit_code:
+            job.exit_code = tool_exit_code
+        # custom post process setup
+        inp_data = dict( [ ( da.name, da.dataset ) for da in job.input_datasets ] )
+        out_data = dict( [ ( da.name, da.dataset ) for da in job.output_datasets ] )
+        inp_data.update( [ ( da.name, da.dataset ) for da in job.input_library_datasets ] )
+        out_data.update( [ ( da.name, da.dataset ) for da in job.output_library_datasets ] )
+
+        # TODO: eliminate overlap with tools/evaluation.py
+        out_collections = dict( [ ( obj.name, obj.dataset_collection_instance ) for obj in job.output_dataset_collection_instances ] )
+        out_collections.update( [ ( obj.name, obj.dataset_collection ) for obj in job.output_dataset_collections ] )
+
+        input_ext = 'data'
+        for _, data in inp_data.items():
+            # For loop odd, but sort simulating behavior in galaxy.tools.actions
+            if not data:
+                continue
+            input_ext = data.ext
+        # why not re-use self.param_dict here? ##dunno...probably should, this causes
+        # tools.parameters.basic.UnvalidatedValue to be used in following methods
+        # instead of validated and transformed values during i.e. running workflows
+        param_dict = dict( [ ( p.name, p.value ) for p in job.parameters ] )
+        param_dict = self.tool.params_from_strings( param_dict, self.app )
+        # Create generated output children and primary datasets and add to param_dict
+        collected_datasets = {
+            'children': self.tool.collect_child_datasets(out_data, self.working_directory),
+            'primary': self.tool.collect_primary_datasets(out_data, self.working_directory, input_ext)
+        }
+        self.tool.collect_dynamic_collections(
+            out_collections,
+            job_working_directory=self.working_directory,
+            inp_data=inp_data,
+            job=job,
+        )
+        param_dict.update({'__collected_datasets__': collected_datasets})
+        # Certain tools require tasks to be completed after job execution
+        # ( this used to be performed in the "exec_after_process" hook, but hooks are deprecated ).
+        self.tool.exec_after_process( self.queue.app, inp_data, out_data, param_dict, job=job )
+        # Call 'exec_after_process' hook
+        self.tool.call_hook( 'exec_after_process', self.queue.app, inp_data=inp_data,
+                             out_data=out_data, param_dict=param_dict,
+                             tool=self.tool, stdout=job.stdout, stderr=job.stderr )
+        job.command_line = self.command_line
+
+        bytes = 0
+        # Once datasets are collected, set the total dataset size (includes
+        # extra files) - as Dataset.set_total_size, but walking the extra files
+        # of the outputs concurrently.
+        output_datasets = [ dataset_assoc.dataset.dataset for dataset_assoc in job.output_datasets ]
+        output_files = [ OutputDatasetFiles( dataset, self.app.object_store ) for dataset in output_datasets ]
+        extra_files_sizes = map_threaded( lambda output_file: output_file.calculate_extra_files_size(), output_files, self.app.config.job_finishing_output_threads )
+        for dataset, extra_files_size in zip( output_datasets, extra_files_sizes ):
+            if dataset.file_size is None:
+                dataset.set_size()
+            dataset.total_size = ( dataset.file_size or 0 ) + extra_files_size
+            bytes += dataset.get_total_size()
+
+        if job.user:
+            job.user.total_disk_usage += bytes
+
+        # Empirically, we need to update job.user and
+        # job.workflow_invocation_step.workflow_invocation in separate
+        # transactions. Best guess as to why is that the workflow_invocation
+        # may or may not exist when the job is first loaded by the handler -
+        # and depending on whether it is or not sqlalchemy orders the updates
+        # differently and deadlocks can occur (one thread updates user and
+        # waits on invocation and the other updates invocation and waits on
+        # user).
+        self.sa_session.flush()
+
+        # fix permissions
+        for path in [ dp.real_path for dp in self.get_mutable_output_fnames() ]:
+            util.umask_fix_perms( path, self.app.config.umask, 0666, self.app.config.gid )
+
+        # Finally set the job state.  This should only happen *after* all
+        # dataset creation, and will allow us to eliminate force_history_refresh.
+        job.set_final_state( final_job_state )
+        if not job.tasks:
+            # If job was composed of tasks, don't attempt to recollect statisitcs
+            self._collect_metrics( job )
+        self.sa_session.flush()
+        self.queue.job_state_changed( job )
+        if final_job_state == job.states.OK and self.app.config.event_driven_job_readiness:
+            # Let the handler(s) know that jobs waiting on these outputs may now be ready
+            self.queue.notify_datasets_ready( [ da.dataset.dataset.id for da in job.output_datasets + job.output_library_datasets ] )
+        log.debug( 'job %d ended (finish() executed in %s)' % (self.job_id, finish_timer) )
+        delete_files = self.app.config.cleanup_job == 'always' or ( job.state == job.states.OK and self.app.config.cleanup_job == 'onsuccess' )
+        self.cleanup( delete_files=delete_files )
+
+    def _finish_output_datasets( self, job, final_job_state, remote_working_directory=None ):
+        """
+        Update the output datasets of a finished job based on its stdout,
+        stderr and the contents of the output files - everything but their
+        states, which ``_set_output_dataset_states`` sets afterwards. Return
+        the datasets whose metadata could not be set.
+        """
+        failed_metadata = []
         job_context = ExpressionContext( dict( stdout=job.stdout, stderr=job.stderr ) )
         for dataset_assoc in job.output_datasets + job.output_library_datasets:
             context = self.get_dataset_finish_context( job_context, dataset_assoc.dataset.dataset )
@@ -1146,17 +1336,6 @@ class JobWrapper( object ):
             # lets not allow this to occur
             # need to update all associated output hdas, i.e. history was shared with job running
             for dataset in dataset_assoc.dataset.dataset.history_associations + dataset_assoc.dataset.dataset.library_associations:
-                trynum = 0
-                while trynum < self.app.config.retry_job_output_collection:
-                    try:
-                        # Attempt to short circuit NFS attribute caching
-                        os.stat( dataset.dataset.file_name )
-                        os.chown( dataset.dataset.file_name, os.getuid(), -1 )
-                        trynum = self.app.config.retry_job_output_collection
-                    except ( OSError, ObjectNotFound ), e:
-                        trynum += 1
-                        log.warning( 'Error accessing %s, will retry: %s', dataset.dataset.file_name, e )
-                        time.sleep( 2 )
                 if getattr( dataset, "hidden_beneath_collection_instance", None ):
                     dataset.visible = False
                 dataset.blurb = 'done'
@@ -1169,13 +1348,8 @@ class JobWrapper( object ):
                     # Ensure white space between entries
                     dataset.info = dataset.info.rstrip() + "\n" + context['stderr'].strip()
                 dataset.tool_version = self.version_string
-                dataset.set_size()
                 if 'uuid' in context:
                     dataset.dataset.uuid = context['uuid']
-                # Update (non-library) job output datasets through the object store
-                if dataset not in job.output_library_datasets:
-                    self.app.object_store.update_from_file(dataset.dataset, create=True)
-                self._collect_extra_files(dataset.dataset, self.working_directory)
                 if job.states.ERROR == final_job_state:
                     dataset.blurb = "error"
                     dataset.mark_unhidden()
@@ -1188,8 +1362,8 @@ class JobWrapper( object ):
                     # either use the metadata from originating output dataset, or call set_meta on the copies
                     # it would be quicker to just copy the metadata from the originating output dataset,
                     # but somewhat trickier (need to recurse up the copied_from tree), for now we'll call set_meta()
-                    if ( not self.external_output_metadata.external_metadata_set_successfully( dataset, self.sa_session )
-                         and self.app.config.retry_metadata_internally ):
+                    external_metadata_set_successfully = self.external_output_metadata.external_metadata_set_successfully( dataset, self.sa_session )
+                    if not external_metadata_set_successfully and self.app.config.retry_metadata_internally:
                         # If Galaxy was expected to sniff type and didn't - do so.
                         if dataset.ext == "_sniff_":
                             extension = sniff.handle_uploaded_dataset_file( dataset.dataset.file_name, self.app.datatypes_registry )
@@ -1197,9 +1371,8 @@ class JobWrapper( object ):
 
                         # call datatype.set_meta directly for the initial set_meta call during dataset creation
                         dataset.datatype.set_meta( dataset, overwrite=False )
-                    elif ( not self.external_output_metadata.external_metadata_set_successfully( dataset, self.sa_session )
-                           and job.states.ERROR != final_job_state ):
-                        dataset._state = model.Dataset.states.FAILED_METADATA
+                    elif not external_metadata_set_successfully and job.states.ERROR != final_job_state:
+                        failed_metadata.append( dataset )
                     else:
                         # load metadata from file
                         # we need to no longer allow metadata to be edited while the job is still running,
@@ -1238,6 +1411,17 @@ class JobWrapper( object ):
                     dataset.blurb = "empty"
                     if dataset.ext == 'auto':
                         dataset.extension = 'txt'
+        return failed_metadata
+
+    def _set_output_dataset_states( self, job, final_job_state, failed_metadata ):
+        """
+        Set the states of the output datasets of a finished job (once
+        ``_finish_output_datasets`` has updated them).
+        """
+        for dataset in failed_metadata:
+            dataset._state = model.Dataset.states.FAILED_METADATA
+        for dataset_assoc in job.output_datasets + job.output_library_datasets:
+            for dataset in dataset_assoc.dataset.dataset.history_associations + dataset_assoc.dataset.dataset.library_associations:
                 self.sa_session.add( dataset )
             if job.states.ERROR == final_job_state:
                 log.debug( "setting dataset state to ERROR" )
@@ -1256,101 +1440,47 @@ class JobWrapper( object ):
             # self.sa_session.flush() at the bottom of this method set
             # the state instead.
 
-        for pja in job.post_job_actions:
-            ActionBox.execute(self.app, self.sa_session, pja.post_job_action, job)
-        # Flush all the dataset and job changes above.  Dataset state changes
-        # will now be seen by the user.
-        self.sa_session.flush()
-        # Save stdout and stderr
-        if len( job.stdout ) > DATABASE_MAX_STRING_SIZE:
-            log.info( "stdout for job %d is greater than %s, only a portion will be logged to database" % ( job.id, DATABASE_MAX_STRING_SIZE_PRETTY ) )
-        job.stdout = util.shrink_string_by_size( job.stdout, DATABASE_MAX_STRING_SIZE, join_by="\n..\n", left_larger=True, beginning_on_size_error=True )
-        if len( job.stderr ) > DATABASE_MAX_STRING_SIZE:
-            log.info( "stderr for job %d is greater than %s, only a portion will be logged to database" % ( job.id, DATABASE_MAX_STRING_SIZE_PRETTY ) )
-        job.stderr = util.shrink_string_by_size( job.stderr, DATABASE_MAX_STRING_SIZE, join_by="\n..\n", left_larger=True, beginning_on_size_error=True )
-        # The exit code will be null if there is no exit code to be set.
-        # This is so that we don't assign an exit code, such as 0, that
-        # is either incorrect or has the wrong semantics.
-        if None != tool_exit_code:
-            job.exit_code = tool_exit_code
-        # custom post process setup
-        inp_data = dict( [ ( da.name, da.dataset ) for da in job.input_datasets ] )
-        out_data = dict( [ ( da.name, da.dataset ) for da in job.output_datasets ] )
-        inp_data.update( [ ( da.name, da.dataset ) for da in job.input_library_datasets ] )
-        out_data.update( [ ( da.name, da.dataset ) for da in job.output_library_datasets ] )
-
-        # TODO: eliminate overlap with tools/evaluation.py
-        out_collections = dict( [ ( obj.name, obj.dataset_collection_instance ) for obj in job.output_dataset_collection_instances ] )
-        out_collections.update( [ ( obj.name, obj.dataset_collection ) for obj in job.output_dataset_collections ] )
-
-        input_ext = 'data'
-        for _, data in inp_data.items():
-            # For loop odd, but sort simulating behavior in galaxy.tools.actions
-            if not data:
-                continue
-            input_ext = data.ext
-        # why not re-use self.param_dict here? ##dunno...probably should, this causes
-        # tools.parameters.basic.UnvalidatedValue to be used in following methods
-        # instead of validated and transformed values during i.e. running workflows
-        param_dict = dict( [ ( p.name, p.value ) for p in job.parameters ] )
-        param_dict = self.tool.params_from_strings( param_dict, self.app )
-        # Create generated output children and primary datasets and add to param_dict
-        collected_datasets = {
-            'children': self.tool.collect_child_datasets(out_data, self.working_directory),
-            'primary': self.tool.collect_primary_datasets(out_data, self.working_directory, input_ext)
-        }
-        self.tool.collect_dynamic_collections(
-            out_collections,
-            job_working_directory=self.working_directory,
-            inp_data=inp_data,
-            job=job,
-        )
-        param_dict.update({'__collected_datasets__': collected_datasets})
-        # Certain tools require tasks to be completed after job execution
-        # ( this used to be performed in the "exec_after_process" hook, but hooks are deprecated ).
-        self.tool.exec_after_process( self.queue.app, inp_data, out_data, param_dict, job=job )
-        # Call 'exec_after_process' hook
-        self.tool.call_hook( 'exec_after_process', self.queue.app, inp_data=inp_data,
-                             out_data=out_data, param_dict=param_dict,
-                             tool=self.tool, stdout=job.stdout, stderr=job.stderr )
-        job.command_line = self.command_line
-
-        bytes = 0
-        # Once datasets are collected, set the total dataset size (includes extra files)
-        for dataset_assoc in job.output_datasets:
-            dataset_assoc.dataset.dataset.set_total_size()
-            bytes += dataset_assoc.dataset.dataset.get_total_size()
-
-        if job.user:
-            job.user.total_disk_usage += bytes
-
-        # Empirically, we need to update job.user and
-        # job.workflow_invocation_step.workflow_invocation in separate
-        # transactions. Best guess as to why is that the workflow_invocation
-        # may or may not exist when the job is first loaded by the handler -
-        # and depending on whether it is or not sqlalchemy orders the updates
-        # differently and deadlocks can occur (one thread updates user and
-        # waits on invocation and the other updates invocation and waits on
-        # user).
-        self.sa_session.flush()
-
-        # fix permissions
-        for path in [ dp.real_path for dp in self.get_mutable_output_fnames() ]:
-            util.umask_fix_perms( path, self.app.config.umask, 0666, self.app.config.gid )
-
-        # Finally set the job state.  This should only happen *after* all
-        # dataset creation, and will allow us to eliminate force_history_refresh.
-        job.set_final_state( final_job_state )
-        if not job.tasks:
-            # If job was composed of tasks, don't attempt to recollect statisitcs
-            self._collect_metrics( job )
-        self.sa_session.flush()
-        log.debug( 'job %d ended (finish() executed in %s)' % (self.job_id, finish_timer) )
-        delete_files = self.app.config.cleanup_job == 'always' or ( job.state == job.states.OK and self.app.config.cleanup_job == 'onsuccess' )
-        self.cleanup( delete_files=delete_files )
+    def _finish_output_files( self, job ):
+        """
+        Wait for the output files of a finished job to become visible, set
+        their sizes and push them (and their extra files) to the object store.
+        This only involves the file system and the object store, so outputs
+        are processed concurrently (see ``job_finishing_output_threads``),
+        through ``OutputDatasetFiles`` - the sizes are set on the datasets
+        afterwards, on this thread.
+        """
+        datasets = []
+        for dataset_assoc in job.output_datasets + job.output_library_datasets:
+            if dataset_assoc.dataset.dataset not in datasets:
+                datasets.append( dataset_assoc.dataset.dataset )
+        output_files = [ OutputDatasetFiles( dataset, self.app.object_store ) for dataset in datasets ]
 
-    def check_tool_output( self, stdout, stderr, tool_exit_code, job ):
-        return check_output( self.tool, stdout, stderr, tool_exit_code, job )
+        def finish_output_file( output_file ):
+            trynum = 0
+            while trynum < self.app.config.retry_job_output_collection:
+                try:
+                    # Attempt to short circuit NFS attribute caching
+                    file_name = output_file.file_name
+                    os.stat( file_name )
+                    os.chown( file_name, os.getuid(), -1 )
+                    trynum = self.app.config.retry_job_output_collection
+                except ( OSError, ObjectNotFound ), e:
+                    trynum += 1
+                    log.warning( 'Error accessing the file of dataset %s, will retry: %s', output_file.id, e )
+                    time.sleep( 2 )
+            # As Dataset.set_size
+            size = output_file.file_size or output_file.calculate_size()
+            self.app.object_store.update_from_file( output_file, create=True )
+            self._collect_extra_files( output_file, self.working_directory )
+            return size
+
+        sizes = map_threaded( finish_output_file, output_files, self.app.config.job_finishing_output_threads )
+        for dataset, size in zip( datasets, sizes ):
+            if not dataset.file_size:
+                dataset.file_size = size
+
+    def check_tool_output( self, stdout, stderr, tool_exit_code, job, stdout_path=None, stderr_path=None ):
+        return check_output( self.tool, stdout, stderr, tool_exit_code, job, stdout_path=stdout_path, stderr_path=stderr_path )
 
     def cleanup( self, delete_files=True ):
         # At least one of these tool cleanup actions (job import), is needed
@@ -1790,7 +1920,7 @@ class TaskWrapper(JobWrapper):
         self.sa_session.add( task )
         self.sa_session.flush()
 
-    def finish( self, stdout, stderr, tool_exit_code=None ):
+    def finish( self, stdout, stderr, tool_exit_code=None, stdout_path=None, stderr_path=None ):
         # DBTODO integrate previous finish logic.
         # Simple finish for tasks.  Just set the flag OK.
         """
@@ -1821,7 +1951,7 @@ class TaskWrapper(JobWrapper):
         # Check what the tool returned. If the stdout or stderr matched
         # regular expressions that indicate errors, then set an error.
         # The same goes if the tool's exit code was in a given range.
-        if ( self.check_tool_output( stdout, stderr, tool_exit_code, task ) ):
+        if ( self.check_tool_output( stdout, stderr, tool_exit_code, task, stdout_path=stdout_path, stderr_path=stderr_path ) ):
             task.state = task.states.OK
         else:
             task.state = task.states.ERROR
@@ -1975,6 +2105,15 @@ class NoopQueue( object ):
     def put_stop( self, *args ):
         return
 
+    def notify_jobs_ready( self, *args ):
+        return
+
+    def job_state_changed( self, *args ):
+        return
+
+    def notify_datasets_ready( self, *args ):
+        return
+
     def shutdown( self ):
         return
 
@@ -178,6 +178,8 @@ class FakeTrans( object ):
             return self.user.all_roles()
         else:
             return []
+    def get_current_user_role_ids( self ):
+        return set( role.id for role in self.get_current_user_roles() )
     def db_dataset_for( self, dbkey ):
         if self.history is None:
             return None
@@ -8,9 +8,11 @@ import logging
 import threading
 from Queue import Queue, Empty
 
+from sqlalchemy.orm import joinedload, lazyload, subqueryload
 from sqlalchemy.sql.expression import and_, or_, select, func
 
 from galaxy import model
+from galaxy import util
 from galaxy.util.sleeper import Sleeper
 from galaxy.jobs import JobWrapper, TaskWrapper, JobDestination
 from galaxy.jobs.mapper import JobNotReadyException
@@ -19,6 +21,13 @@ log = logging.getLogger( __name__ )
 
 # States for running a job. These are NOT the same as data states
 JOB_WAIT, JOB_ERROR, JOB_INPUT_ERROR, JOB_INPUT_DELETED, JOB_READY, JOB_DELETED, JOB_ADMIN_DELETED, JOB_USER_OVER_QUOTA = 'wait', 'error', 'input_error', 'input_deleted', 'ready', 'deleted', 'admin_deleted', 'user_over_quota'
+# Maximum number of job ids used in a single IN query when loading jobs
+JOB_ID_CHUNK_SIZE = 500
+# Relations used when checking whether a job is ready to run, these are loaded
+# along with the jobs of each monitor iteration rather than lazily per job
+JOB_LOAD_OPTIONS = ( lazyload( "*" ), joinedload( "user" ), joinedload( "galaxy_session" ), subqueryload( "parameters" ) )
+# Without job tracking in the database the inputs are checked in Python too
+IN_MEMORY_JOB_LOAD_OPTIONS = JOB_LOAD_OPTIONS + ( subqueryload( "input_datasets" ), subqueryload( "input_library_datasets" ) )
 DEFAULT_JOB_PUT_FAILURE_MESSAGE = 'Unable to run job due to a misconfiguration of the Galaxy job running system.  Please contact a site administrator.'
 
 
@@ -32,7 +41,7 @@ class JobHandler( object ):
         self.dispatcher = DefaultJobDispatcher( app )
         # Queues for starting and stopping jobs
         self.job_queue = JobHandlerQueue( app, self.dispatcher )
-        self.job_stop_queue = JobHandlerStopQueue( app, self.dispatcher )
+        self.job_stop_queue = JobHandlerStopQueue( app, self.dispatcher, job_queue=self.job_queue )
 
     def start( self ):
         self.job_queue.start()
@@ -59,6 +68,33 @@ class JobHandlerQueue( object ):
 
         # Initialize structures for handling job limits
         self.__clear_job_count()
+        # Incrementally maintained job counts, replacing the per iteration
+        # count queries if enabled
+        self.running_job_counts = None
+        if self.app.config.track_running_job_counts:
+            self.running_job_counts = RunningJobCounts( self.app.config.running_job_count_reconcile_interval )
+
+        # Event driven readiness - rather than rerunning the input readiness
+        # queries against every new job each iteration, only check jobs that
+        # are new since the last iteration or that have been reported ready
+        # (via notify_jobs_ready) and fall back to a full sweep periodically.
+        self.event_driven = self.track_jobs_in_database and self.app.config.event_driven_job_readiness
+        self.reconcile_interval = self.app.config.job_readiness_reconcile_interval
+        self.last_reconcile = None
+        # Highest job id seen in the NEW state for this handler
+        self.max_seen_job_id = 0
+        # Job ids reported ready since the last iteration (written by other threads)
+        self.notified_job_ids = set()
+        self.notified_job_ids_lock = threading.Lock()
+        # Jobs to check again next iteration (waiting on limits or deferred by
+        # the per iteration cap)
+        self.recheck_job_ids = set()
+
+        # Maximum number of new and waiting jobs loaded and checked per
+        # iteration, any more are deferred to the next iteration
+        self.max_jobs_per_iteration = self.app.config.job_handler_max_jobs_per_iteration
+        # Id of the last job checked when the cap applies to the full query
+        self.job_id_cursor = 0
 
         # Keep track of the pid that started the job manager, only it
         # has valid threads
@@ -69,6 +105,9 @@ class JobHandlerQueue( object ):
         self.waiting_jobs = []
         # Contains wrappers of jobs that are limited or ready (so they aren't created unnecessarily/multiple times)
         self.job_wrappers = {}
+        # Number of jobs loaded for checking and deferred by the per iteration cap
+        self.jobs_loaded = 0
+        self.jobs_deferred = 0
         # Helper for interruptable sleep
         self.sleeper = Sleeper()
         self.running = True
@@ -83,7 +122,10 @@ class JobHandlerQueue( object ):
         self.__check_jobs_at_startup()
         # Start the queue
         self.monitor_thread.start()
-        log.info( "job handler queue started" )
+        if self.event_driven:
+            log.info( "job handler queue started (event driven readiness, reconciling every %s seconds)" % self.reconcile_interval )
+        else:
+            log.info( "job handler queue started" )
 
     def job_wrapper( self, job, use_persisted_destination=False ):
         return JobWrapper( job, self, use_persisted_destination=use_persisted_destination )
@@ -177,6 +219,9 @@ class JobHandlerQueue( object ):
                     self.__monitor_step()
             except:
                 log.exception( "Exception in monitor_step" )
+            if self.event_driven and self.notified_job_ids:
+                # Jobs were reported ready during the step, check them now
+                continue
             # Sleep
             self.sleeper.sleep( 1 )
 
@@ -191,57 +236,49 @@ class JobHandlerQueue( object ):
         belongs to an inactive user it is ignored.
         Otherwise, the job is dispatched.
         """
+        load_timer = util.ExecutionTimer()
         # Pull all new jobs from the queue at once
         jobs_to_check = []
         resubmit_jobs = []
+        deferred_job_ids = []
         if self.track_jobs_in_database:
             # Clear the session so we get fresh states for job and all datasets
             self.sa_session.expunge_all()
-            # Fetch all new jobs
-            hda_not_ready = self.sa_session.query(model.Job.id).enable_eagerloads(False) \
-                    .join(model.JobToInputDatasetAssociation) \
-                    .join(model.HistoryDatasetAssociation) \
-                    .join(model.Dataset) \
-                    .filter(and_( (model.Job.state == model.Job.states.NEW ),
-                                 or_( ( model.HistoryDatasetAssociation._state == model.HistoryDatasetAssociation.states.FAILED_METADATA ),
-                                      ( model.HistoryDatasetAssociation.deleted == True ),
-                                      ( model.Dataset.state != model.Dataset.states.OK ),
-                                      ( model.Dataset.deleted == True) ) ) ).subquery()
-            ldda_not_ready = self.sa_session.query(model.Job.id).enable_eagerloads(False) \
-                    .join(model.JobToInputLibraryDatasetAssociation) \
-                    .join(model.LibraryDatasetDatasetAssociation) \
-                    .join(model.Dataset) \
-                    .filter(and_((model.Job.state == model.Job.states.NEW),
-                                 or_((model.LibraryDatasetDatasetAssociation._state != None),
-                                     (model.LibraryDatasetDatasetAssociation.deleted == True),
-                                     (model.Dataset.state != model.Dataset.states.OK),
-                                     (model.Dataset.deleted == True)))).subquery()
-            if self.app.config.user_activation_on:
-                jobs_to_check = self.sa_session.query(model.Job).enable_eagerloads(False) \
-                        .outerjoin( model.User ) \
-                        .filter(and_((model.Job.state == model.Job.states.NEW),
-                                    or_((model.Job.user_id == None), (model.User.active == True)),
-                                     (model.Job.handler == self.app.config.server_name),
-                                     ~model.Job.table.c.id.in_(hda_not_ready),
-                                     ~model.Job.table.c.id.in_(ldda_not_ready))) \
-                        .order_by(model.Job.id).all()
+            if self.event_driven and not self.__reconcile_due():
+                # Only check the jobs that could have become ready
+                job_ids = self.__event_driven_job_ids()
+                if self.max_jobs_per_iteration and len( job_ids ) > self.max_jobs_per_iteration:
+                    deferred_job_ids = job_ids[ self.max_jobs_per_iteration: ]
+                    job_ids = job_ids[ :self.max_jobs_per_iteration ]
+                    self.recheck_job_ids.update( deferred_job_ids )
+                for i in range( 0, len( job_ids ), JOB_ID_CHUNK_SIZE ):
+                    jobs_to_check.extend( self.__fetch_ready_jobs( job_ids=job_ids[ i:i + JOB_ID_CHUNK_SIZE ] ) )
+                jobs_to_check.sort( key=lambda job: job.id )
             else:
-                jobs_to_check = self.sa_session.query(model.Job).enable_eagerloads(False) \
-                    .filter(and_((model.Job.state == model.Job.states.NEW),
-                                 (model.Job.handler == self.app.config.server_name),
-                                 ~model.Job.table.c.id.in_(hda_not_ready),
-                                 ~model.Job.table.c.id.in_(ldda_not_ready))) \
-                    .order_by(model.Job.id).all()
+                if self.event_driven and not self.job_id_cursor:
+                    # Everything new is about to be swept, so anything
+                    # reported ready up to this point can be dropped
+                    self.__reset_event_driven_job_ids()
+                if self.max_jobs_per_iteration:
+                    # Fetch the next batch of new jobs, starting over from the
+                    # oldest once the end is reached so no job is starved
+                    jobs_to_check = self.__fetch_ready_jobs( after_job_id=self.job_id_cursor, limit=self.max_jobs_per_iteration )
+                    if len( jobs_to_check ) < self.max_jobs_per_iteration:
+                        self.job_id_cursor = 0
+                    else:
+                        self.job_id_cursor = jobs_to_check[ -1 ].id
+                else:
+                    # Fetch all new jobs
+                    jobs_to_check = self.__fetch_ready_jobs()
             # Fetch all "resubmit" jobs
             resubmit_jobs = self.sa_session.query(model.Job).enable_eagerloads(False) \
                     .filter(and_((model.Job.state == model.Job.states.RESUBMITTED),
                                 (model.Job.handler == self.app.config.server_name))) \
                     .order_by(model.Job.id).all()
         else:
-            # Get job objects and append to watch queue for any which were
-            # previously waiting
-            for job_id in self.waiting_jobs:
-                jobs_to_check.append( self.sa_session.query( model.Job ).get( job_id ) )
+            # Check any jobs which were previously waiting, followed by the new
+            # jobs from the queue
+            job_ids = list( self.waiting_jobs )
             try:
                 while 1:
                     message = self.queue.get_nowait()
@@ -249,19 +286,36 @@ class JobHandlerQueue( object ):
                         return
                     # Unpack the message
                     job_id, tool_id = message
-                    # Get the job object and append to watch queue
-                    jobs_to_check.append( self.sa_session.query( model.Job ).get( job_id ) )
+                    job_ids.append( job_id )
             except Empty:
                 pass
+            if self.max_jobs_per_iteration and len( job_ids ) > self.max_jobs_per_iteration:
+                deferred_job_ids = job_ids[ self.max_jobs_per_iteration: ]
+                job_ids = job_ids[ :self.max_jobs_per_iteration ]
+            # Get the job objects (in the same order) with the relations needed
+            # to check them
+            jobs_by_id = {}
+            for i in range( 0, len( job_ids ), JOB_ID_CHUNK_SIZE ):
+                for job in self.sa_session.query( model.Job ).options( *IN_MEMORY_JOB_LOAD_OPTIONS ) \
+                                          .filter( model.Job.id.in_( job_ids[ i:i + JOB_ID_CHUNK_SIZE ] ) ):
+                    jobs_by_id[ job.id ] = job
+            jobs_to_check = [ jobs_by_id[ id ] for id in job_ids if id in jobs_by_id ]
+        if jobs_to_check or deferred_job_ids:
+            self.jobs_loaded += len( jobs_to_check )
+            self.jobs_deferred += len( deferred_job_ids )
+            log.debug( "Loaded %d job(s) to check in %s, %d job(s) deferred to the next iteration (%d loaded, %d deferred in total)"
+                       % ( len( jobs_to_check ), load_timer, len( deferred_job_ids ), self.jobs_loaded, self.jobs_deferred ) )
         # Ensure that we get new job counts on each iteration
         self.__clear_job_count()
+        if self.running_job_counts is not None and self.running_job_counts.reconcile_due():
+            self.running_job_counts.reconcile( self.sa_session )
         # Check resubmit jobs first so that limits of new jobs will still be enforced
         for job in resubmit_jobs:
             log.debug( '(%s) Job was resubmitted and is being dispatched immediately', job.id )
             # Reassemble resubmit job destination from persisted value
             jw = self.job_wrapper( job )
             jw.job_runner_mapper.cached_job_destination = JobDestination( id=job.destination_id, runner=job.job_runner_name, params=job.destination_params )
-            self.increase_running_job_count(job.user_id, jw.job_destination.id)
+            self.increase_running_job_count(job.user_id, jw.job_destination.id, job=job)
             self.dispatcher.put( jw )
         # Iterate over new and waiting jobs and look for any that are
         # ready to run
@@ -273,6 +327,10 @@ class JobHandlerQueue( object ):
                 job_state = self.__check_job_state( job )
                 if job_state == JOB_WAIT:
                     new_waiting_jobs.append( job.id )
+                    if self.event_driven:
+                        # Inputs are ready (the job would not have been
+                        # fetched otherwise), so it is waiting on limits
+                        self.recheck_job_ids.add( job.id )
                 elif job_state == JOB_INPUT_ERROR:
                     log.info( "(%d) Job unable to run: one or more inputs in error state" % job.id )
                 elif job_state == JOB_INPUT_DELETED:
@@ -301,16 +359,154 @@ class JobHandlerQueue( object ):
                 log.exception( "failure running job %d" % job.id )
         # Update the waiting list
         if not self.track_jobs_in_database:
-            self.waiting_jobs = new_waiting_jobs
+            self.waiting_jobs = new_waiting_jobs + deferred_job_ids
         # Remove cached wrappers for any jobs that are no longer being tracked
+        tracked_job_ids = set( new_waiting_jobs ).union( deferred_job_ids )
         for id in self.job_wrappers.keys():
-            if id not in new_waiting_jobs:
+            if id not in tracked_job_ids:
                 del self.job_wrappers[id]
         # Flush, if we updated the state
         self.sa_session.flush()
         # Done with the session
         self.sa_session.remove()
 
+    def __fetch_ready_jobs( self, job_ids=None, after_job_id=None, limit=None ):
+        """
+        Fetch the new jobs for this handler whose inputs are all ready,
+        optionally restricted to the given job ids or to at most `limit` jobs
+        with ids above `after_job_id`.
+        """
+        hda_not_ready = self.sa_session.query(model.Job.id).enable_eagerloads(False) \
+                .join(model.JobToInputDatasetAssociation) \
+                .join(model.HistoryDatasetAssociation) \
+                .join(model.Dataset) \
+                .filter(and_( (model.Job.state == model.Job.states.NEW ),
+                             or_( ( model.HistoryDatasetAssociation._state == model.HistoryDatasetAssociation.states.FAILED_METADATA ),
+                                  ( model.HistoryDatasetAssociation.deleted == True ),
+                                  ( model.Dataset.state != model.Dataset.states.OK ),
+                                  ( model.Dataset.deleted == True) ) ) )
+        ldda_not_ready = self.sa_session.query(model.Job.id).enable_eagerloads(False) \
+                .join(model.JobToInputLibraryDatasetAssociation) \
+                .join(model.LibraryDatasetDatasetAssociation) \
+                .join(model.Dataset) \
+                .filter(and_((model.Job.state == model.Job.states.NEW),
+                             or_((model.LibraryDatasetDatasetAssociation._state != None),
+                                 (model.LibraryDatasetDatasetAssociation.deleted == True),
+                                 (model.Dataset.state != model.Dataset.states.OK),
+                                 (model.Dataset.deleted == True))))
+        if job_ids is not None:
+            hda_not_ready = hda_not_ready.filter(model.Job.id.in_(job_ids))
+            ldda_not_ready = ldda_not_ready.filter(model.Job.id.in_(job_ids))
+        hda_not_ready = hda_not_ready.subquery()
+        ldda_not_ready = ldda_not_ready.subquery()
+        if self.app.config.user_activation_on:
+            query = self.sa_session.query(model.Job).options(*JOB_LOAD_OPTIONS) \
+                    .outerjoin( model.User ) \
+                    .filter(and_((model.Job.state == model.Job.states.NEW),
+                                or_((model.Job.user_id == None), (model.User.active == True)),
+                                 (model.Job.handler == self.app.config.server_name),
+                                 ~model.Job.table.c.id.in_(hda_not_ready),
+                                 ~model.Job.table.c.id.in_(ldda_not_ready)))
+        else:
+            query = self.sa_session.query(model.Job).options(*JOB_LOAD_OPTIONS) \
+                .filter(and_((model.Job.state == model.Job.states.NEW),
+                             (model.Job.handler == self.app.config.server_name),
+                             ~model.Job.table.c.id.in_(hda_not_ready),
+                             ~model.Job.table.c.id.in_(ldda_not_ready)))
+        if job_ids is not None:
+            query = query.filter(model.Job.id.in_(job_ids))
+        if after_job_id:
+            query = query.filter(model.Job.id > after_job_id)
+        query = query.order_by(model.Job.id)
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+
+    def __reconcile_due( self ):
+        if self.job_id_cursor:
+            # A sweep split up by the per iteration cap is still in progress
+            return True
+        now = time.time()
+        if self.last_reconcile is None or now - self.last_reconcile >= self.reconcile_interval:
+            self.last_reconcile = now
+            return True
+        return False
+
+    def __reset_event_driven_job_ids( self ):
+        with self.notified_job_ids_lock:
+            self.notified_job_ids = set()
+        self.recheck_job_ids = set()
+        # Jobs created after this point will be picked up by the new job check
+        max_job_id = self.sa_session.query(func.max(model.Job.id)).scalar()
+        self.max_seen_job_id = max( self.max_seen_job_id, max_job_id or 0 )
+
+    def __event_driven_job_ids( self ):
+        """
+        Collect the ids of jobs that may have become ready since the last
+        iteration: jobs created since then, jobs whose inputs have been reported
+        ready and jobs that were previously held back by limits.
+
+        Jobs that are missed here (e.g. jobs resumed from the paused state or
+        inputs that became ready outside of a job) are picked up by the
+        periodic reconciliation sweep.
+        """
+        new_jobs = self.sa_session.query(model.Job.id).enable_eagerloads(False) \
+                .filter(and_((model.Job.state == model.Job.states.NEW),
+                             (model.Job.handler == self.app.config.server_name),
+                             (model.Job.id > self.max_seen_job_id)))
+        new_job_ids = [ row[0] for row in new_jobs ]
+        if new_job_ids:
+            self.max_seen_job_id = max( new_job_ids )
+        with self.notified_job_ids_lock:
+            notified_job_ids = self.notified_job_ids
+            self.notified_job_ids = set()
+        job_ids = self.recheck_job_ids.union( notified_job_ids, new_job_ids )
+        self.recheck_job_ids = set()
+        return sorted( job_ids )
+
+    def notify_jobs_ready( self, job_ids ):
+        """
+        Report that the inputs of the given jobs may have become ready, used
+        when event driven readiness is enabled.
+        """
+        if not self.event_driven or not job_ids:
+            return
+        with self.notified_job_ids_lock:
+            self.notified_job_ids.update( job_ids )
+        self.sleeper.wake()
+
+    def notify_datasets_ready( self, dataset_ids ):
+        """
+        Report that the given datasets are now in the OK state. New jobs that
+        consume them are passed to `notify_jobs_ready` of the handler that
+        owns them, handlers in other processes are notified via the control
+        queue.
+        """
+        if not self.event_driven or not dataset_ids:
+            return
+        hda_jobs = self.sa_session.query(model.Job.id, model.Job.handler).enable_eagerloads(False) \
+                .join(model.JobToInputDatasetAssociation) \
+                .join(model.HistoryDatasetAssociation) \
+                .filter(and_((model.Job.state == model.Job.states.NEW),
+                             (model.HistoryDatasetAssociation.dataset_id.in_(dataset_ids))))
+        ldda_jobs = self.sa_session.query(model.Job.id, model.Job.handler).enable_eagerloads(False) \
+                .join(model.JobToInputLibraryDatasetAssociation) \
+                .join(model.LibraryDatasetDatasetAssociation) \
+                .filter(and_((model.Job.state == model.Job.states.NEW),
+                             (model.LibraryDatasetDatasetAssociation.dataset_id.in_(dataset_ids))))
+        job_ids_by_handler = {}
+        for job_id, handler in hda_jobs.union(ldda_jobs):
+            job_ids_by_handler.setdefault( handler, set() ).add( job_id )
+        local_job_ids = job_ids_by_handler.pop( self.app.config.server_name, None )
+        if local_job_ids:
+            self.notify_jobs_ready( local_job_ids )
+        remote_job_ids = []
+        for job_ids in job_ids_by_handler.values():
+            remote_job_ids.extend( job_ids )
+        if remote_job_ids:
+            from galaxy.queue_worker import send_control_task
+            send_control_task( self.app, 'job_inputs_ready', noop_self=True, kwargs={ 'job_ids': sorted( remote_job_ids ) } )
+
     def __check_job_state( self, job ):
         """
         Check if a job is ready to run by verifying that each of its input
@@ -343,7 +539,7 @@ class JobHandlerQueue( object ):
 
         if state == JOB_READY:
             # PASS.  increase usage by one job (if caching) so that multiple jobs aren't dispatched on this queue iteration
-            self.increase_running_job_count(job.user_id, job_destination.id )
+            self.increase_running_job_count(job.user_id, job_destination.id, job=job )
         return state
 
     def __verify_job_ready( self, job, job_wrapper ):
@@ -423,7 +619,17 @@ class JobHandlerQueue( object ):
         self.user_job_count_per_destination = None
         self.total_job_count_per_destination = None
 
+    def job_state_changed( self, job ):
+        """
+        Called by job wrappers after persisting a change to a job's state or
+        destination.
+        """
+        if self.running_job_counts is not None:
+            self.running_job_counts.update( job.id, job.user_id, job.session_id, job.destination_id, job.state )
+
     def get_user_job_count(self, user_id):
+        if self.running_job_counts is not None:
+            return self.running_job_counts.user_job_count.get(user_id, 0)
         self.__cache_user_job_count()
         # This could have been incremented by a previous job dispatched on this iteration, even if we're not caching
         rval = self.user_job_count.get(user_id, 0)
@@ -454,6 +660,8 @@ class JobHandlerQueue( object ):
             self.user_job_count = {}
 
     def get_user_job_count_per_destination(self, user_id):
+        if self.running_job_counts is not None:
+            return self.running_job_counts.user_job_count_per_destination.get(user_id, {})
         self.__cache_user_job_count_per_destination()
         cached = self.user_job_count_per_destination.get(user_id, {})
         if self.app.config.cache_user_job_count:
@@ -487,7 +695,12 @@ class JobHandlerQueue( object ):
         elif self.user_job_count_per_destination is None:
             self.user_job_count_per_destination = {}
 
-    def increase_running_job_count(self, user_id, destination_id):
+    def increase_running_job_count(self, user_id, destination_id, job=None):
+        if self.running_job_counts is not None and job is not None:
+            # The job is still new, count it as queued at its destination
+            # until the runner updates its state
+            self.running_job_counts.update( job.id, user_id, job.session_id, destination_id, model.Job.states.QUEUED )
+            return
         if self.app.job_config.limits.registered_user_concurrent_jobs or \
            self.app.job_config.limits.anonymous_user_concurrent_jobs or \
            self.app.job_config.limits.destination_user_concurrent_jobs:
@@ -538,10 +751,13 @@ class JobHandlerQueue( object ):
         elif job.galaxy_session:
             # Anonymous users only get the hard limit
             if self.app.job_config.limits.anonymous_user_concurrent_jobs:
-                count = self.sa_session.query( model.Job ).enable_eagerloads( False ) \
-                            .filter( and_( model.Job.session_id == job.galaxy_session.id,
-                                           or_( model.Job.state == model.Job.states.RUNNING,
-                                                model.Job.state == model.Job.states.QUEUED ) ) ).count()
+                if self.running_job_counts is not None:
+                    count = self.running_job_counts.session_job_count.get( job.session_id, 0 )
+                else:
+                    count = self.sa_session.query( model.Job ).enable_eagerloads( False ) \
+                                .filter( and_( model.Job.session_id == job.galaxy_session.id,
+                                               or_( model.Job.state == model.Job.states.RUNNING,
+                                                    model.Job.state == model.Job.states.QUEUED ) ) ).count()
                 if count >= self.app.job_config.limits.anonymous_user_concurrent_jobs:
                     return JOB_WAIT
         else:
@@ -559,6 +775,8 @@ class JobHandlerQueue( object ):
                 self.total_job_count_per_destination[row['destination_id']] = row['job_count']
 
     def get_total_job_count_per_destination(self):
+        if self.running_job_counts is not None:
+            return self.running_job_counts.total_job_count_per_destination
         self.__cache_total_job_count_per_destination()
         # Always use caching (at worst a job will have to wait one iteration,
         # and this would be more fair anyway as it ensures FIFO scheduling,
@@ -609,15 +827,94 @@ class JobHandlerQueue( object ):
             self.dispatcher.shutdown()
 
 
+class RunningJobCounts( object ):
+    """
+    Counts of the jobs that count against the concurrency limits by user, by
+    user and destination, by destination and by session.
+
+    The counts are rebuilt from the database by `reconcile` and are updated in
+    between as this handler dispatches jobs and its job wrappers change job
+    states, so limit checks are simple lookups.  Jobs dispatched or finished by
+    other handlers are only reflected after the next reconciliation.
+    """
+    # Jobs counted against the per user limit
+    user_states = ( model.Job.states.QUEUED, model.Job.states.RUNNING, model.Job.states.RESUBMITTED )
+    # Jobs counted against the per destination and per session limits
+    destination_states = ( model.Job.states.QUEUED, model.Job.states.RUNNING )
+
+    def __init__( self, reconcile_interval ):
+        self.reconcile_interval = reconcile_interval
+        self.last_reconcile = None
+        self.lock = threading.Lock()
+        self.__reset()
+
+    def __reset( self ):
+        # job id -> ( user_id, session_id, destination_id, state ) of each counted job
+        self.jobs = {}
+        self.user_job_count = {}
+        self.user_job_count_per_destination = {}
+        self.total_job_count_per_destination = {}
+        self.session_job_count = {}
+
+    def reconcile_due( self ):
+        return self.last_reconcile is None or time.time() - self.last_reconcile >= self.reconcile_interval
+
+    def reconcile( self, sa_session ):
+        """
+        Rebuild the counts from the jobs in the database.
+        """
+        self.last_reconcile = time.time()
+        job_table = model.Job.table
+        result = sa_session.execute(select([job_table.c.id, job_table.c.user_id, job_table.c.session_id, job_table.c.destination_id, job_table.c.state])
+                                    .where(job_table.c.state.in_(self.user_states)))
+        with self.lock:
+            self.__reset()
+            for row in result:
+                self.__add( row[0], ( row[1], row[2], row[3], row[4] ) )
+
+    def update( self, job_id, user_id, session_id, destination_id, state ):
+        """
+        Record the current state and destination of a job.
+        """
+        with self.lock:
+            self.__remove( job_id )
+            if state in self.user_states:
+                self.__add( job_id, ( user_id, session_id, destination_id, state ) )
+
+    def __add( self, job_id, entry ):
+        self.jobs[ job_id ] = entry
+        self.__change( entry, 1 )
+
+    def __remove( self, job_id ):
+        entry = self.jobs.pop( job_id, None )
+        if entry is not None:
+            self.__change( entry, -1 )
+
+    def __change( self, entry, delta ):
+        user_id, session_id, destination_id, state = entry
+        if user_id is not None:
+            self.user_job_count[ user_id ] = self.user_job_count.get( user_id, 0 ) + delta
+        if state not in self.destination_states:
+            return
+        if user_id is not None:
+            per_destination = self.user_job_count_per_destination.setdefault( user_id, {} )
+            per_destination[ destination_id ] = per_destination.get( destination_id, 0 ) + delta
+        self.total_job_count_per_destination[ destination_id ] = self.total_job_count_per_destination.get( destination_id, 0 ) + delta
+        if session_id is not None:
+            self.session_job_count[ session_id ] = self.session_job_count.get( session_id, 0 ) + delta
+
+
 class JobHandlerStopQueue( object ):
     """
     A queue for jobs which need to be terminated prematurely.
     """
     STOP_SIGNAL = object()
 
-    def __init__( self, app, dispatcher ):
+    def __init__( self, app, dispatcher, job_queue=None ):
         self.app = app
         self.dispatcher = dispatcher
+        # Used to report state changes of stopped jobs
+        self.job_queue = job_queue
 
         self.sa_session = app.model.context
 
@@ -693,6 +990,8 @@ class JobHandlerStopQueue( object ):
             job.set_final_state( final_state )
             self.sa_session.add( job )
             self.sa_session.flush()
+            if self.job_queue is not None:
+                self.job_queue.job_state_changed( job )
             if job.job_runner_name is not None:
                 # tell the dispatcher to stop the job
                 self.dispatcher.stop( job )
@@ -1,12 +1,22 @@
+import codecs
 import re
 from .error_level import StdioErrorLevel
 import traceback
 
+from galaxy.util import DEFAULT_ENCODING
+
 from logging import getLogger
 log = getLogger( __name__ )
 
+# stdout and stderr files are scanned in chunks of this many bytes.
+CHUNK_SIZE = 1048576
+# Matches spanning two chunks are found if they are no longer than this.
+CHUNK_OVERLAP = 4096
+
+__compiled_regexes = {}
+
 
-def check_output( tool, stdout, stderr, tool_exit_code, job ):
+def check_output( tool, stdout, stderr, tool_exit_code, job, stdout_path=None, stderr_path=None ):
     """
     Check the output of a tool - given the stdout, stderr, and the tool's
     exit code, return True if the tool exited succesfully and False
@@ -18,6 +28,12 @@ def check_output( tool, stdout, stderr, tool_exit_code, job ):
     any stdio/stderr handling, then it reverts back to previous behavior:
     if stderr contains anything, then False is returned.
 
+    The stdout and stderr passed in are usually only the beginning and end
+    of the tool's output (see ``DATABASE_MAX_STRING_SIZE``). If the files
+    they were read from are given as ``stdout_path`` and ``stderr_path``,
+    the regular expressions are matched against the complete files instead,
+    which are streamed in chunks rather than read into memory.
+
     Note that the job id is just for messages.
     """
     # By default, the tool succeeded. This covers the case where the code
@@ -39,6 +55,9 @@ def check_output( tool, stdout, stderr, tool_exit_code, job ):
             # that range, then apply the error level and add a message.
             # If we've reached a fatal error rule, then stop.
             max_error_level = StdioErrorLevel.NO_ERROR
+            # Messages are prepended to stdout and stderr, most recent first
+            stdout_msgs = []
+            stderr_msgs = []
             if tool_exit_code != None:
                 for stdio_exit_code in tool.stdio_exit_codes:
                     if ( tool_exit_code >= stdio_exit_code.range_start and
@@ -54,7 +73,7 @@ def check_output( tool, stdout, stderr, tool_exit_code, job ):
                                      tool_exit_code,
                                      code_desc ) )
                         log.info( "Job %s: %s" % (job.get_id_tag(), tool_msg) )
-                        stderr = tool_msg + "\n" + stderr
+                        stderr_msgs.insert( 0, tool_msg )
                         max_error_level = max( max_error_level,
                                                stdio_exit_code.error_level )
                         if ( max_error_level >=
@@ -71,40 +90,38 @@ def check_output( tool, stdout, stderr, tool_exit_code, job ):
                 # If warning, then we still set the job's state to OK
                 # but include a message. We'll do this if we haven't seen
                 # a fatal error yet
-                for regex in tool.stdio_regexes:
-                    # If ( this regex should be matched against stdout )
-                    #   - Run the regex's match pattern against stdout
-                    #   - If it matched, then determine the error level.
+                regexes = list( tool.stdio_regexes )
+                # Find the first match of each regex, first in stdout and
+                # then in stderr. Regexes after the first one matching with
+                # a fatal error level are never reported, so they are no
+                # longer looked for once such a match is found.
+                stdout_matches = _search_output( regexes, "stdout_match", stdout, stdout_path )
+                stderr_matches = _search_output( regexes[ :_fatal_cutoff( regexes, stdout_matches ) ], "stderr_match", stderr, stderr_path )
+                for i, regex in enumerate( regexes ):
+                    # If ( this regex matched stdout )
+                    #   - determine the error level.
                     #       o If it was fatal, then we're done - break.
                     # Repeat the stdout stuff for stderr.
-                    # TODO: Collapse this into a single function.
-                    if ( regex.stdout_match ):
-                        regex_match = re.search( regex.match, stdout,
-                                                 re.IGNORECASE )
-                        if ( regex_match ):
-                            rexmsg = __regex_err_msg( regex_match, regex)
-                            log.info( "Job %s: %s"
-                                    % ( job.get_id_tag(), rexmsg ) )
-                            stdout = rexmsg + "\n" + stdout
-                            max_error_level = max( max_error_level,
-                                                   regex.error_level )
-                            if ( max_error_level >=
-                                 StdioErrorLevel.FATAL ):
-                                break
-
-                    if ( regex.stderr_match ):
-                        regex_match = re.search( regex.match, stderr,
-                                                 re.IGNORECASE )
-                        if ( regex_match ):
-                            rexmsg = __regex_err_msg( regex_match, regex)
-                            log.info( "Job %s: %s"
-                                    % ( job.get_id_tag(), rexmsg ) )
-                            stderr = rexmsg + "\n" + stderr
-                            max_error_level = max( max_error_level,
-                                                   regex.error_level )
-                            if ( max_error_level >=
-                                 StdioErrorLevel.FATAL ):
-                                break
+                    for regex_match, msgs in ( ( stdout_matches.get( i ), stdout_msgs ), ( stderr_matches.get( i ), stderr_msgs ) ):
+                        if regex_match is None:
+                            continue
+                        rexmsg = __regex_err_msg( regex_match, regex)
+                        log.info( "Job %s: %s"
+                                % ( job.get_id_tag(), rexmsg ) )
+                        msgs.insert( 0, rexmsg )
+                        max_error_level = max( max_error_level,
+                                               regex.error_level )
+                        if ( max_error_level >=
+                             StdioErrorLevel.FATAL ):
+                            break
+                    if ( max_error_level >=
+                         StdioErrorLevel.FATAL ):
+                        break
+
+            if stdout_msgs:
+                stdout = "\n".join( stdout_msgs + [ stdout ] )
+            if stderr_msgs:
+                stderr = "\n".join( stderr_msgs + [ stderr ] )
 
             # If we encountered a fatal error, then we'll need to set the
             # job state accordingly. Otherwise the job is ok:
@@ -140,6 +157,78 @@ def check_output( tool, stdout, stderr, tool_exit_code, job ):
     return success
 
 
+def _compile_regex( regex ):
+    pattern = __compiled_regexes.get( regex.match )
+    if pattern is None:
+        pattern = re.compile( regex.match, re.IGNORECASE )
+        __compiled_regexes[ regex.match ] = pattern
+    return pattern
+
+
+def _fatal_cutoff( regexes, matches ):
+    """
+    Return the number of leading regexes that may still be reported given
+    the first matches found so far: anything after the first regex that
+    matched with a fatal error level is never reported.
+    """
+    for i in sorted( matches ):
+        if regexes[ i ].error_level >= StdioErrorLevel.FATAL:
+            return i
+    return len( regexes )
+
+
+def _search_output( regexes, source_attribute, output, path=None ):
+    """
+    Return a dictionary mapping the indices of the regexes in ``regexes``
+    that apply to this output (``source_attribute`` being ``stdout_match``
+    or ``stderr_match``) to their first match in it, reading the output
+    from ``path`` in chunks if given and ``output`` otherwise.
+    """
+    patterns = dict( ( i, _compile_regex( regex ) ) for i, regex in enumerate( regexes ) if getattr( regex, source_attribute ) )
+    matches = {}
+    if not patterns:
+        return matches
+    if path is None:
+        _search_chunk( regexes, patterns, matches, output, 0, len( output ) + 1 )
+        return matches
+    # Decode like the stdout and stderr strings (see galaxy.util.unicodify)
+    decoder = codecs.getincrementaldecoder( DEFAULT_ENCODING )( 'replace' )
+    with open( path, "r" ) as f:
+        buffer = u""
+        pos = 0
+        while patterns:
+            data = f.read( CHUNK_SIZE )
+            final = len( data ) < CHUNK_SIZE
+            buffer += decoder.decode( data, final )
+            # Only accept matches starting before the part of the buffer that
+            # is carried over to the next chunk, they are found again there.
+            # Searching from ``pos`` rather than the start of the buffer keeps
+            # ^ from matching at the start of the carried over text.
+            accept_before = len( buffer ) + 1 if final else len( buffer ) - CHUNK_OVERLAP
+            _search_chunk( regexes, patterns, matches, buffer, pos, accept_before )
+            if final:
+                break
+            buffer = buffer[ -( CHUNK_OVERLAP + 1 ): ]
+            pos = 1
+    return matches
+
+
+def _search_chunk( regexes, patterns, matches, buffer, pos, accept_before ):
+    for i in sorted( patterns ):
+        if i not in patterns:
+            # Dropped below after a fatal match
+            continue
+        regex_match = patterns[ i ].search( buffer, pos )
+        if regex_match is None or regex_match.start() >= accept_before:
+            continue
+        matches[ i ] = regex_match
+        del patterns[ i ]
+        if regexes[ i ].error_level >= StdioErrorLevel.FATAL:
+            for j in list( patterns ):
+                if j > i:
+                    del patterns[ j ]
+
+
 def __regex_err_msg( match, regex ):
     """
     Return a message about the match on tool output using the given
@@ -30,6 +30,10 @@ log = logging.getLogger( __name__ )
 
 STOP_SIGNAL = object()
 
+# With job_status_poll_max_interval set, a watched job is checked again after
+# this fraction of the time since its state last changed.
+STATUS_POLL_BACKOFF = 0.1
+
 
 JOB_RUNNER_PARAMETER_UNKNOWN_MESSAGE = "Invalid job runner parameter for this plugin: %s"
 JOB_RUNNER_PARAMETER_MAP_PROBLEM_MESSAGE = "Job runner parameter '%s' value '%s' could not be converted to the correct type"
@@ -50,8 +54,70 @@ class RunnerParams( ParamsWithSpecs ):
         raise Exception( JOB_RUNNER_PARAMETER_VALIDATION_FAILED_MESSAGE % name )
 
 
+class RunnerStageGauge( object ):
+    """
+    Queue depth and latency gauges for one stage (job preparation or
+    submission) of a job runner.
+    """
+
+    def __init__( self, name, queue ):
+        self.name = name
+        self.queue = queue
+        self.lock = threading.Lock()
+        self.enqueue_times = {}
+        self.waited = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.processed = 0
+        self.total_run_time = 0.0
+        self.max_run_time = 0.0
+
+    @property
+    def depth( self ):
+        return self.queue.qsize()
+
+    def enqueued( self, key ):
+        with self.lock:
+            self.enqueue_times[ key ] = time.time()
+
+    def started( self, key ):
+        """Record the time ``key`` spent waiting in the queue and return the
+        time processing started.
+        """
+        start = time.time()
+        with self.lock:
+            enqueue_time = self.enqueue_times.pop( key, None )
+            if enqueue_time is not None:
+                wait_time = start - enqueue_time
+                self.waited += 1
+                self.total_wait_time += wait_time
+                self.max_wait_time = max( self.max_wait_time, wait_time )
+        return start
+
+    def finished( self, start ):
+        run_time = time.time() - start
+        with self.lock:
+            self.processed += 1
+            self.total_run_time += run_time
+            self.max_run_time = max( self.max_run_time, run_time )
+
+    def to_dict( self ):
+        with self.lock:
+            return dict(
+                depth=self.depth,
+                processed=self.processed,
+                mean_wait_time=self.total_wait_time / max( self.waited, 1 ),
+                max_wait_time=self.max_wait_time,
+                mean_run_time=self.total_run_time / max( self.processed, 1 ),
+                max_run_time=self.max_run_time,
+            )
+
+
 class BaseJobRunner( object ):
     DEFAULT_SPECS = dict( recheck_missing_job_retries=dict( map=int, valid=lambda x: x >= 0, default=0 ) )
+    # Runners preparing jobs themselves (e.g. against a remote compute
+    # environment) should disable the separate preparation stage.
+    supports_preparation_stage = True
 
     def __init__( self, app, nworkers, **kwargs ):
         """Start the job runner
@@ -78,12 +144,35 @@ class BaseJobRunner( object ):
             worker.setDaemon( True )
             worker.start()
             self.work_threads.append( worker )
+        self.stage_gauges = dict( submit=RunnerStageGauge( "submit", self.work_queue ) )
+        self._init_preparation_threads()
+
+    def _init_preparation_threads(self):
+        """Start ``job_preparation_workers`` threads preparing jobs (building
+        their command lines, config files and working directories) ahead of
+        the worker threads that submit them.
+        """
+        self.prepare_queue = None
+        self.prepare_threads = []
+        nworkers = self.app.config.job_preparation_workers
+        if not nworkers or not self.supports_preparation_stage:
+            return
+        self.prepare_queue = Queue( self.app.config.job_preparation_queue_size )
+        self.stage_gauges[ "prepare" ] = RunnerStageGauge( "prepare", self.prepare_queue )
+        log.debug('Starting %s %s preparation workers' % (nworkers, self.runner_name))
+        for i in range(nworkers):
+            worker = threading.Thread( name="%s.prepare_thread-%d" % (self.runner_name, i), target=self.prepare_next )
+            worker.setDaemon( True )
+            worker.start()
+            self.prepare_threads.append( worker )
 
-    def run_next(self):
+    def run_next(self, work_queue=None, gauge=None):
         """Run the next item in the work queue (a job waiting to run)
         """
+        if work_queue is None:
+            work_queue = self.work_queue
         while 1:
-            ( method, arg ) = self.work_queue.get()
+            ( method, arg ) = work_queue.get()
             if method is STOP_SIGNAL:
                 return
             # id and name are collected first so that the call of method() is the last exception.
@@ -96,10 +185,42 @@ class BaseJobRunner( object ):
                 name = method.__name__
             except:
                 name = 'unknown'
+            if method == self.queue_job:
+                stage_gauge = self.stage_gauges[ "submit" ]
+            else:
+                stage_gauge = gauge
+            if stage_gauge is not None:
+                start = stage_gauge.started( job_id )
             try:
                 method(arg)
             except:
                 log.exception( "(%s) Unhandled exception calling %s" % ( job_id, name ) )
+            if stage_gauge is not None:
+                stage_gauge.finished( start )
+
+    def prepare_next(self):
+        """Prepare the next job in the preparation queue and hand it to the
+        worker threads for submission.
+        """
+        gauge = self.stage_gauges[ "prepare" ]
+        while 1:
+            job_wrapper = self.prepare_queue.get()
+            if job_wrapper is STOP_SIGNAL:
+                return
+            try:
+                job_id = job_wrapper.get_id_tag()
+            except:
+                job_id = 'unknown'
+            start = gauge.started( job_id )
+            try:
+                prepared = self.stage_job( job_wrapper )
+            except:
+                log.exception( "(%s) Unhandled exception preparing job" % job_id )
+                prepared = False
+            gauge.finished( start )
+            if prepared:
+                self.mark_as_prepared( job_wrapper )
+                log.debug( "(%s) Job prepared for submission, %s jobs waiting for preparation, %s waiting for submission" % ( job_id, gauge.depth, self.stage_gauges[ "submit" ].depth ) )
 
     # Causes a runner's `queue_job` method to be called from a worker thread
     def put(self, job_wrapper):
@@ -114,14 +235,30 @@ class BaseJobRunner( object ):
         log.debug("Job [%s] queued %s" % (job_wrapper.job_id, put_timer))
 
     def mark_as_queued(self, job_wrapper):
+        if self.prepare_queue is not None:
+            self.stage_gauges[ "prepare" ].enqueued( job_wrapper.get_id_tag() )
+            self.prepare_queue.put( job_wrapper )
+        else:
+            self.mark_as_prepared( job_wrapper )
+
+    def mark_as_prepared(self, job_wrapper):
+        self.stage_gauges[ "submit" ].enqueued( job_wrapper.get_id_tag() )
         self.work_queue.put( ( self.queue_job, job_wrapper ) )
 
+    def get_stage_stats(self):
+        """Return the queue depth and latency gauges of each stage of this
+        runner's pipeline as a dictionary keyed by stage name.
+        """
+        return dict( ( name, gauge.to_dict() ) for name, gauge in self.stage_gauges.items() )
+
     def shutdown( self ):
         """Attempts to gracefully shut down the worker threads
         """
         log.info( "%s: Sending stop signal to %s worker threads" % ( self.runner_name, len( self.work_threads ) ) )
         for i in range( len( self.work_threads ) ):
             self.work_queue.put( ( STOP_SIGNAL, None ) )
+        for i in range( len( self.prepare_threads ) ):
+            self.prepare_queue.put( STOP_SIGNAL )
 
     # Most runners should override the legacy URL handler methods and destination param method
     def url_to_destination(self, url):
@@ -158,9 +295,12 @@ class BaseJobRunner( object ):
             # cleanup may not be safe in all states
             return False
 
-        # Prepare the job
+        # Prepare the job, unless the preparation stage already has
+        is_prepared = getattr( job_wrapper, 'is_prepared', False )
+        job_wrapper.is_prepared = False
         try:
-            job_wrapper.prepare()
+            if not is_prepared:
+                job_wrapper.prepare()
             job_wrapper.runner_command_line = self.build_command_line(
                 job_wrapper,
                 include_metadata=include_metadata,
@@ -177,6 +317,25 @@ class BaseJobRunner( object ):
 
         return True
 
+    def stage_job(self, job_wrapper):
+        """Prepare a job on a preparation thread ahead of ``prepare_job``.
+
+        Returns False if the job failed to prepare and should not be handed
+        to the worker threads. Jobs that are no longer queued are passed on
+        untouched, ``prepare_job`` deals with them.
+        """
+        job_wrapper.is_prepared = False
+        if job_wrapper.get_state() != model.Job.states.QUEUED:
+            return True
+        try:
+            job_wrapper.prepare()
+        except:
+            log.exception( "(%s) Failure preparing job" % job_wrapper.get_id_tag() )
+            job_wrapper.fail( "failure preparing job", exception=True )
+            return False
+        job_wrapper.is_prepared = True
+        return True
+
     # Runners must override the job handling methods
     def queue_job(self, job_wrapper):
         raise NotImplementedError()
@@ -405,6 +564,8 @@ class AsynchronousJobState( JobState ):
         self._running = False
         self.check_count = 0
         self.start_time = None
+        self.last_state_change = time.time()
+        self.next_check_time = 0
 
         self.job_wrapper = job_wrapper
         # job_id is the DRM's job id, not the Galaxy job id
@@ -477,6 +638,28 @@ class AsynchronousJobRunner( BaseJobRunner ):
         self.watched = []
         self.monitor_queue = Queue()
 
+    def _init_worker_threads(self):
+        super( AsynchronousJobRunner, self )._init_worker_threads()
+        self._init_finishing_threads()
+
+    def _init_finishing_threads(self):
+        """Start ``job_finishing_workers`` threads finishing jobs, so that
+        many jobs completing at once don't hold up the worker threads.
+        """
+        self.finish_queue = None
+        self.finish_threads = []
+        nworkers = self.app.config.job_finishing_workers
+        if not nworkers:
+            return
+        self.finish_queue = Queue()
+        self.stage_gauges[ "finish" ] = RunnerStageGauge( "finish", self.finish_queue )
+        log.debug('Starting %s %s finishing workers' % (nworkers, self.runner_name))
+        for i in range(nworkers):
+            worker = threading.Thread( name="%s.finish_thread-%d" % (self.runner_name, i), target=self.run_next, args=( self.finish_queue, self.stage_gauges[ "finish" ] ) )
+            worker.setDaemon( True )
+            worker.start()
+            self.finish_threads.append( worker )
+
     def _init_monitor_thread(self):
         self.monitor_thread = threading.Thread( name="%s.monitor_thread" % self.runner_name, target=self.monitor )
         self.monitor_thread.setDaemon( True )
@@ -505,7 +688,7 @@ class AsynchronousJobRunner( BaseJobRunner ):
                 pass
             # Iterate over the list of watched jobs and check state
             try:
-                self.check_watched_items()
+                self._check_due_watched_items()
             except Exception:
                 log.exception('Unhandled exception checking active jobs')
             # Sleep a bit before the next state check
@@ -518,9 +701,52 @@ class AsynchronousJobRunner( BaseJobRunner ):
         """Attempts to gracefully shut down the monitor thread"""
         log.info( "%s: Sending stop signal to monitor thread" % self.runner_name )
         self.monitor_queue.put( STOP_SIGNAL )
+        for i in range( len( self.finish_threads ) ):
+            self.finish_queue.put( ( STOP_SIGNAL, None ) )
         # Call the parent's shutdown method to stop workers
         super( AsynchronousJobRunner, self ).shutdown()
 
+    def _check_due_watched_items( self ):
+        """
+        Check the state of the watched jobs that are due for a check. Unless
+        ``job_status_poll_max_interval`` is set, every watched job is due on
+        every iteration of the monitor thread. Otherwise jobs whose state has
+        not changed for a while are checked less often, up to that interval.
+        """
+        max_interval = self.app.config.job_status_poll_max_interval
+        if not max_interval:
+            self.check_watched_items()
+            return
+        now = time.time()
+        due = []
+        waiting = []
+        for async_job_state in self.watched:
+            if async_job_state.next_check_time <= now:
+                due.append( async_job_state )
+            else:
+                waiting.append( async_job_state )
+        previous_states = dict( ( id( ajs ), ( ajs.old_state, ajs.running ) ) for ajs in due )
+        self.watched = due
+        try:
+            if due:
+                self.check_watched_items()
+        finally:
+            for async_job_state in self.watched:
+                if previous_states.get( id( async_job_state ) ) != ( async_job_state.old_state, async_job_state.running ):
+                    async_job_state.last_state_change = now
+                interval = min( max_interval, ( now - async_job_state.last_state_change ) * STATUS_POLL_BACKOFF )
+                async_job_state.next_check_time = now + interval
+            self.watched.extend( waiting )
+
+    def get_job_states( self, job_states ):
+        """
+        Batched status polling hook: return a dictionary mapping external job
+        ids of the given watched jobs to their (runner specific) states,
+        fetched from the DRM in as few calls as possible. Runners check jobs
+        missing from the result individually.
+        """
+        return {}
+
     def check_watched_items(self):
         """
         This method is responsible for iterating over self.watched and handling
@@ -581,16 +807,22 @@ class AsynchronousJobRunner( BaseJobRunner ):
             log.warning( "(%s/%s) Exit code '%s' invalid. Using 0." % ( galaxy_id_tag, external_job_id, exit_code_str ) )
             exit_code = 0
 
-        # clean up the job files
-        if self.app.config.cleanup_job == "always" or ( not stderr and self.app.config.cleanup_job == "onsuccess" ):
-            job_state.cleanup()
-
         try:
-            job_state.job_wrapper.finish( stdout, stderr, exit_code )
+            # The complete output files are checked against the tool's stdio rules
+            job_state.job_wrapper.finish( stdout, stderr, exit_code, stdout_path=self.__existing_path( job_state.output_file ), stderr_path=self.__existing_path( job_state.error_file ) )
         except:
             log.exception( "(%s/%s) Job wrapper finish method failed" % ( galaxy_id_tag, external_job_id ) )
             job_state.job_wrapper.fail( "Unable to finish job", exception=True )
 
+        # clean up the job files
+        if self.app.config.cleanup_job == "always" or ( not stderr and self.app.config.cleanup_job == "onsuccess" ):
+            job_state.cleanup()
+
+    def __existing_path( self, path ):
+        if path and os.path.exists( path ):
+            return path
+        return None
+
     def fail_job( self, job_state ):
         if getattr( job_state, 'stop_job', True ):
             self.stop_job( self.sa_session.query( self.app.model.Job ).get( job_state.job_wrapper.job_id ) )
@@ -602,8 +834,16 @@ class AsynchronousJobRunner( BaseJobRunner ):
             if self.app.config.cleanup_job == "always":
                 job_state.cleanup()
 
+    def _complete_terminal_job( self, ajs, **kwargs ):
+        if ajs.job_wrapper.get_state() != model.Job.states.DELETED:
+            self.mark_as_finished( ajs )
+
     def mark_as_finished(self, job_state):
-        self.work_queue.put( ( self.finish_job, job_state ) )
+        if self.finish_queue is not None:
+            self.stage_gauges[ "finish" ].enqueued( job_state.job_wrapper.get_id_tag() )
+            self.finish_queue.put( ( self.finish_job, job_state ) )
+        else:
+            self.work_queue.put( ( self.finish_job, job_state ) )
 
     def mark_as_failed(self, job_state):
         self.work_queue.put( ( self.fail_job, job_state ) )
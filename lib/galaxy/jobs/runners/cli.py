@@ -126,7 +126,7 @@ class ShellJobRunner( AsynchronousJobRunner ):
         """
         new_watched = []
 
-        job_states = self.__get_job_states()
+        job_states = self.get_job_states( self.watched )
 
         for ajs in self.watched:
             external_job_id = ajs.job_id
@@ -143,7 +143,7 @@ class ShellJobRunner( AsynchronousJobRunner ):
                 state = job_interface.parse_single_status(cmd_out.stdout, external_job_id)
                 if state == model.Job.states.OK:
                     log.debug('(%s/%s) job execution finished, running job wrapper finish method' % ( id_tag, external_job_id ) )
-                    self.work_queue.put( ( self.finish_job, ajs ) )
+                    self.mark_as_finished( ajs )
                     continue
                 else:
                     log.warning('(%s/%s) job not found in batch state check, but found in individual state check' % ( id_tag, external_job_id ) )
@@ -161,11 +161,11 @@ class ShellJobRunner( AsynchronousJobRunner ):
         # Replace the watch list with the updated version
         self.watched = new_watched
 
-    def __get_job_states(self):
+    def get_job_states( self, watched ):
         job_destinations = {}
         job_states = {}
         # unique the list of destinations
-        for ajs in self.watched:
+        for ajs in watched:
             if ajs.job_destination.id not in job_destinations:
                 job_destinations[ajs.job_destination.id] = dict( job_destination=ajs.job_destination, job_ids=[ ajs.job_id ] )
             else:
@@ -184,12 +184,12 @@ class CondorJobRunner( AsynchronousJobRunner ):
                     if external_metadata:
                         self._handle_metadata_externally( cjs.job_wrapper, resolve_requirements=True )
                     log.debug( "(%s/%s) job has completed" % ( galaxy_id_tag, job_id ) )
-                    self.work_queue.put( ( self.finish_job, cjs ) )
+                    self.mark_as_finished( cjs )
                 continue
             if job_failed:
                 log.debug( "(%s/%s) job failed" % ( galaxy_id_tag, job_id ) )
                 cjs.failed = True
-                self.work_queue.put( ( self.finish_job, cjs ) )
+                self.mark_as_finished( cjs )
                 continue
             cjs.runnning = job_running
             new_watched.append( cjs )
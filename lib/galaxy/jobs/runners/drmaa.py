@@ -250,13 +250,16 @@ class DRMAAJobRunner( AsynchronousJobRunner ):
         with state changes.
         """
         new_watched = []
+        batch_states = self.get_job_states( self.watched )
         for ajs in self.watched:
             external_job_id = ajs.job_id
             galaxy_id_tag = ajs.job_wrapper.get_id_tag()
             old_state = ajs.old_state
             try:
                 assert external_job_id not in ( None, 'None' ), '(%s/%s) Invalid job id' % ( galaxy_id_tag, external_job_id )
-                state = self.ds.jobStatus( external_job_id )
+                state = batch_states.get( external_job_id )
+                if state is None:
+                    state = self.ds.jobStatus( external_job_id )
             except ( drmaa.InternalException, drmaa.InvalidJobException ), e:
                 if isinstance( e , drmaa.InvalidJobException ):
                     ecn = "InvalidJobException".lower()
@@ -272,7 +275,7 @@ class DRMAAJobRunner( AsynchronousJobRunner ):
                         continue
                 if self.runner_params[ state_param ] == model.Job.states.OK:
                     log.info( "(%s/%s) job left DRM queue with following message: %s", galaxy_id_tag, external_job_id, e )
-                    self.work_queue.put( ( self.finish_job, ajs ) )
+                    self.mark_as_finished( ajs )
                 elif self.runner_params[ state_param ] == model.Job.states.ERROR:
                     log.info( "(%s/%s) job check resulted in %s after %s tries: %s", galaxy_id_tag, external_job_id, ecn, retries, e )
                     self.work_queue.put( ( self.fail_job, ajs ) )
@@ -114,22 +114,30 @@ class LocalJobRunner( BaseJobRunner ):
             stderr_file.seek( 0 )
             stdout = shrink_stream_by_size( stdout_file, DATABASE_MAX_STRING_SIZE, join_by="\n..\n", left_larger=True, beginning_on_size_error=True )
             stderr = shrink_stream_by_size( stderr_file, DATABASE_MAX_STRING_SIZE, join_by="\n..\n", left_larger=True, beginning_on_size_error=True )
-            stdout_file.close()
-            stderr_file.close()
             log.debug('execution finished: %s' % command_line)
         except Exception:
             log.exception("failure running job %d" % job_wrapper.job_id)
             job_wrapper.fail( "failure running job", exception=True )
             return
-        external_metadata = not asbool( job_wrapper.job_destination.params.get( "embed_metadata_in_job", DEFAULT_EMBED_METADATA_IN_JOB ) )
-        if external_metadata:
-            self._handle_metadata_externally( job_wrapper, resolve_requirements=True )
-        # Finish the job!
         try:
-            job_wrapper.finish( stdout, stderr, exit_code )
-        except:
-            log.exception("Job wrapper finish method failed")
-            job_wrapper.fail("Unable to finish job", exception=True)
+            external_metadata = not asbool( job_wrapper.job_destination.params.get( "embed_metadata_in_job", DEFAULT_EMBED_METADATA_IN_JOB ) )
+            if external_metadata:
+                self._handle_metadata_externally( job_wrapper, resolve_requirements=True )
+            # Finish the job!
+            try:
+                # The complete output files are checked against the tool's stdio rules
+                job_wrapper.finish( stdout, stderr, exit_code, stdout_path=stdout_file.name, stderr_path=stderr_file.name )
+            except:
+                log.exception("Job wrapper finish method failed")
+                job_wrapper.fail("Unable to finish job", exception=True)
+        finally:
+            for output_file in ( stdout_file, stderr_file ):
+                try:
+                    # The temporary file is deleted on close
+                    output_file.close()
+                except OSError:
+                    # Already deleted along with the working directory
+                    pass
 
     def stop_job( self, job ):
         #if our local job has JobExternalOutputMetadata associated, then our primary job has to have already finished
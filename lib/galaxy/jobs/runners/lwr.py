@@ -117,6 +117,7 @@ class LwrJobRunner( AsynchronousJobRunner ):
     LWR Job Runner
     """
     runner_name = "LWRRunner"
+    supports_preparation_stage = False
 
     def __init__( self, app, nworkers, **kwds ):
         """Start the job runner """
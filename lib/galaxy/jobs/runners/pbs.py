@@ -389,7 +389,7 @@ class PBSJobRunner( AsynchronousJobRunner ):
                     if errno == 15001:
                         # 15001 == job not in queue
                         log.debug("(%s/%s) PBS job has left queue" % (galaxy_job_id, job_id) )
-                        self.work_queue.put( ( self.finish_job, pbs_job_state ) )
+                        self.mark_as_finished( pbs_job_state )
                     else:
                         # Unhandled error, continue to monitor
                         log.info("(%s/%s) PBS state check resulted in error (%d): %s" % (galaxy_job_id, job_id, errno, text) )
@@ -423,7 +423,7 @@ class PBSJobRunner( AsynchronousJobRunner ):
                 except AttributeError:
                     # No exit_status, can't verify proper completion so we just have to assume success.
                     log.debug("(%s/%s) PBS job has completed" % ( galaxy_job_id, job_id ) )
-                self.work_queue.put( ( self.finish_job, pbs_job_state ) )
+                self.mark_as_finished( pbs_job_state )
                 continue
             pbs_job_state.old_state = status.job_state
             new_watched.append( pbs_job_state )
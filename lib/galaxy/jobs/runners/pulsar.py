@@ -125,6 +125,7 @@ class PulsarJobRunner( AsynchronousJobRunner ):
     Pulsar Job Runner
     """
     runner_name = "PulsarJobRunner"
+    supports_preparation_stage = False
 
     def __init__( self, app, nworkers, **kwds ):
         """Start the job runner """
@@ -14,11 +14,47 @@ log = logging.getLogger( __name__ )
 __all__ = [ 'SlurmJobRunner' ]
 
 SLURM_MEMORY_LIMIT_EXCEEDED_MSG = 'slurmstepd: error: Exceeded job memory limit'
+# squeue compact states of jobs still in the queue, mapped to the names of
+# their DRMAA states.  Jobs in any other state are checked through DRMAA.
+SLURM_DRMAA_STATES = {
+    'PD': 'QUEUED_ACTIVE',
+    'R': 'RUNNING',
+    'CG': 'RUNNING',
+    'S': 'SYSTEM_SUSPENDED',
+}
 
 
 class SlurmJobRunner( DRMAAJobRunner ):
     runner_name = "SlurmRunner"
 
+    def get_job_states( self, job_states ):
+        """
+        Fetch the states of all watched jobs still in the slurm queue with a
+        single ``squeue`` call rather than one DRMAA status call per job. Jobs
+        that have left the queue are missing from the result and are checked
+        through DRMAA, which takes their exit status into account.
+        """
+        # custom slurm-drmaa-with-cluster-support job ids are left to DRMAA
+        job_ids = [ ajs.job_id for ajs in job_states if ajs.job_id not in ( None, 'None' ) and '.' not in ajs.job_id ]
+        if not job_ids:
+            return {}
+        cmd = [ 'squeue', '-h', '-o', '%i %t', '-j', ','.join( job_ids ) ]
+        try:
+            p = subprocess.Popen( cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE )
+            stdout, stderr = p.communicate()
+        except Exception:
+            log.exception( 'Unable to run squeue, checking job states individually' )
+            return {}
+        if p.returncode != 0:
+            log.debug( '`squeue` returned %s, checking job states individually, stderr: %s', p.returncode, stderr.strip() )
+            return {}
+        rval = {}
+        for line in stdout.splitlines():
+            fields = line.split()
+            if len( fields ) == 2 and fields[1] in SLURM_DRMAA_STATES:
+                rval[ fields[0] ] = getattr( self.drmaa_job_states, SLURM_DRMAA_STATES[ fields[1] ] )
+        return rval
+
     def _complete_terminal_job( self, ajs, drmaa_state, **kwargs ):
         def __get_jobinfo():
             job_id = ajs.job_id
@@ -649,6 +649,37 @@ class ModelSerializer( object ):
 
         return self.serialize( item, all_keys, **context )
 
+    def serialize_many( self, items, view=None, keys=None, default_view=None, **context ):
+        """
+        Serialize each of the model `items` using the same view and/or keys
+        (as in `serialize_to_view`) and return the list of dictionaries.
+
+        Whatever the keys need can be loaded for all the items at once in
+        `prefetch` beforehand.
+        """
+        all_keys = []
+        keys = keys or []
+        if view:
+            all_keys = self._view_to_keys( view ) + keys
+        elif keys:
+            all_keys = keys
+        elif default_view:
+            all_keys = self._view_to_keys( default_view )
+
+        context.update( self.prefetch( items, all_keys, **context ) )
+        # (serialize may alter the list of keys it's passed)
+        return [ self.serialize( item, all_keys[:], **context ) for item in items ]
+
+    def prefetch( self, items, keys, **context ):
+        """
+        Load what serializing `keys` of all `items` requires (in as few queries
+        as possible) before they're serialized by `serialize_many`.
+
+        Return a dictionary of values to add to the context the serializers
+        are called with.
+        """
+        return {}
+
     def _view_to_keys( self, view=None ):
         """
         Converts a known view into a list of keys.
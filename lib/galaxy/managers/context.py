@@ -122,6 +122,19 @@ class ProvidesUserContext( object ):
             roles = []
         return roles
 
+    def get_current_user_role_ids( self ):
+        """
+        Return the set of the ids of the current user's roles, which is cached
+        for the rest of the transaction (as long as the user doesn't change).
+        """
+        user = self.user
+        user_id = user and user.id
+        cached = getattr( self, '_current_user_role_ids', None )
+        if cached is None or cached[ 0 ] != user_id:
+            cached = ( user_id, set( role.id for role in self.get_current_user_roles() ) )
+            self._current_user_role_ids = cached
+        return cached[ 1 ]
+
     def user_is_admin( self ):
         if self.api_inherit_admin:
             return True
@@ -8,10 +8,13 @@ history.
 import os
 import gettext
 
+from sqlalchemy.orm import subqueryload
+
 from galaxy import model
 from galaxy import exceptions
 from galaxy import datatypes
 from galaxy import objectstore
+from galaxy.util import unicodify
 
 from galaxy.managers import datasets
 from galaxy.managers import secured
@@ -22,6 +25,9 @@ from galaxy.managers import users
 import logging
 log = logging.getLogger( __name__ )
 
+#: the number of hdas to prefetch relations of in one query (keeping IN clauses short)
+PREFETCH_CHUNK_SIZE = 500
+
 
 class HDAManager( datasets.DatasetAssociationManager,
                   secured.OwnableManagerMixin,
@@ -172,6 +178,25 @@ class HDAManager( datasets.DatasetAssociationManager,
             .filter( model.JobStateHistory.state == job_states.RESUBMITTED ) )
         return self.app.model.context.query( query.exists() ).scalar()
 
+    def resubmitted_ids( self, hdas ):
+        """
+        Return the set of the ids of those `hdas` whose job was resubmitted at
+        any point (as `has_been_resubmitted` but in a query per chunk of hdas).
+        """
+        session = self.app.model.context
+        JobToOutputDatasetAssociation = model.JobToOutputDatasetAssociation
+        JobStateHistory = model.JobStateHistory
+        resubmitted = set()
+        hda_ids = [ hda.id for hda in hdas ]
+        for i in range( 0, len( hda_ids ), PREFETCH_CHUNK_SIZE ):
+            query = ( session.query( JobToOutputDatasetAssociation.dataset_id )
+                .filter( JobToOutputDatasetAssociation.dataset_id.in_( hda_ids[ i:i + PREFETCH_CHUNK_SIZE ] ) )
+                .filter( JobStateHistory.job_id == JobToOutputDatasetAssociation.job_id )
+                .filter( JobStateHistory.state == model.Job.states.RESUBMITTED )
+                .distinct() )
+            resubmitted.update( hda_id for ( hda_id, ) in query )
+        return resubmitted
+
     def _job_state_history_query( self, hda ):
         """
         Return a query of the job's state history for the job that created this hda.
@@ -309,7 +334,7 @@ class HDASerializer( # datasets._UnflattenedMetadataDatasetAssociationSerializer
             'file_ext'      : self._remap_from( 'extension' ),
             'file_path'     : self._remap_from( 'file_name' ),
 
-            'resubmitted'   : lambda i, k, **c: self.hda_manager.has_been_resubmitted( i ),
+            'resubmitted'   : self.serialize_resubmitted,
 
             'display_apps'  : self.serialize_display_apps,
             'display_types' : self.serialize_old_display_applications,
@@ -326,7 +351,7 @@ class HDASerializer( # datasets._UnflattenedMetadataDatasetAssociationSerializer
 
             # TODO: backwards compat: need to go away
             'download_url'  : lambda i, k, **c: self.url_for( 'history_contents_display',
-                history_id=self.app.security.encode_id( i.history.id ),
+                history_id=self.app.security.encode_id( i.history_id ),
                 history_content_id=self.app.security.encode_id( i.id ) ),
             'parent_id'     : self.serialize_id,
             'accessible'    : lambda *a, **c: True,
@@ -334,14 +359,77 @@ class HDASerializer( # datasets._UnflattenedMetadataDatasetAssociationSerializer
             'type'          : lambda *a, **c: 'file'
         })
 
+    def prefetch( self, hdas, keys, **context ):
+        """
+        Load the tags and annotations of all `hdas`, find which were
+        resubmitted and set up the per datatype caches used by the display and
+        visualization serializers.
+        """
+        prefetched = {}
+        options = []
+        if 'tags' in keys:
+            options.append( subqueryload( 'tags' ) )
+        if 'annotation' in keys:
+            options.append( subqueryload( 'annotations' ) )
+            prefetched[ 'annotations_loaded' ] = True
+        if options:
+            # (attributes not yet loaded on hdas already in the session are
+            # filled in by the query)
+            session = self.app.model.context
+            hda_ids = [ hda.id for hda in hdas ]
+            for i in range( 0, len( hda_ids ), PREFETCH_CHUNK_SIZE ):
+                ( session.query( model.HistoryDatasetAssociation )
+                    .filter( model.HistoryDatasetAssociation.id.in_( hda_ids[ i:i + PREFETCH_CHUNK_SIZE ] ) )
+                    .options( *options ).all() )
+        if 'resubmitted' in keys:
+            prefetched[ 'resubmitted_ids' ] = self.hda_manager.resubmitted_ids( hdas )
+        if set( keys ) & set([ 'display_apps', 'display_types', 'visualizations' ]):
+            prefetched[ 'datatype_cache' ] = {}
+        return prefetched
+
+    def _datatype_cached( self, datatype_cache, hda, key, fn ):
+        # memoize fn( hda.datatype ) across the hdas serialized by serialize_many
+        if datatype_cache is None:
+            return fn( hda.datatype )
+        cache_key = ( hda.datatype.__class__, key )
+        if cache_key not in datatype_cache:
+            datatype_cache[ cache_key ] = fn( hda.datatype )
+        return datatype_cache[ cache_key ]
+
     def serialize_type_id( self, hda, key, **context ):
         return 'dataset-' + self.serializers[ 'id' ]( hda, 'id' )
 
-    def serialize_display_apps( self, hda, key, trans=None, **context ):
+    def serialize_resubmitted( self, hda, key, resubmitted_ids=None, **context ):
+        """
+        Return True if the hda's job was resubmitted at any point.
+        """
+        if resubmitted_ids is not None:
+            return hda.id in resubmitted_ids
+        return self.hda_manager.has_been_resubmitted( hda )
+
+    def serialize_annotation( self, hda, key, user=None, annotations_loaded=False, **context ):
+        """
+        Get and serialize an `hda`'s annotation - from its (prefetched)
+        annotations if `annotations_loaded`.
+        """
+        if not annotations_loaded:
+            return super( HDASerializer, self ).serialize_annotation( hda, key, user=user, **context )
+        # Compare users rather than their ids, those of associations pending
+        # in the session aren't set yet.
+        for annotation_assoc in hda.annotations:
+            if annotation_assoc.user == user:
+                return unicodify( annotation_assoc.annotation )
+        return None
+
+    def serialize_display_apps( self, hda, key, trans=None, datatype_cache=None, **context ):
         """
         Return dictionary containing new-style display app urls.
         """
         display_apps = []
+        # most datatypes have no display applications to filter
+        if not self._datatype_cached( datatype_cache, hda, key, lambda datatype: bool( datatype.display_applications ) ):
+            return display_apps
+
         for display_app in hda.get_display_applications( trans ).itervalues():
 
             app_links = []
@@ -356,7 +444,7 @@ class HDASerializer( # datasets._UnflattenedMetadataDatasetAssociationSerializer
 
         return display_apps
 
-    def serialize_old_display_applications( self, hda, key, trans=None, **context ):
+    def serialize_old_display_applications( self, hda, key, trans=None, datatype_cache=None, **context ):
         """
         Return dictionary containing old-style display app urls.
         """
@@ -365,11 +453,13 @@ class HDASerializer( # datasets._UnflattenedMetadataDatasetAssociationSerializer
             return display_apps
 
         display_link_fn = hda.datatype.get_display_links
-        for display_app in hda.datatype.get_display_types():
+        display_types = self._datatype_cached( datatype_cache, hda, key,
+            lambda datatype: [ ( display_app, datatype.get_display_label( display_app ) )
+                               for display_app in datatype.get_display_types() ] )
+        for display_app, display_label in display_types:
             target_frame, display_links = display_link_fn( hda, display_app, self.app, trans.request.base )
 
             if len( display_links ) > 0:
-                display_label = hda.datatype.get_display_label( display_app )
 
                 app_links = []
                 for display_name, display_link in display_links:
@@ -383,7 +473,7 @@ class HDASerializer( # datasets._UnflattenedMetadataDatasetAssociationSerializer
 
         return display_apps
 
-    def serialize_visualization_links( self, hda, key, trans=None, **context ):
+    def serialize_visualization_links( self, hda, key, trans=None, datatype_cache=None, **context ):
         """
         Return a list of dictionaries with links to visualization pages
         for those visualizations that apply to this hda.
@@ -391,7 +481,9 @@ class HDASerializer( # datasets._UnflattenedMetadataDatasetAssociationSerializer
         # use older system if registry is off in the config
         if not self.app.visualizations_registry:
             return hda.get_visualizations()
-        return self.app.visualizations_registry.get_visualizations( trans, hda )
+        # the registry's lookups of datatype classes by name are shared across hdas
+        datatype_classes = datatype_cache.setdefault( 'datatype_classes', {} ) if datatype_cache is not None else None
+        return self.app.visualizations_registry.get_visualizations( trans, hda, datatype_classes=datatype_classes )
 
     def serialize_urls( self, hda, key, **context ):
         """
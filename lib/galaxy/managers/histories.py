@@ -206,6 +206,7 @@ class HistorySerializer( sharable.SharableModelSerializer, deletable.PurgableSer
             'state',
             'state_details',
             'state_ids',
+            'state_update_time',
             # in the Historys' case, each of these views includes the keys from the previous
         ], include_keys_from='summary' )
 
@@ -227,29 +228,33 @@ class HistorySerializer( sharable.SharableModelSerializer, deletable.PurgableSer
             'contents_url'  : lambda i, k, **c: self.url_for( 'history_contents',
                 history_id=self.app.security.encode_id( i.id ) ),
 
-            'empty'         : lambda i, k, **c: ( len( i.datasets ) + len( i.dataset_collections ) ) <= 0,
-            'count'         : lambda i, k, **c: len( i.datasets ),
+            'empty'         : lambda i, k, **c: ( self.serialize_count( i, k ) + len( i.dataset_collections ) ) <= 0,
+            'count'         : self.serialize_count,
             'hdas'          : lambda i, k, **c: [ self.app.security.encode_id( hda.id ) for hda in i.datasets ],
             'state_details' : self.serialize_state_counts,
             'state_ids'     : self.serialize_state_ids,
+            'state_update_time' : self.serialize_state_update_time,
             'contents'      : self.serialize_contents
         })
 
+    def serialize_count( self, history, key, **context ):
+        """
+        Return the number of datasets in the history (deleted and hidden ones
+        included).
+        """
+        return sum( history.get_dataset_state_counts( exclude_deleted=False ).values() )
+
     # remove this
     def serialize_state_ids( self, history, key, **context ):
         """
         Return a dictionary keyed to possible dataset states and valued with lists
         containing the ids of each HDA in that state.
         """
-        state_ids = {}
-        for state in model.Dataset.states.values():
-            state_ids[ state ] = []
-
         # TODO:?? collections and coll. states?
-        for hda in history.datasets:
-            # TODO: do not encode ids at this layer
-            encoded_id = self.app.security.encode_id( hda.id )
-            state_ids[ hda.state ].append( encoded_id )
+        state_ids = history.get_dataset_ids_by_state()
+        # TODO: do not encode ids at this layer
+        for state, ids in state_ids.items():
+            state_ids[ state ] = [ self.app.security.encode_id( id ) for id in ids ]
         return state_ids
 
     # remove this
@@ -259,18 +264,16 @@ class HistorySerializer( sharable.SharableModelSerializer, deletable.PurgableSer
         of datasets in this history that have those states.
         """
         # TODO: the default flags above may not make a lot of sense (T,T?)
-        state_counts = {}
-        for state in model.Dataset.states.values():
-            state_counts[ state ] = 0
-
         # TODO:?? collections and coll. states?
-        for hda in history.datasets:
-            if exclude_deleted and hda.deleted:
-                continue
-            if exclude_hidden and not hda.visible:
-                continue
-            state_counts[ hda.state ] = state_counts[ hda.state ] + 1
-        return state_counts
+        # read from the history's dataset state summaries rather than counted
+        return history.get_dataset_state_counts( exclude_deleted=exclude_deleted, exclude_hidden=exclude_hidden )
+
+    def serialize_state_update_time( self, history, key, **context ):
+        """
+        Return when the state counts (see `serialize_state_counts`) last changed.
+        """
+        update_time = history.get_dataset_state_update_time()
+        return update_time.isoformat() if update_time is not None else None
 
     # TODO: remove this (is state used/useful?)
     def serialize_history_state( self, history, key, **context ):
@@ -304,11 +307,14 @@ class HistorySerializer( sharable.SharableModelSerializer, deletable.PurgableSer
         return state
 
     def serialize_contents( self, history, *args, **context ):
+        contents = list( history.contents_iter( types=[ 'dataset', 'dataset_collection' ] ) )
+        hdas = [ content for content in contents if isinstance( content, model.HistoryDatasetAssociation ) ]
+        hda_dicts = iter( self.hda_serializer.serialize_many( hdas, view='detailed', **context ) )
         contents_dictionaries = []
-        for content in history.contents_iter( types=[ 'dataset', 'dataset_collection' ] ):
+        for content in contents:
             contents_dict = {}
             if isinstance( content, model.HistoryDatasetAssociation ):
-                contents_dict = self.hda_serializer.serialize_to_view( content, view='detailed', **context )
+                contents_dict = next( hda_dicts )
             # elif isinstance( content, model.HistoryDatasetCollectionAssociation ):
             #     contents_dict = self._serialize_collection( trans, content )
             contents_dictionaries.append( contents_dict )
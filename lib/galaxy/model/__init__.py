@@ -22,6 +22,7 @@ from datetime import datetime, timedelta
 from uuid import UUID, uuid4
 from string import Template
 from itertools import ifilter
+from itertools import islice
 from itertools import chain
 
 import galaxy.datatypes
@@ -45,7 +46,7 @@ from galaxy.model.orm import and_, or_
 from sqlalchemy.orm import object_session
 from sqlalchemy.orm import joinedload
 from sqlalchemy.sql.expression import func
-from sqlalchemy import not_
+from sqlalchemy import exists, not_, select, union
 
 log = logging.getLogger( __name__ )
 
@@ -207,19 +208,52 @@ class User( object, Dictifiable ):
         Return byte count total of disk space used by all non-purged, non-library
         HDAs in non-purged histories.
         """
-        # maintain a list so that we don't double count
-        dataset_ids = []
-        total = 0
-        # this can be a huge number and can run out of memory, so we avoid the mappers
+        # this can be a huge number of datasets, so it's summed in the database
         db_session = object_session( self )
-        for history in db_session.query( History ).enable_eagerloads( False ).filter_by( user_id=self.id, purged=False ).yield_per( 1000 ):
-            for hda in db_session.query( HistoryDatasetAssociation ).enable_eagerloads( False ).filter_by( history_id=history.id, purged=False ).yield_per( 1000 ):
-                #TODO: def hda.counts_toward_disk_usage():
-                #   return ( not self.dataset.purged and not self.dataset.library_associations )
-                if not hda.dataset.id in dataset_ids and not hda.dataset.purged and not hda.dataset.library_associations:
-                    dataset_ids.append( hda.dataset.id )
-                    total += hda.dataset.get_total_size()
-        return total
+        datasets = User.disk_usage_datasets( self.id ).alias( 'datasets' )
+        User.set_unset_total_sizes( db_session, datasets )
+        return db_session.execute( select( [ func.coalesce( func.sum( datasets.c.total_size ), 0 ) ] ) ).scalar()
+
+    @staticmethod
+    def disk_usage_datasets( user_id=None ):
+        """
+        Return a select of the distinct user ids, dataset ids, total sizes and
+        file sizes of the datasets counting toward the disk usage of the user
+        with `user_id` (or of every user if `user_id` is None): datasets of
+        non-purged HDAs in non-purged histories that aren't purged themselves
+        or in a library.
+        """
+        hda_table = HistoryDatasetAssociation.table
+        history_table = History.table
+        dataset_table = Dataset.table
+        ldda_table = LibraryDatasetDatasetAssociation.table
+        if user_id is None:
+            user_clause = history_table.c.user_id != None
+        else:
+            user_clause = history_table.c.user_id == user_id
+        return select( [ history_table.c.user_id, dataset_table.c.id, dataset_table.c.total_size, dataset_table.c.file_size ],
+                       and_( user_clause,
+                             history_table.c.purged == False,
+                             hda_table.c.purged == False,
+                             dataset_table.c.purged == False,
+                             not_( exists( [ ldda_table.c.id ], ldda_table.c.dataset_id == dataset_table.c.id ) ) ),
+                       from_obj=[ hda_table.join( history_table, hda_table.c.history_id == history_table.c.id )
+                                           .join( dataset_table, hda_table.c.dataset_id == dataset_table.c.id ) ],
+                       distinct=True )
+
+    @staticmethod
+    def set_unset_total_sizes( db_session, datasets ):
+        """
+        Set (and flush) the total size of those of `datasets` (an alias of a
+        `disk_usage_datasets` select) that have a file size but whose total size
+        was never set - for backwards compatibility, as `get_total_size` does.
+        """
+        unset = select( [ datasets.c.id ], and_( datasets.c.total_size == None, datasets.c.file_size > 0 ), distinct=True )
+        dataset_ids = [ dataset_id for ( dataset_id, ) in db_session.execute( unset ) ]
+        for i in range( 0, len( dataset_ids ), 1000 ):
+            for dataset in db_session.query( Dataset ).enable_eagerloads( False ).filter( Dataset.table.c.id.in_( dataset_ids[ i:i + 1000 ] ) ):
+                dataset.set_total_size()
+            db_session.flush()
 
     @staticmethod
     def user_template_environment( user ):
@@ -955,7 +989,7 @@ class History( object, Dictifiable, UsesAnnotations, HasName ):
     def empty( self ):
         return self.hid_counter == 1
 
-    def _next_hid( self ):
+    def _next_hid( self, n=1 ):
         # this is overriden in mapping.py db_next_hid() method
         if len( self.datasets ) == 0:
             return 1
@@ -999,6 +1033,36 @@ class History( object, Dictifiable, UsesAnnotations, HasName ):
         self.datasets.append( dataset )
         return dataset
 
+    def add_datasets( self, sa_session, datasets, parent_id=None, genome_build=None, set_hid=True, quota=True, flush=False ):
+        """
+        Add several HistoryDatasetAssociations to this history at once,
+        reserving their hids with a single database update rather than one per
+        dataset. Like add_dataset, the datasets are only flushed if ``flush``
+        is set.
+        """
+        if parent_id or len( datasets ) < 2:
+            for dataset in datasets:
+                self.add_dataset( dataset, parent_id=parent_id, genome_build=genome_build, set_hid=set_hid, quota=quota )
+        else:
+            for dataset in datasets:
+                if not isinstance( dataset, HistoryDatasetAssociation ):
+                    raise TypeError( "You can only add HistoryDatasetAssociation instances to a history"
+                                     " with add_datasets ( you tried to add %s )." % str( dataset ) )
+            if set_hid:
+                first_hid = self._next_hid( n=len( datasets ) )
+                for i, dataset in enumerate( datasets ):
+                    dataset.hid = first_hid + i
+            for dataset in datasets:
+                if quota and self.user:
+                    self.user.total_disk_usage += dataset.quota_amount( self.user )
+                dataset.history = self
+            if genome_build not in [None, '?']:
+                self.genome_build = genome_build
+        sa_session.add_all( datasets )
+        if flush:
+            sa_session.flush()
+        return datasets
+
     def add_dataset_collection( self, history_dataset_collection, set_hid=True ):
         if set_hid:
             history_dataset_collection.hid = self._next_hid()
@@ -1123,6 +1187,90 @@ class History( object, Dictifiable, UsesAnnotations, HasName ):
             rval = galaxy.datatypes.data.nice_size( rval )
         return rval
 
+    def get_dataset_state_summaries( self ):
+        """
+        Return this history's `HistoryDatasetStateSummary`s (one per dataset
+        state), building them from its datasets if that hasn't been done yet.
+        """
+        db_session = object_session( self )
+        query = db_session.query( HistoryDatasetStateSummary ).filter_by( history_id=self.id ).populate_existing()
+        summaries = query.all()
+        if not summaries and self._build_dataset_state_summaries():
+            summaries = query.all()
+        return summaries
+
+    def _build_dataset_state_summaries( self ):
+        # Returns False if the history has no datasets (in which case there is
+        # nothing to keep current yet).
+        conn = object_session( self ).connection()
+        hda_table = HistoryDatasetAssociation.table
+        dataset_table = Dataset.table
+        summary_table = HistoryDatasetStateSummary.table
+        state = func.coalesce( hda_table.c._state, dataset_table.c.state )
+        trans = conn.begin()
+        try:
+            # Datasets changing while the summaries are built wait for this
+            # lock before updating them (see galaxy.model.history_summary) so
+            # that they are either counted here or update the new summaries.
+            conn.execute( select( [ History.table.c.id ], History.table.c.id == self.id, for_update=True ) )
+            if conn.execute( select( [ func.count( summary_table.c.id ) ], summary_table.c.history_id == self.id ) ).scalar():
+                trans.commit()
+                return True
+            summaries = dict( ( state_, HistoryDatasetStateSummary( history_id=self.id, state=state_ ) ) for state_ in Dataset.states.values() )
+            counts = conn.execute( select( [ state, hda_table.c.deleted, hda_table.c.visible, func.count( hda_table.c.id ) ],
+                                           hda_table.c.history_id == self.id,
+                                           from_obj=[ hda_table.join( dataset_table, hda_table.c.dataset_id == dataset_table.c.id ) ] )
+                                   .group_by( state, hda_table.c.deleted, hda_table.c.visible ) ).fetchall()
+            if not counts:
+                trans.commit()
+                return False
+            for state_, deleted, visible, count in counts:
+                if state_ in summaries:
+                    summary = summaries[ state_ ]
+                    column = HistoryDatasetStateSummary.count_column( deleted, visible )
+                    setattr( summary, column, getattr( summary, column ) + count )
+            conn.execute( summary_table.insert(), [ row_summary.to_row() for row_summary in summaries.values() ] )
+            trans.commit()
+            return True
+        except:
+            trans.rollback()
+            raise
+
+    def get_dataset_state_counts( self, exclude_deleted=True, exclude_hidden=False ):
+        """
+        Return a dictionary keyed to possible dataset states and valued with
+        the number of datasets in this history that have those states.
+        """
+        state_counts = dict( ( state, 0 ) for state in Dataset.states.values() )
+        for summary in self.get_dataset_state_summaries():
+            state_counts[ summary.state ] = summary.count( exclude_deleted=exclude_deleted, exclude_hidden=exclude_hidden )
+        return state_counts
+
+    def get_dataset_state_update_time( self ):
+        """
+        Return when the dataset state counts of this history last changed (the
+        most recent `update_time` of its summaries), None if it has no datasets.
+        """
+        update_times = [ summary.update_time for summary in self.get_dataset_state_summaries() ]
+        return max( update_times ) if update_times else None
+
+    def get_dataset_ids_by_state( self ):
+        """
+        Return a dictionary keyed to possible dataset states and valued with
+        lists containing the ids of the datasets in this history in that state
+        (without loading the datasets themselves).
+        """
+        db_session = object_session( self )
+        state_ids = dict( ( state, [] ) for state in Dataset.states.values() )
+        state = func.coalesce( HistoryDatasetAssociation.table.c._state, Dataset.table.c.state )
+        query = ( db_session.query( HistoryDatasetAssociation.table.c.id, state )
+                            .join( Dataset, HistoryDatasetAssociation.table.c.dataset_id == Dataset.table.c.id )
+                            .filter( HistoryDatasetAssociation.table.c.history_id == self.id )
+                            .order_by( HistoryDatasetAssociation.table.c.hid.asc() ) )
+        for hda_id, hda_state in query:
+            state_ids[ hda_state ].append( hda_id )
+        return state_ids
+
     @property
     def active_datasets_children_and_roles( self ):
         if not hasattr(self, '_active_datasets_children_and_roles'):
@@ -1149,6 +1297,11 @@ class History( object, Dictifiable, UsesAnnotations, HasName ):
     def contents_iter( self, **kwds ):
         """
         Fetch filtered list of contents of history.
+
+        Besides `deleted`, `visible` and `ids`, contents can be limited to the
+        hid range `min_hid` - `max_hid` (inclusive), with `since` (a
+        datetime) to the datasets updated after it and to the first `limit`
+        (by hid).
         """
         default_contents_types = [
             'dataset',
@@ -1159,7 +1312,11 @@ class History( object, Dictifiable, UsesAnnotations, HasName ):
             iters.append( self.__dataset_contents_iter( **kwds ) )
         if 'dataset_collection' in types:
             iters.append( self.__collection_contents_iter( **kwds ) )
-        return galaxy.util.merge_sorted_iterables( operator.attrgetter( "hid" ), *iters )
+        contents = galaxy.util.merge_sorted_iterables( operator.attrgetter( "hid" ), *iters )
+        if kwds.get( 'limit', None ) is not None:
+            # each type's query is limited too, this limits their merged contents
+            contents = islice( contents, kwds[ 'limit' ] )
+        return contents
 
     def __dataset_contents_iter(self, **kwds):
         return self.__filter_contents( HistoryDatasetAssociation, **kwds )
@@ -1176,6 +1333,25 @@ class History( object, Dictifiable, UsesAnnotations, HasName ):
         visible = galaxy.util.string_as_bool_or_none( kwds.get( 'visible', None ) )
         if visible is not None:
             query = query.filter( content_class.visible == visible )
+        if kwds.get( 'min_hid', None ) is not None:
+            query = query.filter( content_class.table.c.hid >= kwds[ 'min_hid' ] )
+        if kwds.get( 'max_hid', None ) is not None:
+            query = query.filter( content_class.table.c.hid <= kwds[ 'max_hid' ] )
+        since = kwds.get( 'since', None )
+        # collections have no update time - they're always included
+        if since is not None and 'update_time' in content_class.table.c:
+            content_table = content_class.table
+            updated_ids = select( [ content_table.c.id ], and_( content_table.c.history_id == self.id, content_table.c.update_time > since ) )
+            if content_class is HistoryDatasetAssociation:
+                # an HDA's state is (usually) that of its dataset - a union
+                # rather than an OR so that each side can use its own index
+                # on update_time
+                updated_ids = union( updated_ids,
+                                     select( [ content_table.c.id ],
+                                             and_( content_table.c.history_id == self.id,
+                                                   content_table.c.dataset_id == Dataset.table.c.id,
+                                                   Dataset.table.c.update_time > since ) ) )
+            query = query.filter( content_table.c.id.in_( updated_ids ) )
         if 'ids' in kwds:
             ids = kwds['ids']
             max_in_filter_length = kwds.get('max_in_filter_length', MAX_IN_FILTER_LENGTH)
@@ -1184,8 +1360,13 @@ class History( object, Dictifiable, UsesAnnotations, HasName ):
             else:
                 python_filter = lambda content: content.id in ids
         if python_filter:
-            return ifilter(python_filter, query)
+            contents = ifilter(python_filter, query)
+            if kwds.get( 'limit', None ) is not None:
+                contents = islice( contents, kwds[ 'limit' ] )
+            return contents
         else:
+            if kwds.get( 'limit', None ) is not None:
+                query = query.limit( kwds[ 'limit' ] )
             return query
 
     def __collection_contents_iter( self, **kwds ):
@@ -1198,6 +1379,49 @@ class History( object, Dictifiable, UsesAnnotations, HasName ):
             self.tags.append(new_shta)
 
 
+class HistoryDatasetStateSummary( object ):
+    """
+    The number of datasets of a history in a given state - split by whether
+    they are deleted and/or hidden.
+
+    A history has one of these for every dataset state or none at all: they
+    are built from its datasets the first time they are needed (see
+    `History.get_dataset_state_summaries`) and from then on kept current as
+    its datasets change by galaxy.model.history_summary.
+    """
+
+    def __init__( self, history_id=None, state=None, visible_count=0, hidden_count=0, deleted_visible_count=0, deleted_hidden_count=0 ):
+        self.history_id = history_id
+        self.state = state
+        self.visible_count = visible_count
+        self.hidden_count = hidden_count
+        self.deleted_visible_count = deleted_visible_count
+        self.deleted_hidden_count = deleted_hidden_count
+
+    @staticmethod
+    def count_column( deleted, visible ):
+        """
+        Return the name of the column counting datasets that are/aren't
+        `deleted` and `visible`.
+        """
+        return '%s%s_count' % ( 'deleted_' if deleted else '', 'visible' if visible else 'hidden' )
+
+    def count( self, exclude_deleted=False, exclude_hidden=False ):
+        count = self.visible_count
+        if not exclude_hidden:
+            count += self.hidden_count
+        if not exclude_deleted:
+            count += self.deleted_visible_count
+            if not exclude_hidden:
+                count += self.deleted_hidden_count
+        return count
+
+    def to_row( self ):
+        return dict( history_id=self.history_id, state=self.state,
+                     visible_count=self.visible_count, hidden_count=self.hidden_count,
+                     deleted_visible_count=self.deleted_visible_count, deleted_hidden_count=self.deleted_hidden_count )
+
+
 class HistoryUserShareAssociation( object ):
     def __init__( self ):
         self.history = None
@@ -0,0 +1,130 @@
+"""
+Keeps the `HistoryDatasetStateSummary`s of histories current as their
+datasets are created, change state, are (un)deleted or (un)hidden.
+
+Instead of recounting a history's datasets, every flush works out which
+summary each changed HDA was counted in before and which it belongs in now
+(from the previous values of the attributes involved) and adjusts the counts
+of the summaries with relative updates, in the same transaction as the
+changes themselves.
+"""
+from collections import defaultdict
+import logging
+
+from sqlalchemy import event, select
+from sqlalchemy.orm.attributes import get_history
+
+from galaxy import model
+
+log = logging.getLogger( __name__ )
+
+STATES = frozenset( model.Dataset.states.values() )
+
+# Attributes of HDAs (and their datasets) the summary they are counted in
+# depends on - the mappers keep their previous values around.
+HDA_ATTRIBUTES = ( 'history', 'dataset', '_state', 'deleted', 'visible' )
+DATASET_ATTRIBUTES = ( 'state', )
+
+
+def track_dataset_state_summaries( session ):
+    """
+    Update the dataset state summaries of histories whenever `session` (a
+    session or scoped session) is flushed.
+    """
+    event.listen( session, 'after_flush', update_dataset_state_summaries )
+
+
+def update_dataset_state_summaries( session, flush_context ):
+    # After the flush the ids are known, but the new, dirty and deleted
+    # objects and their attributes' histories still describe the changes
+    # just written.
+    changes = {}
+    for obj in session.new:
+        if isinstance( obj, model.HistoryDatasetAssociation ):
+            changes[ obj ] = ( None, _current_key( obj ) )
+    for obj in session.dirty:
+        if isinstance( obj, model.HistoryDatasetAssociation ) and _modified( obj, HDA_ATTRIBUTES ):
+            changes[ obj ] = ( _previous_key( obj ), _current_key( obj ) )
+        elif isinstance( obj, model.Dataset ) and _modified( obj, DATASET_ATTRIBUTES ):
+            for hda in obj.history_associations:
+                if hda not in changes and hda not in session.new:
+                    changes[ hda ] = ( _previous_key( hda ), _current_key( hda ) )
+    for obj in session.deleted:
+        if isinstance( obj, model.HistoryDatasetAssociation ):
+            changes[ obj ] = ( _previous_key( obj ), None )
+
+    deltas = defaultdict( lambda: defaultdict( int ) )
+    for previous_key, current_key in changes.values():
+        if previous_key == current_key:
+            continue
+        for key, delta in ( ( previous_key, -1 ), ( current_key, 1 ) ):
+            if key is not None:
+                history_id, state, column = key
+                deltas[ history_id ][ ( state, column ) ] += delta
+    for history_id, history_deltas in deltas.items():
+        history_deltas = dict( ( key, delta ) for key, delta in history_deltas.items() if delta )
+        if history_deltas and not _update_summaries( session, history_id, history_deltas ):
+            # Either the summaries haven't been built yet (and will include
+            # these changes when they are) or they're being built right now,
+            # in which case the lock is held until they're there.
+            _lock_history( session, history_id )
+            _update_summaries( session, history_id, history_deltas )
+
+
+def _update_summaries( session, history_id, deltas ):
+    # Returns False if the history has no summaries (a history has either all
+    # of them or none).
+    table = model.HistoryDatasetStateSummary.table
+    for ( state, column ), delta in deltas.items():
+        statement = ( table.update()
+                           .where( ( table.c.history_id == history_id ) & ( table.c.state == state ) )
+                           .values( { column: table.c[ column ] + delta } ) )
+        if not session.execute( statement ).rowcount:
+            return False
+    return True
+
+
+def _lock_history( session, history_id ):
+    table = model.History.table
+    session.execute( select( [ table.c.id ], table.c.id == history_id, for_update=True ) )
+
+
+def _modified( obj, attributes ):
+    for attribute in attributes:
+        if get_history( obj, attribute ).has_changes():
+            return True
+    return False
+
+
+def _previous( obj, attribute ):
+    added, unchanged, deleted = get_history( obj, attribute )
+    if deleted:
+        return deleted[ 0 ]
+    elif unchanged:
+        return unchanged[ 0 ]
+    # changed from None (or never loaded)
+    return None
+
+
+def _key( history, state, deleted, visible ):
+    # The summary an HDA with these attributes is counted in, None if it
+    # isn't counted at all.
+    if history is None or state not in STATES:
+        return None
+    return ( history.id, state, model.HistoryDatasetStateSummary.count_column( bool( deleted ), bool( visible ) ) )
+
+
+def _previous_key( hda ):
+    # like HistoryDatasetAssociation.state
+    state = _previous( hda, '_state' )
+    if not state:
+        dataset = _previous( hda, 'dataset' )
+        state = dataset and _previous( dataset, 'state' )
+    return _key( _previous( hda, 'history' ), state, _previous( hda, 'deleted' ), _previous( hda, 'visible' ) )
+
+
+def _current_key( hda ):
+    state = hda._state
+    if not state:
+        state = hda.dataset and hda.dataset.state
+    return _key( hda.history, state, hda.deleted, hda.visible )
@@ -6,17 +6,18 @@ are encapsulated here.
 import logging
 import pkg_resources
 
-from sqlalchemy import and_, asc, Boolean, Column, DateTime, desc, ForeignKey, Integer, MetaData, not_, Numeric, select, String, Table, TEXT, Unicode, UniqueConstraint
+from sqlalchemy import and_, asc, Boolean, Column, DateTime, desc, ForeignKey, Index, Integer, MetaData, not_, Numeric, select, String, Table, TEXT, Unicode, UniqueConstraint
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.orderinglist import ordering_list
 from sqlalchemy.types import BigInteger
-from sqlalchemy.orm import backref, object_session, relation, mapper, class_mapper
+from sqlalchemy.orm import backref, column_property, object_session, relation, mapper, class_mapper
 from sqlalchemy.orm.collections import attribute_mapped_collection
 
 from galaxy import model
 from galaxy.model.orm.engine_factory import build_engine
 from galaxy.model.orm.now import now
 from galaxy.model.custom_types import JSONType, MetadataType, TrimmedString, UUIDType
+from galaxy.model import history_summary
 from galaxy.model.base import ModelMapping
 from galaxy.security import GalaxyRBACAgent
 
@@ -119,8 +120,21 @@ model.HistoryDatasetAssociation.table = Table( "history_dataset_association", me
     Column( "hid", Integer ),
     Column( "purged", Boolean, index=True, default=False ),
     Column( "hidden_beneath_collection_instance_id", ForeignKey( "history_dataset_collection_association.id" ), nullable=True ),
+    Index( "ix_hda_history_id_update_time", "history_id", "update_time" ),
 )
 
+model.HistoryDatasetStateSummary.table = Table( "history_dataset_state_summary", metadata,
+    Column( "id", Integer, primary_key=True ),
+    Column( "create_time", DateTime, default=now ),
+    Column( "update_time", DateTime, default=now, onupdate=now ),
+    Column( "history_id", Integer, ForeignKey( "history.id" ), index=True ),
+    Column( "state", TrimmedString( 64 ) ),
+    Column( "visible_count", Integer, default=0 ),
+    Column( "hidden_count", Integer, default=0 ),
+    Column( "deleted_visible_count", Integer, default=0 ),
+    Column( "deleted_hidden_count", Integer, default=0 ),
+    UniqueConstraint( "history_id", "state" ) )
+
 
 model.Dataset.table = Table( "dataset", metadata,
     Column( "id", Integer, primary_key=True ),
@@ -1427,10 +1441,16 @@ mapper( model.UserOpenID, model.UserOpenID.table,
 
 mapper( model.ValidationError, model.ValidationError.table )
 
+# The previous values of the attributes determining which dataset state
+# summary an HDA is counted in are needed by history_summary, so they're
+# loaded (if expired) before being changed.
 simple_mapping( model.HistoryDatasetAssociation,
+    _state=column_property( model.HistoryDatasetAssociation.table.c._state, active_history=True ),
+    deleted=column_property( model.HistoryDatasetAssociation.table.c.deleted, active_history=True ),
+    visible=column_property( model.HistoryDatasetAssociation.table.c.visible, active_history=True ),
     dataset=relation(
         model.Dataset,
-        primaryjoin=( model.Dataset.table.c.id == model.HistoryDatasetAssociation.table.c.dataset_id ), lazy=False ),
+        primaryjoin=( model.Dataset.table.c.id == model.HistoryDatasetAssociation.table.c.dataset_id ), lazy=False, active_history=True ),
     # .history defined in History mapper
     copied_from_history_dataset_association=relation(
         model.HistoryDatasetAssociation,
@@ -1477,6 +1497,7 @@ simple_mapping( model.HistoryDatasetAssociation,
 )
 
 simple_mapping( model.Dataset,
+    state=column_property( model.Dataset.table.c.state, active_history=True ),
     history_associations=relation(
         model.HistoryDatasetAssociation,
         primaryjoin=( model.Dataset.table.c.id == model.HistoryDatasetAssociation.table.c.dataset_id ) ),
@@ -1522,7 +1543,7 @@ mapper( model.ImplicitlyConvertedDatasetAssociation, model.ImplicitlyConvertedDa
 
 mapper( model.History, model.History.table,
     properties=dict( galaxy_sessions=relation( model.GalaxySessionToHistoryAssociation ),
-                     datasets=relation( model.HistoryDatasetAssociation, backref="history", order_by=asc(model.HistoryDatasetAssociation.table.c.hid) ),
+                     datasets=relation( model.HistoryDatasetAssociation, backref=backref( "history", active_history=True ), order_by=asc(model.HistoryDatasetAssociation.table.c.hid) ),
                      exports=relation( model.JobExportHistoryArchive, primaryjoin=( model.JobExportHistoryArchive.table.c.history_id == model.History.table.c.id ), order_by=desc( model.JobExportHistoryArchive.table.c.id ) ),
                      active_datasets=relation(
                         model.HistoryDatasetAssociation,
@@ -1566,6 +1587,8 @@ mapper( model.HistoryUserShareAssociation, model.HistoryUserShareAssociation.tab
                      history=relation( model.History, backref='users_shared_with' )
                    ) )
 
+simple_mapping( model.HistoryDatasetStateSummary )
+
 mapper( model.User, model.User.table,
     properties=dict( histories=relation( model.History, backref="user",
                                          order_by=desc(model.History.table.c.update_time) ),
@@ -2258,13 +2281,14 @@ class_mapper(model.HistoryDatasetCollectionAssociation).add_property( "creating_
 
 # Helper methods.
 
-def db_next_hid( self ):
+def db_next_hid( self, n=1 ):
     """
-    db_next_hid( self )
+    db_next_hid( self, n=1 )
 
     Override __next_hid to generate from the database in a concurrency safe way.
     Loads the next history ID from the DB and returns it.
-    It also saves the future next_id into the DB.
+    It also saves the future next_id into the DB, reserving ``n`` consecutive
+    ids starting with the returned one.
 
     :rtype:     int
     :returns:   the next history id
@@ -2274,7 +2298,7 @@ def db_next_hid( self ):
     trans = conn.begin()
     try:
         next_hid = select( [table.c.hid_counter], table.c.id == self.id, for_update=True ).scalar()
-        table.update( table.c.id == self.id ).execute( hid_counter = ( next_hid + 1 ) )
+        table.update( table.c.id == self.id ).execute( hid_counter = ( next_hid + n ) )
         trans.commit()
         return next_hid
     except:
@@ -2305,6 +2329,7 @@ def init( file_path, url, engine_options={}, create_tables=False, map_install_mo
         model_modules.append(tool_shed_install)
 
     result = ModelMapping(model_modules, engine=engine)
+    history_summary.track_dataset_state_summaries( result.context )
 
     # Create tables if needed
     if create_tables:
@@ -0,0 +1,56 @@
+"""
+Migration script for the history dataset state summary table (the number of
+datasets of each history in each state, maintained as the datasets change).
+
+The summaries of existing histories are built the first time they're needed.
+"""
+
+from sqlalchemy import *
+from sqlalchemy.orm import *
+from migrate import *
+from migrate.changeset import *
+from galaxy.model.custom_types import *
+
+import datetime
+now = datetime.datetime.utcnow
+
+import logging
+log = logging.getLogger( __name__ )
+
+metadata = MetaData()
+
+HistoryDatasetStateSummary_table = Table( "history_dataset_state_summary", metadata,
+    Column( "id", Integer, primary_key=True ),
+    Column( "create_time", DateTime, default=now ),
+    Column( "update_time", DateTime, default=now, onupdate=now ),
+    Column( "history_id", Integer, ForeignKey( "history.id" ), index=True ),
+    Column( "state", TrimmedString( 64 ) ),
+    Column( "visible_count", Integer, default=0 ),
+    Column( "hidden_count", Integer, default=0 ),
+    Column( "deleted_visible_count", Integer, default=0 ),
+    Column( "deleted_hidden_count", Integer, default=0 ),
+    UniqueConstraint( "history_id", "state" )
+)
+
+
+def upgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    print __doc__
+    metadata.reflect()
+
+    try:
+        HistoryDatasetStateSummary_table.create()
+    except Exception as e:
+        print str(e)
+        log.exception("Creating %s table failed: %s" % (HistoryDatasetStateSummary_table.name, str( e ) ) )
+
+
+def downgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    metadata.reflect()
+
+    try:
+        HistoryDatasetStateSummary_table.drop()
+    except Exception as e:
+        print str(e)
+        log.exception("Dropping %s table failed: %s" % (HistoryDatasetStateSummary_table.name, str( e ) ) )
@@ -0,0 +1,41 @@
+"""
+Migration script to add an index on the history and update time of HDAs (for
+fetching the contents of a history changed since a given time).
+"""
+
+from sqlalchemy import *
+from sqlalchemy.orm import *
+from migrate import *
+from migrate.changeset import *
+
+import logging
+log = logging.getLogger( __name__ )
+
+metadata = MetaData()
+
+
+def upgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    print __doc__
+    metadata.reflect()
+
+    try:
+        HistoryDatasetAssociation_table = Table( "history_dataset_association", metadata, autoload=True )
+        i = Index( "ix_hda_history_id_update_time", HistoryDatasetAssociation_table.c.history_id, HistoryDatasetAssociation_table.c.update_time )
+        i.create()
+    except Exception as e:
+        print str(e)
+        log.exception( "Adding index ix_hda_history_id_update_time to history_dataset_association table failed: %s" % str( e ) )
+
+
+def downgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    metadata.reflect()
+
+    try:
+        HistoryDatasetAssociation_table = Table( "history_dataset_association", metadata, autoload=True )
+        i = Index( "ix_hda_history_id_update_time", HistoryDatasetAssociation_table.c.history_id, HistoryDatasetAssociation_table.c.update_time )
+        i.drop()
+    except Exception as e:
+        print str(e)
+        log.exception( "Removing index ix_hda_history_id_update_time from history_dataset_association table failed: %s" % str( e ) )
@@ -4,6 +4,7 @@ all providers ensure that data can be accessed on the filesystem for running
 tools
 """
 
+import glob
 import os
 import random
 import shutil
@@ -319,6 +320,9 @@ class DiskObjectStore(ObjectStore):
                 return True
             if self.exists(obj, **kwargs):
                 os.remove(path)
+                # Line offset indexes built by the dataproviders live next to the file
+                for index_path in glob.glob('%s.*.line_index' % path):
+                    os.remove(index_path)
                 return True
         except OSError, ex:
             log.critical('%s delete error %s' % (self._get_filename(obj, **kwargs), ex))
@@ -31,7 +31,12 @@ def send_control_task(app, task, noop_self=False, kwargs={}):
     if noop_self:
         payload['noop'] = app.config.server_name
     try:
-        c = Connection(app.config.amqp_internal_connection)
+        # Producers are pooled per connection - publish through those of the
+        # app's connection (which its control worker consumes with) rather
+        # than opening a new connection for every task.
+        c = getattr(app, 'amqp_internal_connection_obj', None)
+        if c is None:
+            c = Connection(app.config.amqp_internal_connection)
         with producers[c].acquire(block=True) as producer:
             producer.publish(payload, exchange=galaxy.queues.galaxy_exchange,
                              declare=[galaxy.queues.galaxy_exchange] + galaxy.queues.all_control_queues_for_declare(app.config),
@@ -77,10 +82,19 @@ def admin_job_lock(app, **kwargs):
     log.info("Administrative Job Lock is now set to %s. Jobs will %s dispatch."
              % (job_lock, "not" if job_lock else "now"))
 
+
+def job_inputs_ready(app, **kwargs):
+    job_ids = kwargs.get('job_ids', [])
+    log.debug("Executing job inputs ready task for %d job(s)" % len(job_ids))
+    # Processes that are not job handlers have a NoopQueue here.
+    app.job_manager.job_queue.notify_jobs_ready(job_ids)
+
+
 control_message_to_task = { 'reload_tool': reload_tool,
                             'reload_display_application': reload_display_application,
                             'reload_tool_data_tables': reload_tool_data_tables,
-                            'admin_job_lock': admin_job_lock}
+                            'admin_job_lock': admin_job_lock,
+                            'job_inputs_ready': job_inputs_ready}
 
 
 class GalaxyQueueWorker(ConsumerMixin, threading.Thread):
@@ -3,6 +3,11 @@ Galaxy Quotas
 
 """
 import logging
+import threading
+import time
+
+from sqlalchemy import and_, event, select, union
+
 import galaxy.util
 
 log = logging.getLogger(__name__)
@@ -35,7 +40,69 @@ class NoQuotaAgent( object ):
 
 class QuotaAgent( NoQuotaAgent ):
     """Class that handles galaxy quotas"""
+    def __init__( self, model, cache_ttl=60 ):
+        super( QuotaAgent, self ).__init__( model )
+        # Users' quotas are cached (by user id) for up to cache_ttl seconds.
+        # Changes to quotas, their associations and group memberships made in
+        # this process clear the cache as they're flushed, the ttl bounds how
+        # long other processes keep using the old quotas.
+        self.cache_ttl = cache_ttl
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        if cache_ttl:
+            event.listen( self.sa_session, 'after_flush', self._clear_cache_on_quota_changes )
+    def _clear_cache_on_quota_changes( self, session, flush_context ):
+        quota_classes = ( self.model.Quota, self.model.UserQuotaAssociation, self.model.GroupQuotaAssociation,
+                          self.model.DefaultQuotaAssociation, self.model.UserGroupAssociation )
+        for obj in set( session.new ) | set( session.dirty ) | set( session.deleted ):
+            if isinstance( obj, quota_classes ):
+                self.clear_cache()
+                return
+    def clear_cache( self ):
+        """Forget all cached quotas."""
+        with self._cache_lock:
+            self._cache.clear()
     def get_quota( self, user, nice_size=False ):
+        """
+        Return the user's quota in bytes (None if unlimited), or as a human
+        readable string if `nice_size`, see `_calculate_quota`.
+        """
+        if not user:
+            rval = self.default_unregistered_quota
+        elif not self.cache_ttl:
+            rval = self._calculate_quota( user )
+        else:
+            now = time.time()
+            with self._cache_lock:
+                cached = self._cache.get( user.id )
+            if cached is not None and cached[ 0 ] > now:
+                rval = cached[ 1 ]
+            else:
+                rval = self._calculate_quota( user )
+                with self._cache_lock:
+                    self._cache[ user.id ] = ( now + self.cache_ttl, rval )
+        if nice_size:
+            if rval is not None:
+                rval = galaxy.util.nice_size( rval )
+            else:
+                rval = 'unlimited'
+        return rval
+    def _user_quotas( self, user ):
+        """
+        Return the operation and bytes of each of the (non-deleted) quotas
+        associated with the user directly or through their groups, in a single
+        query.
+        """
+        user_quota_ids = select( [ self.model.UserQuotaAssociation.table.c.quota_id ],
+                                 self.model.UserQuotaAssociation.table.c.user_id == user.id )
+        group_quota_ids = select( [ self.model.GroupQuotaAssociation.table.c.quota_id ],
+                                  and_( self.model.GroupQuotaAssociation.table.c.group_id == self.model.UserGroupAssociation.table.c.group_id,
+                                        self.model.UserGroupAssociation.table.c.user_id == user.id ) )
+        quota_table = self.model.Quota.table
+        return self.sa_session.execute( select( [ quota_table.c.operation, quota_table.c.bytes ],
+                                                and_( quota_table.c.id.in_( union( user_quota_ids, group_quota_ids ) ),
+                                                      quota_table.c.deleted == False ) ) ).fetchall()
+    def _calculate_quota( self, user ):
         """
         Calculated like so:
 
@@ -47,34 +114,22 @@ class QuotaAgent( NoQuotaAgent ):
             3. Quota is increased or decreased by any corresponding '+' or '-'
                quotas.
         """
-        if not user:
-            return self.default_unregistered_quota
-        quotas = []
-        for group in [ uga.group for uga in user.groups ]:
-            for quota in [ gqa.quota for gqa in group.quotas ]:
-                if quota not in quotas:
-                    quotas.append( quota )
-        for quota in [ uqa.quota for uqa in user.quotas ]:
-            if quota not in quotas:
-                quotas.append( quota )
         use_default = True
         max = 0
         adjustment = 0
         rval = 0
-        for quota in quotas:
-            if quota.deleted:
-                continue
-            if quota.operation == '=' and quota.bytes == -1:
+        for operation, bytes in self._user_quotas( user ):
+            if operation == '=' and bytes == -1:
                 rval = None
                 break
-            elif quota.operation == '=':
+            elif operation == '=':
                 use_default = False
-                if quota.bytes > max:
-                    max = quota.bytes
-            elif quota.operation == '+':
-                adjustment += quota.bytes
-            elif quota.operation == '-':
-                adjustment -= quota.bytes
+                if bytes > max:
+                    max = bytes
+            elif operation == '+':
+                adjustment += bytes
+            elif operation == '-':
+                adjustment -= bytes
         if use_default:
             max = self.default_registered_quota
             if max is None:
@@ -83,11 +138,6 @@ class QuotaAgent( NoQuotaAgent ):
             rval = max + adjustment
             if rval <= 0:
                 rval = 0
-        if nice_size:
-            if rval is not None:
-                rval = galaxy.util.nice_size( rval )
-            else:
-                rval = 'unlimited'
         return rval
     @property
     def default_unregistered_quota( self ):
@@ -49,9 +49,14 @@ from galaxy.tools.parameters.output import ToolOutputActionGroup
 from galaxy.tools.parameters.validation import LateValidationError
 from galaxy.tools.test import parse_tests
 from galaxy.tools.parser import get_tool_source
+from galaxy.tools.loader_cache import load_tools_in_pool
+from galaxy.tools.loader_cache import ToolXmlCache
 from galaxy.tools.parser.xml import XmlPageSource
+from galaxy.tools.parser.xml import XmlToolSource
 from galaxy.tools.toolbox import AbstractToolBox
-from galaxy.util import rst_to_html, string_as_bool, string_to_object
+from galaxy.tools.toolbox.lazy import LazyTool
+from galaxy.tools.toolbox.lazy import MaterializedTools
+from galaxy.util import ExecutionTimer, rst_to_html, string_as_bool, string_to_object
 from galaxy.tools.parameters.meta import expand_meta_parameters
 from galaxy.util.bunch import Bunch
 from galaxy.util.expressions import ExpressionContext
@@ -110,6 +115,19 @@ class ToolBox( AbstractToolBox ):
     """
 
     def __init__( self, config_filenames, tool_root_dir, app ):
+        self.tool_cache = None
+        tool_cache_data_dir = getattr( app.config, "tool_cache_data_dir", None )
+        if tool_cache_data_dir:
+            self.tool_cache = ToolXmlCache( tool_cache_data_dir )
+        # Macro expanded XML trees of tools loaded ahead by _preload_tools, by
+        # config file path.
+        self._preloaded_tool_trees = {}
+        # If lazy_load_tools is set, plain tools are loaded into the panel as
+        # LazyTools, keeping (at most lazy_load_tools_cache_size of) the most
+        # recently used actual tools.
+        self._materialized_tools = None
+        if getattr( app.config, "lazy_load_tools", False ):
+            self._materialized_tools = MaterializedTools( getattr( app.config, "lazy_load_tools_cache_size", 0 ) )
         super( ToolBox, self ).__init__(
             config_filenames=config_filenames,
             tool_root_dir=tool_root_dir,
@@ -122,13 +140,59 @@ class ToolBox( AbstractToolBox ):
         # Deprecated method, TODO - eliminate calls to this in test/.
         return self._tools_by_id
 
-    def create_tool( self, config_file, repository_id=None, guid=None, **kwds ):
+    def _preload_tools( self, config_filenames ):
+        """ If tool_load_workers is set, parse the XML of the tools in a pool of
+        that many processes - the Tool objects are then created from the parsed
+        trees, in order, as the tool panel is loaded.
+        """
+        workers = getattr( self.app.config, "tool_load_workers", 0 )
+        if not workers:
+            return
+        config_timer = ExecutionTimer()
+        tool_paths = [ path for path in self._tool_paths_in_configs( config_filenames ) if path.endswith( ".xml" ) ]
+        log.info( "Read %d tool paths from the tool configs %s" % ( len( tool_paths ), config_timer ) )
+        parse_timer = ExecutionTimer()
+        cache_dir = self.tool_cache and self.tool_cache.cache_dir
+        self._preloaded_tool_trees = load_tools_in_pool( tool_paths, workers, cache_dir=cache_dir )
+        log.info( "Parsed %d tools in %d processes %s" % ( len( self._preloaded_tool_trees ), workers, parse_timer ) )
+
+    def _init_tools_from_configs( self, config_filenames ):
         try:
-            tool_source = get_tool_source( config_file, getattr( self.app.config, "enable_beta_tool_formats", False ) )
+            super( ToolBox, self )._init_tools_from_configs( config_filenames )
+        finally:
+            # Trees not consumed (e.g. those of tools of deactivated
+            # repositories) aren't needed any more.
+            self._preloaded_tool_trees = {}
+
+    def _get_tool_source( self, config_file ):
+        try:
+            preloaded = self._preloaded_tool_trees.pop( config_file, None )
+            if preloaded is not None:
+                preloaded_tree, dependencies = preloaded
+                return XmlToolSource( preloaded_tree.getroot(), dependencies=dependencies )
+            return get_tool_source( config_file, getattr( self.app.config, "enable_beta_tool_formats", False ), tool_cache=self.tool_cache )
         except Exception, e:
             #capture and log parsing errors
             global_tool_errors.add_error(config_file, "Tool XML parsing", e)
             raise e
+
+    def create_lazy_tool( self, config_file, repository_id=None, guid=None, **kwds ):
+        if self._materialized_tools is None:
+            return self.create_tool( config_file, repository_id=repository_id, guid=guid, **kwds )
+        tool_source = self._get_tool_source( config_file )
+        if tool_source.parse_tool_module() is not None or tool_source.parse_tool_type() or \
+                not tool_source.parse_id() or not tool_source.parse_name():
+            # Only plain tools are loaded lazily, broken tools are loaded right
+            # away to report their errors.
+            return self.create_tool( config_file, repository_id=repository_id, guid=guid, tool_source=tool_source, **kwds )
+
+        def create():
+            return self.create_tool( config_file, repository_id=repository_id, guid=guid, **kwds )
+        return LazyTool( config_file, tool_source, self.app, create, self._materialized_tools, guid=guid, repository_id=repository_id )
+
+    def create_tool( self, config_file, repository_id=None, guid=None, tool_source=None, **kwds ):
+        if tool_source is None:
+            tool_source = self._get_tool_source( config_file )
         # Allow specifying a different tool subclass to instantiate
         tool_module = tool_source.parse_tool_module()
         if tool_module is not None:
@@ -171,6 +235,9 @@ class ToolBox( AbstractToolBox ):
         """ Refresh upload tools when new datatypes are added. """
         for tool_id in self._tools_by_id:
             tool = self._tools_by_id[ tool_id ]
+            if isinstance( tool, LazyTool ) and not tool.materialized:
+                # Will pick up the new datatypes when created.
+                continue
             if isinstance( tool.tool_action, UploadToolAction ):
                 self.reload_tool_by_id( tool_id )
 
@@ -470,6 +537,8 @@ class Tool( object, Dictifiable ):
         # easily ensure that parameter dependencies like index files or
         # tool_data_table_conf.xml entries exist.
         self.input_params = []
+        # Other files (e.g. imported macro files) the config was loaded from.
+        self.config_file_dependencies = list( getattr( tool_source, "dependencies", [] ) )
         # Attributes of tools installed from Galaxy tool sheds.
         self.tool_shed = None
         self.repository_name = None
@@ -1340,14 +1409,14 @@ class Tool( object, Dictifiable ):
     def __should_refresh_state( self, incoming ):
         return not( 'runtool_btn' in incoming or 'URL' in incoming or 'ajax_upload' in incoming )
 
-    def handle_single_execution( self, trans, rerun_remap_job_id, params, history, mapping_over_collection ):
+    def handle_single_execution( self, trans, rerun_remap_job_id, params, history, mapping_over_collection, flush_job=True ):
         """
         Return a pair with whether execution is successful as well as either
         resulting output data or an error message indicating the problem.
         """
         try:
             params = self.__remove_meta_properties( params )
-            job, out_data = self.execute( trans, incoming=params, history=history, rerun_remap_job_id=rerun_remap_job_id, mapping_over_collection=mapping_over_collection )
+            job, out_data = self.execute( trans, incoming=params, history=history, rerun_remap_job_id=rerun_remap_job_id, mapping_over_collection=mapping_over_collection, flush_job=flush_job )
         except httpexceptions.HTTPFound, e:
             #if it's a paste redirect exception, pass it up the stack
             raise e
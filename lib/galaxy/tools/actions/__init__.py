@@ -150,11 +150,16 @@ class DefaultToolAction( object ):
         tool.visit_inputs( param_values, visitor )
         return input_dataset_collections
 
-    def execute(self, tool, trans, incoming={}, return_job=False, set_output_hid=True, set_output_history=True, history=None, job_params=None, rerun_remap_job_id=None, mapping_over_collection=False):
+    def execute(self, tool, trans, incoming={}, return_job=False, set_output_hid=True, set_output_history=True, history=None, job_params=None, rerun_remap_job_id=None, mapping_over_collection=False, flush_job=True):
         """
         Executes a tool, creating job and tool outputs, associating them, and
         submitting the job to the job queue. If history is not specified, use
         trans.history as destination for tool's output datasets.
+
+        If flush_job is False the job and its outputs are only added to the
+        session, it is then up to the caller to flush them, create the output
+        files and queue the job (see create_output_files and queue_job). This
+        allows many jobs to be persisted together (see galaxy.tools.execute).
         """
         assert tool.allow_user_access( trans.user ), "User (%s) is not allowed to access this tool." % ( trans.user )
         # Set history.
@@ -223,7 +228,6 @@ class DefaultToolAction( object ):
         # datasets first, then create the associations
         parent_to_child_pairs = []
         child_dataset_names = set()
-        object_store_populator = ObjectStorePopulator( trans.app )
 
         def handle_output( name, output ):
             if output.parent:
@@ -243,12 +247,8 @@ class DefaultToolAction( object ):
                 data = trans.app.model.HistoryDatasetAssociation( extension=ext, create_dataset=True, sa_session=trans.sa_session )
                 if output.hidden:
                     data.visible = False
-                # Commit the dataset immediately so it gets database assigned unique id
                 trans.sa_session.add( data )
-                trans.sa_session.flush()
-                trans.app.security_agent.set_all_dataset_permissions( data.dataset, output_permissions )
-
-            object_store_populator.set_object_store_id( data )
+                trans.app.security_agent.set_all_dataset_permissions( data.dataset, output_permissions, flush=False )
 
             # This may not be neccesary with the new parent/child associations
             data.designation = name
@@ -280,8 +280,6 @@ class DefaultToolAction( object ):
                 output_action_params = dict( out_data )
                 output_action_params.update( incoming )
                 output.actions.apply_action( data, output_action_params )
-            # Store all changes to database
-            trans.sa_session.flush()
             return data
 
         for name, output in tool.outputs.items():
@@ -338,20 +336,19 @@ class DefaultToolAction( object ):
                     handle_output( name, output )
                     log.info("Handled output %s" % handle_output_timer)
         # Add all the top-level (non-child) datasets to the history unless otherwise specified
+        datasets_to_persist = []
         for name in out_data.keys():
             if name not in child_dataset_names and name not in incoming:  # don't add children; or already existing datasets, i.e. async created
-                data = out_data[ name ]
-                if set_output_history:
-                    history.add_dataset( data, set_hid=set_output_hid )
-                trans.sa_session.add( data )
-                trans.sa_session.flush()
+                datasets_to_persist.append( out_data[ name ] )
+        if set_output_history:
+            history.add_datasets( trans.sa_session, datasets_to_persist, set_hid=set_output_hid )
+        else:
+            trans.sa_session.add_all( datasets_to_persist )
         # Add all the children to their parents
         for parent_name, child_name in parent_to_child_pairs:
             parent_dataset = out_data[ parent_name ]
             child_dataset = out_data[ child_name ]
             parent_dataset.children.append( child_dataset )
-        # Store data after custom code runs
-        trans.sa_session.flush()
         # Create the job object
         job = trans.app.model.Job()
 
@@ -397,14 +394,15 @@ class DefaultToolAction( object ):
             job.add_implicit_output_dataset_collection( name, dataset_collection )
         for name, dataset_collection_instance in out_collection_instances.iteritems():
             job.add_output_dataset_collection( name, dataset_collection_instance )
-        job.object_store_id = object_store_populator.object_store_id
         if job_params:
             job.params = dumps( job_params )
         job.set_handler(tool.get_job_handler(job_params))
         trans.sa_session.add( job )
-        # Now that we have a job id, we can remap any outputs if this is a rerun and the user chose to continue dependent jobs
+        # Remap any outputs if this is a rerun and the user chose to continue dependent jobs
         # This functionality requires tracking jobs in the database.
         if trans.app.config.track_jobs_in_database and rerun_remap_job_id is not None:
+            # Dependent jobs are remapped to the ids of the new outputs
+            trans.sa_session.flush()
             try:
                 old_job = trans.sa_session.query( trans.app.model.Job ).get(rerun_remap_job_id)
                 assert old_job is not None, '(%s/%s): Old job id is invalid' % (rerun_remap_job_id, job.id)
@@ -436,12 +434,13 @@ class DefaultToolAction( object ):
                     trans.sa_session.add(jtod)
             except Exception, e:
                 log.exception('Cannot remap rerun dependencies.')
-        trans.sa_session.flush()
         # Some tools are not really executable, but jobs are still created for them ( for record keeping ).
         # Examples include tools that redirect to other applications ( epigraph ).  These special tools must
         # include something that can be retrieved from the params ( e.g., REDIRECT_URL ) to keep the job
         # from being queued.
         if 'REDIRECT_URL' in incoming:
+            trans.sa_session.flush()
+            self.create_output_files( trans, job )
             # Get the dataset - there should only be 1
             for name in inp_data.keys():
                 dataset = inp_data[ name ]
@@ -457,12 +456,31 @@ class DefaultToolAction( object ):
             trans.sa_session.add( job )
             trans.sa_session.flush()
             trans.response.send_redirect( url_for( controller='tool_runner', action='redirect', redirect_url=redirect_url ) )
+        elif flush_job:
+            trans.sa_session.flush()
+            self.create_output_files( trans, job )
+            trans.sa_session.flush()
+            self.queue_job( trans, job )
+            return job, out_data
         else:
-            # Put the job in the queue if tracking in memory
-            trans.app.job_queue.put( job.id, job.tool_id )
-            trans.log_event( "Added job to the job queue, id: %s" % str(job.id), tool_id=job.tool_id )
             return job, out_data
 
+    def create_output_files( self, trans, job ):
+        """
+        Create the (empty) files of the output datasets of ``job``, all in the
+        same object store. The datasets need their ids, so the job must have
+        been flushed.
+        """
+        object_store_populator = ObjectStorePopulator( trans.app )
+        for dataset_assoc in job.output_datasets:
+            object_store_populator.set_object_store_id( dataset_assoc.dataset )
+        job.object_store_id = object_store_populator.object_store_id
+
+    def queue_job( self, trans, job ):
+        # Put the job in the queue if tracking in memory
+        trans.app.job_queue.put( job.id, job.tool_id )
+        trans.log_event( "Added job to the job queue, id: %s" % str(job.id), tool_id=job.tool_id )
+
     def get_output_name( self, output, dataset, tool, on_text, trans, incoming, history, params, job_params ):
         if output.label:
             params['tool'] = tool
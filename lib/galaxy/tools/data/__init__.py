@@ -262,6 +262,10 @@ class TabularToolDataTable( ToolDataTable, Dictifiable ):
         super( TabularToolDataTable, self ).__init__( config_element, tool_data_path, from_shed_config, filename)
         self.config_element = config_element
         self.data = []
+        # For each column (index) entries are looked up by, the rows (lists of
+        # fields) by value - built on first lookup, dropped whenever self.data
+        # changes.
+        self._column_indexes = {}
         self.configure_and_load( config_element, tool_data_path, from_shed_config)
 
     def configure_and_load( self, config_element, tool_data_path, from_shed_config=False, url_timeout=10 ):
@@ -432,6 +436,7 @@ class TabularToolDataTable( ToolDataTable, Dictifiable ):
     def extend_data_with( self, filename, errors=None ):
         here = os.path.dirname(os.path.abspath(filename))
         self.data.extend( self.parse_file_fields( open( filename ), errors=errors, here=here ) )
+        self._invalidate_column_indexes()
         if not self.allow_duplicate_entries:
             self._deduplicate_data()
 
@@ -489,6 +494,18 @@ class TabularToolDataTable( ToolDataTable, Dictifiable ):
         """
         Returns table entry associated with a col/val pair.
         """
+        rval = self.get_entries_for_values( query_attr, [ query_val ], return_attr, default=default, limit=limit )
+        if rval is default:
+            return default
+        return rval[ query_val ]
+
+    def get_entries_for_values( self, query_attr, query_vals, return_attr, default=None, limit=None ):
+        """
+        Returns a dictionary mapping each of query_vals to the table entries
+        associated with the col/val pair (or default if there are none), as
+        get_entries would for each value but looking up the columns once.
+        Returns default if query_attr or return_attr isn't a column.
+        """
         query_col = self.columns.get( query_attr, None )
         if query_col is None:
             return default
@@ -496,20 +513,47 @@ class TabularToolDataTable( ToolDataTable, Dictifiable ):
             return_col = self.columns.get( return_attr, None )
             if return_col is None:
                 return default
-        rval = []
-        # Look for table entry.
-        for fields in self.get_fields():
-            if fields[ query_col ] == query_val:
-                if return_attr is None:
+        else:
+            column_names = self.get_column_name_list()
+        column_index = self._get_column_index( query_col )
+        rval = {}
+        for query_val in query_vals:
+            rows = column_index.get( query_val, None )
+            if not rows:
+                rval[ query_val ] = default
+                continue
+            if limit is not None:
+                rows = rows[ :limit ]
+            if return_attr is None:
+                entries = []
+                for fields in rows:
                     field_dict = {}
-                    for i, col_name in enumerate( self.get_column_name_list() ):
+                    for i, col_name in enumerate( column_names ):
                         field_dict[ col_name or i ] = fields[i]
-                    rval.append( field_dict )
-                else:
-                    rval.append( fields[ return_col ] )
-                if limit is not None and len( rval ) == limit:
-                    break
-        return rval or default
+                    entries.append( field_dict )
+            else:
+                entries = [ fields[ return_col ] for fields in rows ]
+            rval[ query_val ] = entries or default
+        return rval
+
+    def _get_column_index( self, column ):
+        """
+        Returns a dictionary mapping each value in the column (by index) to
+        the rows holding it, in table order.
+        """
+        column_indexes = self._column_indexes
+        column_index = column_indexes.get( column, None )
+        if column_index is None:
+            column_index = {}
+            for fields in self.get_fields():
+                column_index.setdefault( fields[ column ], [] ).append( fields )
+            column_indexes[ column ] = column_index
+        return column_index
+
+    def _invalidate_column_indexes( self ):
+        # Replaced rather than cleared, lookups in progress keep using the
+        # indexes they started with.
+        self._column_indexes = {}
 
     def get_filename_for_source( self, source, default=None ):
         if source:
@@ -546,6 +590,7 @@ class TabularToolDataTable( ToolDataTable, Dictifiable ):
             fields = self._replace_field_separators( fields )
             if fields not in self.get_fields() or ( allow_duplicates and self.allow_duplicate_entries ):
                 self.data.append( fields )
+                self._invalidate_column_indexes()
             else:
                 log.debug( "Attempted to add fields (%s) to data table '%s', but this entry already exists and allow_duplicates is False.", fields, self.name )
                 is_error = True
@@ -645,6 +690,8 @@ class TabularToolDataTable( ToolDataTable, Dictifiable ):
                 hash_list.append( fields_hash )
         for i in reversed( dup_lines ):
             self.data.pop( i )
+        if dup_lines:
+            self._invalidate_column_indexes()
 
     @property
     def xml_string( self ):
@@ -6,39 +6,69 @@ collections from matched collections.
 import collections
 import galaxy.tools
 from galaxy.util import ExecutionTimer
-from galaxy.tools.actions import on_text_for_names
+from galaxy.tools.actions import DefaultToolAction, on_text_for_names
 
 import logging
 log = logging.getLogger( __name__ )
 
 EXECUTION_SUCCESS_MESSAGE = "Tool [%s] created job [%s] %s"
+BULK_EXECUTION_SUCCESS_MESSAGE = "Tool [%s] created %d jobs mapped over a collection %s"
 
 
 def execute( trans, tool, param_combinations, history, rerun_remap_job_id=None, collection_info=None, workflow_invocation_uuid=None ):
     """
     Execute a tool and return object containing summary (output data, number of
     failures, etc...).
+
+    When mapping a tool over a collection, the jobs and their outputs are all
+    built in the session first and then persisted together in a single
+    transaction with a couple of flushes, and only queued once committed.
     """
     execution_tracker = ToolExecutionTracker( tool, param_combinations, collection_info )
-    for params in execution_tracker.param_combinations:
-        job_timer = ExecutionTimer()
-        if workflow_invocation_uuid:
-            params[ '__workflow_invocation_uuid__' ] = workflow_invocation_uuid
-        elif '__workflow_invocation_uuid__' in params:
-            # Only workflow invocation code gets to set this, ignore user supplied
-            # values or rerun parameters.
-            del params[ '__workflow_invocation_uuid__' ]
-        job, result = tool.handle_single_execution( trans, rerun_remap_job_id, params, history, collection_info )
-        if job:
-            message = EXECUTION_SUCCESS_MESSAGE % (tool.id, job.id, job_timer)
-            log.debug(message)
-            execution_tracker.record_success( job, result )
-        else:
-            execution_tracker.record_error( result )
-
-    if collection_info:
-        history = history or tool.get_default_history_by_trans( trans )
-        execution_tracker.create_output_collections( trans, history, params )
+    bulk = collection_info is not None and isinstance( tool.tool_action, DefaultToolAction )
+    if bulk:
+        execution_timer = ExecutionTimer()
+        trans.sa_session.begin( subtransactions=True )
+    try:
+        for params in execution_tracker.param_combinations:
+            job_timer = ExecutionTimer()
+            if workflow_invocation_uuid:
+                params[ '__workflow_invocation_uuid__' ] = workflow_invocation_uuid
+            elif '__workflow_invocation_uuid__' in params:
+                # Only workflow invocation code gets to set this, ignore user supplied
+                # values or rerun parameters.
+                del params[ '__workflow_invocation_uuid__' ]
+            job, result = tool.handle_single_execution( trans, rerun_remap_job_id, params, history, collection_info, flush_job=not bulk )
+            if job:
+                if not bulk:
+                    message = EXECUTION_SUCCESS_MESSAGE % (tool.id, job.id, job_timer)
+                    log.debug(message)
+                execution_tracker.record_success( job, result )
+            else:
+                execution_tracker.record_error( result )
+
+        if bulk:
+            # Output datasets need their ids before their files can be created
+            trans.sa_session.flush()
+            for job in execution_tracker.successful_jobs:
+                tool.tool_action.create_output_files( trans, job )
+            trans.sa_session.flush()
+
+        if collection_info:
+            history = history or tool.get_default_history_by_trans( trans )
+            execution_tracker.create_output_collections( trans, history, params )
+
+        if bulk:
+            trans.sa_session.commit()
+    except:
+        if bulk:
+            trans.sa_session.rollback()
+        raise
+
+    if bulk:
+        for job in execution_tracker.successful_jobs:
+            tool.tool_action.queue_job( trans, job )
+        log.debug( BULK_EXECUTION_SUCCESS_MESSAGE % ( tool.id, len( execution_tracker.successful_jobs ), execution_timer ) )
 
     return execution_tracker
 
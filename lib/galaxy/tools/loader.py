@@ -4,14 +4,18 @@ from copy import deepcopy
 import os
 
 
-def load_tool(path):
+def load_tool(path, dependencies=None):
     """
     Loads tool from file system and preprocesses tool macros.
+
+    If a ``dependencies`` list is supplied, the paths of the other files
+    (imported macro files and XIncluded files) the tool was loaded from are
+    appended to it.
     """
-    tree = raw_tool_xml_tree(path)
+    tree = _parse_xml(path, dependencies)
     root = tree.getroot()
 
-    _import_macros(root, path)
+    _import_macros(root, path, dependencies)
 
     # Expand xml macros
     macro_dict = _macros_of_type(root, 'xml', lambda el: list(el))
@@ -49,11 +53,11 @@ def imported_macro_paths(root):
     return _imported_macro_paths_from_el(macros_el)
 
 
-def _import_macros(root, path):
+def _import_macros(root, path, dependencies=None):
     tool_dir = os.path.dirname(path)
     macros_el = _macros_el(root)
     if macros_el is not None:
-        macro_els = _load_macros(macros_el, tool_dir)
+        macro_els = _load_macros(macros_el, tool_dir, dependencies)
         _xml_set_children(macros_el, macro_els)
 
 
@@ -136,10 +140,10 @@ def _expand_yield_statements(macro_def, expand_el):
         _xml_replace(yield_el, expand_el_children, macro_def_parent_map)
 
 
-def _load_macros(macros_el, tool_dir):
+def _load_macros(macros_el, tool_dir, dependencies=None):
     macros = []
     # Import macros from external files.
-    macros.extend(_load_imported_macros(macros_el, tool_dir))
+    macros.extend(_load_imported_macros(macros_el, tool_dir, dependencies))
     # Load all directly defined macros.
     macros.extend(_load_embedded_macros(macros_el, tool_dir))
     return macros
@@ -172,13 +176,15 @@ def _load_embedded_macros(macros_el, tool_dir):
     return macros
 
 
-def _load_imported_macros(macros_el, tool_dir):
+def _load_imported_macros(macros_el, tool_dir, dependencies=None):
     macros = []
 
     for tool_relative_import_path in _imported_macro_paths_from_el(macros_el):
         import_path = \
             os.path.join(tool_dir, tool_relative_import_path)
-        file_macros = _load_macro_file(import_path, tool_dir)
+        if dependencies is not None:
+            dependencies.append(import_path)
+        file_macros = _load_macro_file(import_path, tool_dir, dependencies)
         macros.extend(file_macros)
 
     return macros
@@ -197,10 +203,10 @@ def _imported_macro_paths_from_el(macros_el):
     return imported_macro_paths
 
 
-def _load_macro_file(path, tool_dir):
-    tree = _parse_xml(path)
+def _load_macro_file(path, tool_dir, dependencies=None):
+    tree = _parse_xml(path, dependencies)
     root = tree.getroot()
-    return _load_macros(root, tool_dir)
+    return _load_macros(root, tool_dir, dependencies)
 
 
 def _xml_set_children(element, new_children):
@@ -227,8 +233,14 @@ def _xml_replace(query, targets, parent_map):
     parent_el.remove(query)
 
 
-def _parse_xml(fname):
+def _parse_xml(fname, dependencies=None):
     tree = ElementTree.parse(fname)
     root = tree.getroot()
-    ElementInclude.include(root)
+    if dependencies is None:
+        ElementInclude.include(root)
+    else:
+        def loader(href, parse, encoding=None):
+            dependencies.append(href)
+            return ElementInclude.default_loader(href, parse, encoding)
+        ElementInclude.include(root, loader=loader)
     return tree
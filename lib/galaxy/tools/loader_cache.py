@@ -0,0 +1,146 @@
+""" On-disk cache of macro expanded tool XML, shared between Galaxy processes.
+
+Parsing tool XML and expanding its macros (see :mod:`galaxy.tools.loader`)
+dominates toolbox startup with many tools installed. Each tool's expanded
+tree is stored as a marshalled structure of nested tuples - turning that
+back into elements is much cheaper than parsing the original XML - along
+with the modification time and size of every file it was built from (the
+tool file, imported macro files and XIncluded files), and the cached tree
+is used only as long as none of them has changed.
+"""
+from xml.etree import ElementTree
+
+import errno
+import hashlib
+import logging
+import marshal
+import multiprocessing
+import os
+import tempfile
+
+from galaxy.tools.loader import load_tool
+
+log = logging.getLogger(__name__)
+
+# Bump this whenever the stored structure, or the macro expansion itself,
+# changes so entries written by older code are ignored.
+CACHE_VERSION = 1
+
+
+class ToolXmlCache(object):
+    """ Loads macro expanded tool XML trees, going through a cache directory
+    which can be shared by any number of processes.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        try:
+            os.makedirs(cache_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def load_tool(self, path, dependencies=None):
+        """ Equivalent to :func:`galaxy.tools.loader.load_tool`.
+        """
+        path = os.path.abspath(path)
+        cache_path = self._cache_path(path)
+        cached = self._load_cached(path, cache_path)
+        if cached is not None:
+            tree, tool_dependencies = cached
+        else:
+            tool_dependencies = []
+            tree = load_tool(path, tool_dependencies)
+            self._store(path, cache_path, [path] + tool_dependencies, tree)
+        if dependencies is not None:
+            dependencies.extend(tool_dependencies)
+        return tree
+
+    def _cache_path(self, path):
+        return os.path.join(self.cache_dir, hashlib.sha1(path).hexdigest())
+
+    def _load_cached(self, path, cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                version, cached_path, file_stats, element = marshal.load(f)
+        except (IOError, EOFError, ValueError, TypeError):
+            return None
+        if version != CACHE_VERSION or cached_path != path:
+            return None
+        for file_path, stat in file_stats:
+            if _file_stat(file_path) != stat:
+                return None
+        # The first file is the tool's own.
+        dependencies = [file_path for file_path, stat in file_stats[1:]]
+        return ElementTree.ElementTree(_element_from_tuple(element)), dependencies
+
+    def _store(self, path, cache_path, dependencies, tree):
+        file_stats = [(file_path, _file_stat(file_path)) for file_path in dependencies]
+        data = (CACHE_VERSION, path, file_stats, _element_to_tuple(tree.getroot()))
+        try:
+            # Write to a temporary file and rename it so other processes never
+            # read partially written entries.
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump(data, f)
+            os.rename(temp_path, cache_path)
+        except (IOError, OSError, ValueError):
+            # Not being able to cache the tool is no reason to fail loading it.
+            log.warning("Failed to cache parsed tool XML for %s", path, exc_info=True)
+
+
+def load_tools_in_pool(paths, workers, cache_dir=None):
+    """ Load the macro expanded XML trees of the tools at ``paths`` in a pool
+    of ``workers`` processes (through the cache in ``cache_dir`` if given) and
+    return a dictionary mapping each path to its tree and the list of the other
+    files it was loaded from (see :func:`galaxy.tools.loader.load_tool`). Tools
+    that fail to load are left out, loading them again reports the error.
+    """
+    if not paths:
+        return {}
+    pool = multiprocessing.Pool(workers)
+    try:
+        chunksize = max(1, len(paths) // (workers * 4))
+        results = pool.map(_load_tool_as_tuple, [(path, cache_dir) for path in paths], chunksize)
+    finally:
+        pool.close()
+        pool.join()
+    return dict((path, (ElementTree.ElementTree(_element_from_tuple(element)), dependencies))
+                for path, element, dependencies in results if element is not None)
+
+
+def _load_tool_as_tuple(args):
+    # Runs in the worker processes of load_tools_in_pool, elements are sent
+    # back to the parent as (cheaply pickled) tuples.
+    path, cache_dir = args
+    dependencies = []
+    try:
+        if cache_dir:
+            tree = ToolXmlCache(cache_dir).load_tool(path, dependencies)
+        else:
+            tree = load_tool(path, dependencies)
+        return path, _element_to_tuple(tree.getroot()), dependencies
+    except Exception:
+        return path, None, None
+
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+def _element_to_tuple(element):
+    return (element.tag, dict(element.attrib), element.text, element.tail,
+            [_element_to_tuple(child) for child in element])
+
+
+def _element_from_tuple(element_tuple):
+    tag, attrib, text, tail, children = element_tuple
+    element = ElementTree.Element(tag, attrib)
+    element.text = text
+    element.tail = tail
+    element.extend([_element_from_tuple(child) for child in children])
+    return element
@@ -1,3 +1,5 @@
+from sqlalchemy import select
+
 import galaxy.model
 
 from logging import getLogger
@@ -22,6 +24,11 @@ class DatasetMatcher( object ):
         self.tool = param.tool
         self.value = value
         self.current_user_roles = ROLES_UNSET
+        self.current_user_role_ids = ROLES_UNSET
+        # dataset id => whether it can be accessed by the current user, filled
+        # in for whole histories at a time (see __can_access_dataset).
+        self.dataset_access = {}
+        self.access_checked_history_ids = set()
         filter_value = None
         if param.options:
             try:
@@ -36,7 +43,7 @@ class DatasetMatcher( object ):
         """
         dataset = hda.dataset
         state_valid = not dataset.state in INVALID_STATES
-        return state_valid and ( not check_security or self.__can_access_dataset( dataset ) )
+        return state_valid and ( not check_security or self.__can_access_dataset( dataset, hda ) )
 
     def valid_hda_match( self, hda, check_implicit_conversions=True, check_security=False ):
         """ Return False of this parameter can not be matched to the supplied
@@ -56,7 +63,7 @@ class DatasetMatcher( object ):
                 original_hda = hda
                 if converted_dataset:
                     hda = converted_dataset
-                if check_security and not self.__can_access_dataset( hda.dataset ):
+                if check_security and not self.__can_access_dataset( hda.dataset, hda ):
                     return False
                 rval = HdaImplicitMatch( hda, target_ext, original_hda )
             else:
@@ -97,11 +104,38 @@ class DatasetMatcher( object ):
         param = self.param
         return param.options and param._options_filter_attribute( hda ) != self.filter_value
 
-    def __can_access_dataset( self, dataset ):
-        # Lazily cache current_user_roles.
-        if self.current_user_roles is ROLES_UNSET:
-            self.current_user_roles = self.trans.get_current_user_roles()
-        return self.trans.app.security_agent.can_access_dataset( self.current_user_roles, dataset )
+    def __can_access_dataset( self, dataset, hda=None ):
+        history_id = getattr( hda, 'history_id', None )
+        if dataset.id is None or history_id is None:
+            # Lazily cache current_user_roles.
+            if self.current_user_roles is ROLES_UNSET:
+                self.current_user_roles = self.trans.get_current_user_roles()
+            return self.trans.app.security_agent.can_access_dataset( self.current_user_roles, dataset )
+        if dataset.id not in self.dataset_access:
+            # Parameters are matched against (nearly) every dataset of a
+            # history, so check the access to all of them in one go rather
+            # than issuing a few queries per dataset.
+            if history_id in self.access_checked_history_ids:
+                dataset_ids = [ dataset.id ]
+            else:
+                self.access_checked_history_ids.add( history_id )
+                dataset_ids = self.__history_dataset_ids( history_id )
+                dataset_ids.add( dataset.id )
+            self.__check_access( dataset_ids )
+        return self.dataset_access[ dataset.id ]
+
+    def __history_dataset_ids( self, history_id ):
+        hda_table = galaxy.model.HistoryDatasetAssociation.table
+        query = select( [ hda_table.c.dataset_id ], hda_table.c.history_id == history_id )
+        return set( dataset_id for ( dataset_id, ) in self.trans.app.model.context.execute( query ) )
+
+    def __check_access( self, dataset_ids ):
+        # Lazily cache current_user_role_ids.
+        if self.current_user_role_ids is ROLES_UNSET:
+            self.current_user_role_ids = self.trans.get_current_user_role_ids()
+        accessible_ids = self.trans.app.security_agent.accessible_dataset_ids( self.current_user_role_ids, dataset_ids )
+        for dataset_id in dataset_ids:
+            self.dataset_access[ dataset_id ] = dataset_id in accessible_ids
 
 
 class HdaDirectMatch( object ):
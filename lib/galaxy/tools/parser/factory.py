@@ -14,18 +14,27 @@ from .xml import XmlInputSource
 from .interface import InputSource
 
 
-from galaxy.tools.loader import load_tool as load_tool_xml
+from galaxy.tools.loader import load_tool
 
 
 import logging
 log = logging.getLogger(__name__)
 
 
-def get_tool_source(config_file, enable_beta_formats=True):
+def get_tool_source(config_file, enable_beta_formats=True, tool_cache=None):
+    """ Return a ToolSource for the tool at ``config_file``. XML tools are
+    loaded through ``tool_cache`` (a
+    :class:`galaxy.tools.loader_cache.ToolXmlCache`) if one is supplied.
+    """
+    if tool_cache is not None:
+        load_tool_xml = tool_cache.load_tool
+    else:
+        load_tool_xml = load_tool
     if not enable_beta_formats:
-        tree = load_tool_xml(config_file)
+        dependencies = []
+        tree = load_tool_xml(config_file, dependencies)
         root = tree.getroot()
-        return XmlToolSource(root)
+        return XmlToolSource(root, dependencies=dependencies)
 
     if config_file.endswith(".yml"):
         log.info("Loading tool from YAML - this is experimental - tool will not function in future.")
@@ -33,9 +42,10 @@ def get_tool_source(config_file, enable_beta_formats=True):
             as_dict = yaml.load(f)
             return YamlToolSource(as_dict)
     else:
-        tree = load_tool_xml(config_file)
+        dependencies = []
+        tree = load_tool_xml(config_file, dependencies)
         root = tree.getroot()
-        return XmlToolSource(root)
+        return XmlToolSource(root, dependencies=dependencies)
 
 
 def get_input_source(content):
@@ -33,8 +33,11 @@ class XmlToolSource(ToolSource):
     """ Responsible for parsing a tool from classic Galaxy representation.
     """
 
-    def __init__(self, root):
+    def __init__(self, root, dependencies=None):
         self.root = root
+        # Paths of the other files (imported macro files, XIncluded files)
+        # the tool was loaded from, if known.
+        self.dependencies = dependencies or []
 
     def parse_version(self):
         return self.root.get("version", None)
@@ -2,19 +2,25 @@
 Module for building and searching the index of tools
 installed within this Galaxy.
 """
+import os
+import threading
+
 from galaxy import eggs
 from galaxy.web.framework.helpers import to_unicode
 
 eggs.require( "Whoosh" )
+import whoosh.index
 from whoosh.filedb.filestore import RamStorage
-from whoosh.fields import Schema, STORED, TEXT
+from whoosh.fields import Schema, STORED, ID, TEXT
 from whoosh.scoring import BM25F
 from whoosh.qparser import MultifieldParser
-schema = Schema( id=STORED,
+from whoosh.writing import AsyncWriter
+schema = Schema( id=ID( stored=True, unique=True ),
                  name=TEXT,
                  description=TEXT,
                  section=TEXT,
-                 help=TEXT )
+                 help=TEXT,
+                 stamp=STORED )
 import logging
 log = logging.getLogger( __name__ )
 
@@ -22,57 +28,172 @@ class ToolBoxSearch( object ):
     """
     Support searching tools in a toolbox. This implementation uses
     the Whoosh search library.
+
+    The index is kept in memory, or in `index_dir` if given - where it
+    survives restarts and can be shared by processes loading the same tools.
+    Either way (re)building the index only (re)indexes tools added or changed
+    since they were last indexed, see `_tool_stamp`.
     """
 
-    def __init__( self, toolbox, index_help=True ):
+    def __init__( self, toolbox, index_help=True, index_dir=None ):
         """
         Create a searcher for `toolbox`.
         """
         self.toolbox = toolbox
+        self.index_help = index_help
+        self.index = self._open_index( index_dir )
+        self.parser = MultifieldParser( [ 'name', 'description', 'section', 'help' ], schema=schema )
+        # The current searcher for each boosts, replaced as the index
+        # changes. Searchers are shared by the threads searching at the same
+        # time, so a replaced searcher is only closed once none of them uses
+        # it any more (see `_acquire_searcher`).
+        self._searchers = {}
+        self._searcher_users = {}
+        self._replaced_searchers = {}
+        self._searchers_lock = threading.Lock()
         self.build_index( index_help )
 
+    def _open_index( self, index_dir ):
+        if not index_dir:
+            return RamStorage().create_index( schema )
+        if not os.path.exists( index_dir ):
+            os.makedirs( index_dir )
+        if whoosh.index.exists_in( index_dir ):
+            index = whoosh.index.open_dir( index_dir )
+            if sorted( index.schema.names() ) == sorted( schema.names() ):
+                return index
+            log.info( "Recreating the tool search index in %s (schema changed)." % index_dir )
+        return whoosh.index.create_in( index_dir, schema )
+
     def build_index( self, index_help=True ):
+        """
+        Bring the index up to date with the toolbox.
+        """
         log.debug( 'Starting to build toolbox index.' )
-        self.storage = RamStorage()
-        self.index = self.storage.create_index( schema )
-        writer = self.index.writer()
+        self.index_help = index_help
+        indexed_stamps = {}
+        with self.index.reader() as reader:
+            for fields in reader.all_stored_fields():
+                indexed_stamps[ fields[ 'id' ] ] = fields.get( 'stamp' )
+        tools = {}
         for id, tool in self.toolbox.tools():
             #  Do not add data managers to the public index
             if tool.tool_type == 'manage_data':
                 continue
-            add_doc_kwds = {
-                "id": id,
-                "name": to_unicode( tool.name ),
-                "description": to_unicode( tool.description ),
-                "section": to_unicode( tool.get_panel_section()[1] if len( tool.get_panel_section() ) == 2 else '' ),
-                "help": to_unicode( "" )
-            }
-            if index_help and tool.help:
-                try:
-                    add_doc_kwds['help'] = to_unicode( tool.help.render( host_url="", static_path="" ) )
-                except Exception:
-                    # Don't fail to build index just because a help message
-                    # won't render.
-                    pass
-            writer.add_document( **add_doc_kwds )
+            tools[ to_unicode( id ) ] = tool
+        changed = [ ( id, tool ) for id, tool in tools.iteritems() if indexed_stamps.get( id ) != self._tool_stamp( tool ) ]
+        removed = [ id for id in indexed_stamps if id not in tools ]
+        if changed or removed:
+            writer = AsyncWriter( self.index )
+            for id in removed:
+                writer.delete_by_term( 'id', id )
+            for id, tool in changed:
+                writer.update_document( **self._tool_document( id, tool ) )
+            writer.commit()
+        log.debug( 'Toolbox index finished, %d tools (re)indexed, %d removed.' % ( len( changed ), len( removed ) ) )
+
+    def update_tool( self, tool_id, tool=None ):
+        """
+        (Re)index `tool` as `tool_id` or, if None, remove `tool_id` from the
+        index.
+        """
+        id = to_unicode( tool_id )
+        writer = AsyncWriter( self.index )
+        if tool is None or tool.tool_type == 'manage_data':
+            writer.delete_by_term( 'id', id )
+        else:
+            writer.update_document( **self._tool_document( id, tool ) )
         writer.commit()
-        log.debug( 'Toolbox index finished.' )
+
+    def _tool_stamp( self, tool ):
+        """
+        Identifies what a tool's document was built from - it is rebuilt (and
+        the tool's help rendered) only when this changes.
+        """
+        mtimes = []
+        # Imported macro files may define the name, description or help too.
+        for path in [ tool.config_file ] + tool.config_file_dependencies:
+            try:
+                mtimes.append( os.path.getmtime( path ) )
+            except OSError:
+                mtimes.append( None )
+        return repr( ( tool.config_file, mtimes, tool.version, self._tool_section( tool ), self.index_help ) )
+
+    def _tool_section( self, tool ):
+        panel_section = tool.get_panel_section()
+        return panel_section[1] if len( panel_section ) == 2 else ''
+
+    def _tool_document( self, id, tool ):
+        add_doc_kwds = {
+            "id": id,
+            "name": to_unicode( tool.name ),
+            "description": to_unicode( tool.description ),
+            "section": to_unicode( self._tool_section( tool ) ),
+            "help": to_unicode( "" ),
+            "stamp": self._tool_stamp( tool ),
+        }
+        if self.index_help and tool.help:
+            try:
+                add_doc_kwds['help'] = to_unicode( tool.help.render( host_url="", static_path="" ) )
+            except Exception:
+                # Don't fail to build index just because a help message
+                # won't render.
+                pass
+        return add_doc_kwds
+
+    def _acquire_searcher( self, boosts ):
+        """
+        Return a searcher of the latest version of the index for `boosts`,
+        which must be handed back to `_release_searcher` once done with.
+        """
+        with self._searchers_lock:
+            searcher = self._searchers.get( boosts )
+            if searcher is None or not searcher.up_to_date():
+                # Not Searcher.refresh(), it may close what the searcher being
+                # replaced needs while other threads still use it.
+                if searcher is not None:
+                    self._replace_searcher( searcher )
+                tool_name_boost, tool_section_boost, tool_description_boost, tool_help_boost = boosts
+                # Change field boosts for searcher
+                searcher = self.index.searcher(
+                    weighting=BM25F(
+                        field_B={ 'name_B': tool_name_boost,
+                                  'section_B': tool_section_boost,
+                                  'description_B': tool_description_boost,
+                                  'help_B': tool_help_boost }
+                    )
+                )
+                self._searchers[ boosts ] = searcher
+            self._searcher_users[ id( searcher ) ] = self._searcher_users.get( id( searcher ), 0 ) + 1
+            return searcher
+
+    def _release_searcher( self, searcher ):
+        with self._searchers_lock:
+            users = self._searcher_users[ id( searcher ) ] - 1
+            if users:
+                self._searcher_users[ id( searcher ) ] = users
+                return
+            del self._searcher_users[ id( searcher ) ]
+            if id( searcher ) in self._replaced_searchers:
+                del self._replaced_searchers[ id( searcher ) ]
+                searcher.close()
+
+    def _replace_searcher( self, searcher ):
+        # Called holding _searchers_lock.
+        if id( searcher ) in self._searcher_users:
+            self._replaced_searchers[ id( searcher ) ] = searcher
+        else:
+            searcher.close()
 
     def search( self, q, tool_name_boost, tool_section_boost, tool_description_boost, tool_help_boost, tool_search_limit ):
         """
-        Perform search on the in-memory index. Weight in the given boosts.
+        Perform search on the index. Weight in the given boosts.
         """
-        # Change field boosts for searcher
-        searcher = self.index.searcher(
-            weighting=BM25F(
-                field_B={ 'name_B': float( tool_name_boost ),
-                          'section_B': float( tool_section_boost ),
-                          'description_B': float( tool_description_boost ),
-                          'help_B': float( tool_help_boost ) }
-            )
-        )
-        # Set query to search name, description, section, and help.
-        parser = MultifieldParser( [ 'name', 'description', 'section', 'help' ], schema=schema )
-        # Perform the search
-        hits = searcher.search( parser.parse( '*' + q + '*' ), limit=float( tool_search_limit ) )
-        return [ hit[ 'id' ] for hit in hits ]
+        boosts = ( float( tool_name_boost ), float( tool_section_boost ), float( tool_description_boost ), float( tool_help_boost ) )
+        searcher = self._acquire_searcher( boosts )
+        try:
+            # Perform the search, on name, description, section, and help.
+            hits = searcher.search( self.parser.parse( '*' + q + '*' ), limit=float( tool_search_limit ) )
+            return [ hit[ 'id' ] for hit in hits ]
+        finally:
+            self._release_searcher( searcher )
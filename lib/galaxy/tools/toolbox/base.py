@@ -14,6 +14,7 @@ from galaxy.util.odict import odict
 from galaxy.util import listify
 from galaxy.util import parse_xml
 from galaxy.util import string_as_bool
+from galaxy.util import ExecutionTimer
 from galaxy.util.bunch import Bunch
 
 from tool_shed.util import common_util
@@ -24,6 +25,7 @@ from .panel import ToolSection
 from .panel import panel_item_types
 from .integrated_panel import ManagesIntegratedToolPanelMixin
 
+from .lazy import LazyTool
 from .lineages import LineageMap
 from .tags import tool_tag_manager
 
@@ -74,10 +76,12 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
         self._filter_factory = FilterFactory( self )
         self._tool_tag_manager = tool_tag_manager( app )
         self._init_tools_from_configs( config_filenames )
+        panel_timer = ExecutionTimer()
         if self.app.name == 'galaxy' and self._integrated_tool_panel_config_has_contents:
             # Load self._tool_panel based on the order in self._integrated_tool_panel.
             self._load_tool_panel()
         self._save_integrated_tool_panel()
+        log.info( "Built the tool panel %s" % panel_timer )
 
     def create_tool( self, config_file, repository_id=None, guid=None, **kwds ):
         raise NotImplementedError()
@@ -94,11 +98,44 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
                 directory_config_files = [ config_file for config_file in directory_contents if config_file.endswith( ".xml" ) ]
                 config_filenames.remove( config_filename )
                 config_filenames.extend( directory_config_files )
+        self._preload_tools( config_filenames )
+        load_timer = ExecutionTimer()
         for config_filename in config_filenames:
             try:
                 self._init_tools_from_config( config_filename )
             except:
                 log.exception( "Error loading tools defined in config %s", config_filename )
+        log.info( "Loaded %d tools %s" % ( len( self._tools_by_id ), load_timer ) )
+
+    def _preload_tools( self, config_filenames ):
+        """ Hook for subclasses to prepare loading the tools defined in
+        `config_filenames` before they are loaded (in order) into the panel.
+        """
+
+    def _tool_paths_in_configs( self, config_filenames ):
+        """ Return the paths of the tool config files referenced by `tool`
+        elements (at the top level or in sections) of the tool configs
+        `config_filenames`.
+        """
+        tool_paths = []
+        for config_filename in config_filenames:
+            try:
+                root = parse_xml( config_filename ).getroot()
+            except Exception:
+                # Reported when the config is loaded.
+                continue
+            tool_path = self.__resolve_tool_path( root.get( 'tool_path' ), config_filename )
+            for elem in root:
+                if elem.tag == 'section':
+                    tool_elems = [ sub_elem for sub_elem in elem if sub_elem.tag == 'tool' ]
+                elif elem.tag == 'tool':
+                    tool_elems = [ elem ]
+                else:
+                    continue
+                for tool_elem in tool_elems:
+                    if tool_elem.get( 'file' ):
+                        tool_paths.append( os.path.join( tool_path, tool_elem.get( 'file' ) ) )
+        return tool_paths
 
     def _init_tools_from_config( self, config_filename ):
         """
@@ -368,6 +405,24 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
 
     def get_tool( self, tool_id, tool_version=None, get_all_versions=False, exact=False ):
         """Attempt to locate a tool in the tool box."""
+        tool = self._find_tool( tool_id, tool_version=tool_version, get_all_versions=get_all_versions, exact=exact )
+        if get_all_versions and tool:
+            return [ materialized for materialized in map( self._materialize_tool, tool ) if materialized is not None ]
+        return self._materialize_tool( tool )
+
+    def _materialize_tool( self, tool ):
+        """ Return the actual tool for tools the toolbox holds only stand-ins
+        for (see `create_lazy_tool`) - or None if it fails to load.
+        """
+        if isinstance( tool, LazyTool ):
+            try:
+                return tool.materialize()
+            except Exception:
+                log.exception( "Error loading tool from path: %s" % tool.config_file )
+                return None
+        return tool
+
+    def _find_tool( self, tool_id, tool_version=None, get_all_versions=False, exact=False ):
         if tool_version:
             tool_version = str( tool_version )
 
@@ -411,7 +466,7 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
         return None
 
     def has_tool( self, tool_id, tool_version=None, exact=False ):
-        return self.get_tool( tool_id, tool_version=tool_version, exact=exact ) is not None
+        return self._find_tool( tool_id, tool_version=tool_version, exact=exact ) is not None
 
     def get_tool_id( self, tool_id ):
         """ Take a tool id (potentially from a different Galaxy instance or that
@@ -420,7 +475,7 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
         tool shed installed tool with the same short id).
         """
         if tool_id not in self._tools_by_id:
-            tool = self.get_tool( tool_id )
+            tool = self._find_tool( tool_id )
             if tool:
                 tool_id = tool.id
             else:
@@ -598,7 +653,7 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
                     repository_id = self.app.security.encode_id( tool_shed_repository.id )
                 # Else there is not yet a tool_shed_repository record, we're in the process of installing
                 # a new repository, so any included tools can be loaded into the tool panel.
-            tool = self.load_tool( os.path.join( tool_path, path ), guid=guid, repository_id=repository_id )
+            tool = self.load_tool( os.path.join( tool_path, path ), guid=guid, repository_id=repository_id, lazy=True )
             if string_as_bool(elem.get( 'hidden', False )):
                 tool.hidden = True
             key = 'tool_%s' % str( tool.id )
@@ -729,10 +784,20 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
         if tool_loaded or force_watch:
             self._tool_watcher.watch_directory( directory, quick_load )
 
-    def load_tool( self, config_file, guid=None, repository_id=None, **kwds ):
-        """Load a single tool from the file named by `config_file` and return an instance of `Tool`."""
+    def create_lazy_tool( self, config_file, repository_id=None, guid=None, **kwds ):
+        """ Create a stand-in (LazyTool) for a tool if the toolbox supports
+        loading tools lazily, else (by default) the tool itself.
+        """
+        return self.create_tool( config_file=config_file, repository_id=repository_id, guid=guid, **kwds )
+
+    def load_tool( self, config_file, guid=None, repository_id=None, lazy=False, **kwds ):
+        """Load a single tool from the file named by `config_file` and return an instance of `Tool`
+        (or, if `lazy`, possibly a LazyTool standing in for it)."""
         # Parse XML configuration file and get the root element
-        tool = self.create_tool( config_file=config_file, repository_id=repository_id, guid=guid, **kwds )
+        if lazy:
+            tool = self.create_lazy_tool( config_file=config_file, repository_id=repository_id, guid=guid, **kwds )
+        else:
+            tool = self.create_tool( config_file=config_file, repository_id=repository_id, guid=guid, **kwds )
         tool_id = tool.id
         if not tool_id.startswith("__"):
             # do not monitor special tools written to tmp directory - no reason
@@ -763,6 +828,18 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
                 self._tools_by_id[ tool_id ] = tool
         else:
             self._tools_by_id[ tool_id ] = tool
+        self._update_tool_search( tool_id )
+
+    def _update_tool_search( self, tool_id ):
+        """ Bring the app's tool search index, if it is this toolbox's, up to
+        date with the (added, changed or removed) tool `tool_id`.
+        """
+        toolbox_search = getattr( self.app, "toolbox_search", None )
+        if toolbox_search is not None and getattr( toolbox_search, "toolbox", None ) is self:
+            try:
+                toolbox_search.update_tool( tool_id, self._tools_by_id.get( tool_id ) )
+            except Exception:
+                log.exception( "Failed to update the tool search index for tool %s" % tool_id )
 
     def package_tool( self, trans, tool_id ):
         """
@@ -931,6 +1008,7 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
         else:
             tool = self._tools_by_id[ tool_id ]
             del self._tools_by_id[ tool_id ]
+            self._update_tool_search( tool_id )
             if remove_from_panel:
                 tool_key = 'tool_' + tool_id
                 for key, val in self._tool_panel.items():
@@ -0,0 +1,147 @@
+""" Stand-ins for tools that are only fully loaded when used.
+"""
+import threading
+
+from galaxy.util.odict import odict
+from galaxy.web import url_for
+
+import logging
+log = logging.getLogger( __name__ )
+
+
+class LazyTool( object ):
+    """ Stands in for a (plain) ``Tool`` in the toolbox - holding just what
+    the tool panel, its filters and listings need - and creates the actual
+    tool on first use of anything else (see `materialize`).
+
+    Attributes set on the stand-in (e.g. by the toolbox, as it loads tools
+    installed from tool sheds) are applied to the actual tool whenever it is
+    created.
+    """
+    tool_type = 'default'
+
+    def __init__( self, config_file, tool_source, app, create, materialized_tools, guid=None, repository_id=None ):
+        root = getattr( tool_source, "root", None )
+        inputs_elem = root.find( "inputs" ) if root is not None else None
+        uihints_elem = root.find( "uihints" ) if root is not None else None
+        old_id = tool_source.parse_id()
+        version = tool_source.parse_version() or "1.0.0"
+        self.__dict__.update(
+            config_file=config_file,
+            config_file_dependencies=list( getattr( tool_source, "dependencies", [] ) ),
+            app=app,
+            guid=guid,
+            repository_id=repository_id,
+            old_id=old_id,
+            id=old_id if guid is None else guid,
+            name=tool_source.parse_name(),
+            version=version,
+            description=tool_source.parse_description(),
+            hidden=tool_source.parse_hidden(),
+            require_login=tool_source.parse_require_login( False ),
+            tool_shed=None,
+            repository_name=None,
+            repository_owner=None,
+            installed_changeset_revision=None,
+            _lazy_target=inputs_elem.get( "target", "galaxy_main" ) if inputs_elem is not None else "galaxy_main",
+            _lazy_min_width=uihints_elem.get( "minwidth", -1 ) if uihints_elem is not None else -1,
+            _lazy_create=create,
+            _lazy_materialized_tools=materialized_tools,
+            _lazy_overrides={},
+            _lazy_tool=None,
+        )
+
+    @property
+    def materialized( self ):
+        return self._lazy_tool is not None
+
+    def materialize( self ):
+        """ Return the actual tool, creating it if needed.
+        """
+        return self._lazy_materialized_tools.get( self )
+
+    def _create( self ):
+        tool = self._lazy_create()
+        for name, value in self._lazy_overrides.items():
+            setattr( tool, name, value )
+        return tool
+
+    @property
+    def tool_version( self ):
+        """Return a ToolVersion if one exists for our id"""
+        return self.app.install_model.context.query( self.app.install_model.ToolVersion ) \
+                                             .filter( self.app.install_model.ToolVersion.table.c.tool_id == self.id ) \
+                                             .first()
+
+    def allow_user_access( self, user, attempting_access=True ):
+        # Only plain tools are loaded lazily and these don't restrict access.
+        return True
+
+    def get_panel_section( self ):
+        return self.app.toolbox.get_integrated_section_for_tool( self )
+
+    def to_dict( self, trans, link_details=False, io_details=False ):
+        if io_details:
+            return self.materialize().to_dict( trans, link_details=link_details, io_details=io_details )
+        # As Tool.to_dict, without creating the tool.
+        tool_dict = dict( model_class='Tool', id=self.id, name=self.name, version=self.version, description=self.description )
+        if link_details:
+            tool_dict.update( { 'link': url_for( controller='tool_runner', tool_id=self.id ),
+                                'min_width': self._lazy_min_width,
+                                'target': self._lazy_target } )
+        tool_dict[ 'panel_section_id' ], tool_dict[ 'panel_section_name' ] = self.get_panel_section()
+        return tool_dict
+
+    def __getattr__( self, name ):
+        # Only called for attributes not found on the stand-in.
+        if name.startswith( '_lazy_' ) or name.startswith( '__' ):
+            raise AttributeError( name )
+        return getattr( self.materialize(), name )
+
+    def __setattr__( self, name, value ):
+        self.__dict__[ name ] = value
+        if not name.startswith( '_lazy_' ):
+            self._lazy_overrides[ name ] = value
+            tool = self._lazy_tool
+            if tool is not None:
+                setattr( tool, name, value )
+
+    def __repr__( self ):
+        return "<LazyTool %s (%s)>" % ( self.id, "materialized" if self.materialized else "not materialized" )
+
+
+class MaterializedTools( object ):
+    """ Keeps the actual tools of (at most `max_size`, unless 0) most recently
+    used LazyTools - those of the least recently used are dropped and will be
+    created again when next used.
+    """
+
+    def __init__( self, max_size=0 ):
+        self.max_size = max_size
+        self._lazy_tools = odict()
+        self._lock = threading.RLock()
+
+    def get( self, lazy_tool ):
+        with self._lock:
+            tool = lazy_tool._lazy_tool
+            if tool is None:
+                tool = lazy_tool._create()
+                lazy_tool._lazy_tool = tool
+            elif id( lazy_tool ) in self._lazy_tools:
+                del self._lazy_tools[ id( lazy_tool ) ]
+            self._lazy_tools[ id( lazy_tool ) ] = lazy_tool
+            if self.max_size:
+                while len( self._lazy_tools ) > self.max_size:
+                    evicted_key = self._lazy_tools.keys()[ 0 ]
+                    self._lazy_tools[ evicted_key ]._lazy_tool = None
+                    del self._lazy_tools[ evicted_key ]
+            return tool
+
+    def clear( self ):
+        with self._lock:
+            for lazy_tool in self._lazy_tools.values():
+                lazy_tool._lazy_tool = None
+            self._lazy_tools = odict()
+
+    def __len__( self ):
+        return len( self._lazy_tools )
@@ -1,5 +1,6 @@
 import sys
 from galaxy.datatypes.tabular import Tabular
+from galaxy.datatypes.dataproviders.dataset import DatasetDataProvider
 from galaxy.util.json import loads
 
 class BaseDataProvider( object ):
@@ -129,8 +130,13 @@ class ColumnDataProvider( BaseDataProvider ):
 
         returning_data = False
         f = open( self.original_dataset.file_name )
-        #TODO: add f.seek if given fptr in kwargs
-        for count, line in enumerate( f ):
+        # seek to the closest indexed line rather than reading every line before start_val
+        first_line = 0
+        line_index = DatasetDataProvider.get_line_offset_index( self.original_dataset, 'all' )
+        if line_index is not None:
+            first_line, file_ptr = line_index.find( start_val )
+            f.seek( file_ptr )
+        for count, line in enumerate( f, first_line ):
 
             # check line v. desired start, end
             if count < start_val:
@@ -124,20 +124,24 @@ class VisualizationsRegistry( pluginframework.PageServingPluginManager ):
         return self.plugins[ key ]
 
     # -- building links to visualizations from objects --
-    def get_visualizations( self, trans, target_object ):
+    def get_visualizations( self, trans, target_object, datatype_classes=None ):
         """
         Get the names of visualizations usable on the `target_object` and
         the urls to call in order to render the visualizations.
+
+        Pass the same dictionary as `datatype_classes` when getting the
+        visualizations of many objects to look up the datatype classes the
+        plugins' tests name only once.
         """
         # TODO:?? a list of objects? YAGNI?
         applicable_visualizations = []
         for vis_name in self.plugins:
-            url_data = self.get_visualization( trans, vis_name, target_object )
+            url_data = self.get_visualization( trans, vis_name, target_object, datatype_classes=datatype_classes )
             if url_data:
                 applicable_visualizations.append( url_data )
         return applicable_visualizations
 
-    def get_visualization( self, trans, visualization_name, target_object ):
+    def get_visualization( self, trans, visualization_name, target_object, datatype_classes=None ):
         """
         Return data to build a url to the visualization with the given
         `visualization_name` if it's applicable to `target_object` or
@@ -160,7 +164,7 @@ class VisualizationsRegistry( pluginframework.PageServingPluginManager ):
 
             # TODO: not true: must have test currently
             tests = data_source[ 'tests' ]
-            if tests and not self.is_object_applicable( trans, target_object, tests ):
+            if tests and not self.is_object_applicable( trans, target_object, tests, datatype_classes=datatype_classes ):
                 continue
             # log.debug( '\t passed tests' )
 
@@ -179,7 +183,7 @@ class VisualizationsRegistry( pluginframework.PageServingPluginManager ):
 
         return None
 
-    def is_object_applicable( self, trans, target_object, data_source_tests ):
+    def is_object_applicable( self, trans, target_object, data_source_tests, datatype_classes=None ):
         """
         Run a visualization's data_source tests to find out if
         it can be applied to the target_object.
@@ -198,7 +202,12 @@ class VisualizationsRegistry( pluginframework.PageServingPluginManager ):
                 if result_type == 'datatype':
                     # convert datatypes to their actual classes (for use with isinstance)
                     datatype_class_name = test_result
-                    test_result = trans.app.datatypes_registry.get_datatype_class_by_name( datatype_class_name )
+                    if datatype_classes is not None and datatype_class_name in datatype_classes:
+                        test_result = datatype_classes[ datatype_class_name ]
+                    else:
+                        test_result = trans.app.datatypes_registry.get_datatype_class_by_name( datatype_class_name )
+                        if datatype_classes is not None:
+                            datatype_classes[ datatype_class_name ] = test_result
                     if not test_result:
                         # but continue (with other tests) if can't find class by that name
                         # if self.debug:
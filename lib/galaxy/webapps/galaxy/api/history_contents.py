@@ -1,6 +1,7 @@
 """
 API operations on the contents of a history.
 """
+import datetime
 
 from galaxy import exceptions
 from galaxy import util
@@ -18,12 +19,22 @@ from galaxy.managers import histories
 from galaxy.managers import hdas
 from galaxy.managers.collections_util import api_payload_to_create_params
 from galaxy.managers.collections_util import dictify_dataset_collection_instance
+from galaxy.model.orm.now import now
 from galaxy.util import validation
 
 
 import logging
 log = logging.getLogger( __name__ )
 
+# Update times are set by the clocks of the Galaxy processes making changes,
+# and only become visible once those changes are committed. The time handed
+# out for the next `since` request is therefore this much earlier than the
+# request - changes committed up to this long after they were made (or made
+# by processes whose clocks are up to this far behind) are still returned
+# by the next request. Changes made within the margin are returned again,
+# clients are expected to ignore contents they already have.
+SINCE_SAFETY_MARGIN = datetime.timedelta( seconds=60 )
+
 
 class HistoryContentsController( BaseAPIController, UsesLibraryMixin, UsesLibraryMixinItems, UsesTagsMixin ):
 
@@ -62,11 +73,28 @@ class HistoryContentsController( BaseAPIController, UsesLibraryMixin, UsesLibrar
         :param  types:      (optional) kinds of contents to index (currently just
                             dataset, but dataset_collection will be added shortly).
         :type   types:      str
+        :type   since:      str
+        :param  since:      (optional) an ISO formatted date - only return the
+                            datasets updated after it (collections are always
+                            returned). The time to pass as `since` on the next
+                            request is sent in the `X-Galaxy-Contents-Update-Time`
+                            response header - it lags behind the request (see
+                            `SINCE_SAFETY_MARGIN`), so the next response may
+                            repeat some of the contents of this one.
+        :type   min_hid:    int
+        :param  min_hid:    (optional) only return contents with a hid at least this
+        :type   max_hid:    int
+        :param  max_hid:    (optional) only return contents with a hid at most this
+        :type   limit:      int
+        :param  limit:      (optional) return at most this many contents (lowest hids
+                            first - page through with `min_hid`)
 
         :rtype:     list
         :returns:   dictionaries containing summary or detailed HDA information
         """
         rval = []
+        # taken before querying, see SINCE_SAFETY_MARGIN
+        update_time = now() - SINCE_SAFETY_MARGIN
 
         history = self.history_manager.get_accessible( self.decode_id( history_id ), trans.user, current_history=trans.history )
 
@@ -96,22 +124,56 @@ class HistoryContentsController( BaseAPIController, UsesLibraryMixin, UsesLibrar
             if details and details != 'all':
                 details = util.listify( details )
 
-        for content in history.contents_iter( **contents_kwds ):
+        since = kwd.get( 'since', None )
+        if since:
+            contents_kwds[ 'since' ] = self._parse_isoformat_date( 'since', since )
+        for key in ( 'min_hid', 'max_hid', 'limit' ):
+            if kwd.get( key, None ) is not None:
+                contents_kwds[ key ] = self._parse_int( key, kwd[ key ] )
+        contents = history.contents_iter( **contents_kwds )
+
+        # hdas are serialized together (per view) and put in their place after
+        hdas_by_view = { 'detailed': [], 'summary': [] }
+        for content in contents:
             encoded_content_id = trans.security.encode_id( content.id )
             detailed = details == 'all' or ( encoded_content_id in details )
 
             if isinstance( content, trans.app.model.HistoryDatasetAssociation ):
                 view = 'detailed' if detailed else 'summary'
-                hda_dict = self.hda_serializer.serialize_to_view( content, view=view, user=trans.user, trans=trans )
-                rval.append( hda_dict )
+                hdas_by_view[ view ].append( ( len( rval ), content ) )
+                rval.append( None )
 
             elif isinstance( content, trans.app.model.HistoryDatasetCollectionAssociation ):
                 view = 'element' if detailed else 'collection'
                 collection_dict = self.__collection_dict( trans, content, view=view )
                 rval.append( collection_dict )
 
+        for view, indexed_hdas in hdas_by_view.items():
+            if not indexed_hdas:
+                continue
+            indices, hdas = zip( *indexed_hdas )
+            hda_dicts = self.hda_serializer.serialize_many( hdas, view=view, user=trans.user, trans=trans )
+            for index, hda_dict in zip( indices, hda_dicts ):
+                rval[ index ] = hda_dict
+
+        trans.response.headers[ 'X-Galaxy-Contents-Update-Time' ] = update_time.isoformat()
         return rval
 
+    def _parse_isoformat_date( self, key, datestring ):
+        # isoformat() leaves off the microseconds when there are none
+        for format in ( "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S" ):
+            try:
+                return datetime.datetime.strptime( datestring, format )
+            except ValueError:
+                pass
+        raise exceptions.RequestParameterInvalidException( "%s must be an ISO formatted date: %s" % ( key, datestring ) )
+
+    def _parse_int( self, key, value ):
+        try:
+            return int( value )
+        except ( TypeError, ValueError ):
+            raise exceptions.RequestParameterInvalidException( "%s must be an integer: %s" % ( key, value ) )
+
     def __collection_dict( self, trans, dataset_collection_instance, view="collection" ):
         return dictify_dataset_collection_instance( dataset_collection_instance,
             security=trans.security, parent=dataset_collection_instance.history, view=view )
@@ -9,6 +9,11 @@ Galaxy should be importable on sys.path and output_filename_override should be
 set to the path of the dataset on which metadata is being set
 (output_filename_override could previously be left empty and the path would be
 constructed automatically).
+
+If the job was allocated more than one slot ($GALAXY_SLOTS) the metadata of its
+outputs is set in parallel in as many processes, and the metadata of big
+datasets whose datatype supports it (see Data.can_set_meta_in_chunks) is set
+from chunks of the dataset computed in parallel.
 """
 
 import logging
@@ -17,6 +22,7 @@ log = logging.getLogger( __name__ )
 
 import cPickle
 import json
+import multiprocessing
 import os
 import sys
 
@@ -31,11 +37,12 @@ from galaxy import eggs
 import pkg_resources
 import galaxy.model.mapping  # need to load this before we unpickle, in order to setup properties assigned by the mappers
 galaxy.model.Job()  # this looks REAL stupid, but it is REQUIRED in order for SA to insert parameters into the classes defined by the mappers --> it appears that instantiating ANY mapper'ed class would suffice here
+from galaxy.datatypes.util import line_scanner
 from galaxy.util import stringify_dictionary_keys
 from sqlalchemy.orm import clear_mappers
 
 
-def set_meta_with_tool_provided( dataset_instance, file_dict, set_meta_kwds, datatypes_registry ):
+def set_meta_with_tool_provided( dataset_instance, file_dict, set_meta_kwds, datatypes_registry, chunks=None ):
     # This method is somewhat odd, in that we set the metadata attributes from tool,
     # then call set_meta, then set metadata attributes from tool again.
     # This is intentional due to interplay of overwrite kwd, the fact that some metadata
@@ -59,7 +66,10 @@ def set_meta_with_tool_provided( dataset_instance, file_dict, set_meta_kwds, dat
 
     for metadata_name, metadata_value in file_dict.get( 'metadata', {} ).iteritems():
         setattr( dataset_instance.metadata, metadata_name, metadata_value )
-    dataset_instance.datatype.set_meta( dataset_instance, **set_meta_kwds )
+    if chunks is None:
+        dataset_instance.datatype.set_meta( dataset_instance, **set_meta_kwds )
+    else:
+        dataset_instance.datatype.set_meta_from_chunks( dataset_instance, chunks, **set_meta_kwds )
     for metadata_name, metadata_value in file_dict.get( 'metadata', {} ).iteritems():
         setattr( dataset_instance.metadata, metadata_name, metadata_value )
 
@@ -88,54 +98,171 @@ def set_metadata():
             except:
                 continue
 
-    for filenames in sys.argv[1:]:
-        fields = filenames.split( ',' )
-        filename_in = fields.pop( 0 )
-        filename_kwds = fields.pop( 0 )
-        filename_out = fields.pop( 0 )
-        filename_results_code = fields.pop( 0 )
-        dataset_filename_override = fields.pop( 0 )
-        # Need to be careful with the way that these parameters are populated from the filename splitting,
-        # because if a job is running when the server is updated, any existing external metadata command-lines
-        #will not have info about the newly added override_metadata file
-        if fields:
-            override_metadata = fields.pop( 0 )
-        else:
-            override_metadata = None
-        set_meta_kwds = stringify_dictionary_keys( json.load( open( filename_kwds ) ) )  # load kwds; need to ensure our keywords are not unicode
-        try:
-            dataset = cPickle.load( open( filename_in ) )  # load DatasetInstance
-            dataset.dataset.external_filename = dataset_filename_override
-            files_path = os.path.abspath(os.path.join( tool_job_working_directory, "dataset_%s_files" % (dataset.dataset.id) ))
-            dataset.dataset.external_extra_files_path = files_path
-            if dataset.dataset.id in existing_job_metadata_dict:
-                dataset.extension = existing_job_metadata_dict[ dataset.dataset.id ].get( 'ext', dataset.extension )
-            # Metadata FileParameter types may not be writable on a cluster node, and are therefore temporarily substituted with MetadataTempFiles
-            if override_metadata:
-                override_metadata = json.load( open( override_metadata ) )
-                for metadata_name, metadata_file_override in override_metadata:
-                    if galaxy.datatypes.metadata.MetadataTempFile.is_JSONified_value( metadata_file_override ):
-                        metadata_file_override = galaxy.datatypes.metadata.MetadataTempFile.from_JSON( metadata_file_override )
-                    setattr( dataset.metadata, metadata_name, metadata_file_override )
-            file_dict = existing_job_metadata_dict.get( dataset.dataset.id, {} )
-            set_meta_with_tool_provided( dataset, file_dict, set_meta_kwds, datatypes_registry )
-            dataset.metadata.to_JSON_dict( filename_out )  # write out results of set_meta
-            json.dump( ( True, 'Metadata has been set successfully' ), open( filename_results_code, 'wb+' ) )  # setting metadata has succeeded
-        except Exception, e:
-            json.dump( ( False, str( e ) ), open( filename_results_code, 'wb+' ) )  # setting metadata has failed somehow
-
-    for i, ( filename, file_dict ) in enumerate( new_job_metadata_dict.iteritems(), start=1 ):
-        new_dataset = galaxy.model.Dataset( id=-i, external_filename=os.path.join( tool_job_working_directory, file_dict[ 'filename' ] ) )
-        extra_files = file_dict.get( 'extra_files', None )
-        if extra_files is not None:
-            new_dataset._extra_files_path = os.path.join( tool_job_working_directory, extra_files )
-        new_dataset.state = new_dataset.states.OK
-        new_dataset_instance = galaxy.model.HistoryDatasetAssociation( id=-i, dataset=new_dataset, extension=file_dict.get( 'ext', 'data' ) )
-        set_meta_with_tool_provided( new_dataset_instance, file_dict, set_meta_kwds, datatypes_registry )
-        file_dict[ 'metadata' ] = json.loads( new_dataset_instance.metadata.to_JSON_dict() ) #storing metadata in external form, need to turn back into dict, then later jsonify
+    # The metadata of the outputs is set in a pool of worker processes
+    # (forked after the state they need is set up here) if the job has more
+    # than one slot
+    _state.update( tool_job_working_directory=tool_job_working_directory,
+                   datatypes_registry=datatypes_registry,
+                   existing_job_metadata_dict=existing_job_metadata_dict,
+                   new_job_metadata_dict=new_job_metadata_dict )
+    if len( sys.argv ) > 1:
+        # new primary datasets are set up with the set_meta() keywords of the last output
+        _state[ 'new_dataset_set_meta_kwds' ] = stringify_dictionary_keys( json.load( open( sys.argv[ -1 ].split( ',' )[ 1 ] ) ) )
+    pool = get_metadata_pool()
+    try:
+        outputs = [ ( _set_existing_dataset_meta, ( filenames, ) ) for filenames in sys.argv[1:] ]
+        new_datasets = list( enumerate( new_job_metadata_dict.iteritems(), start=1 ) )
+        outputs.extend( ( _set_new_dataset_meta, ( i, filename ) ) for i, ( filename, file_dict ) in new_datasets )
+        results = set_outputs_meta( pool, outputs )
+    finally:
+        if pool is not None:
+            pool.terminate()
+    for ( i, ( filename, file_dict ) ), metadata in zip( new_datasets, results[ len( sys.argv ) - 1: ] ):
+        file_dict[ 'metadata' ] = metadata  # storing metadata in external form, later jsonified
+
     if existing_job_metadata_dict or new_job_metadata_dict:
         with open( job_metadata, 'wb' ) as job_metadata_fh:
             for value in existing_job_metadata_dict.values() + new_job_metadata_dict.values():
                 job_metadata_fh.write( "%s\n" % ( json.dumps( value ) ) )
 
     clear_mappers()
+
+
+# Set up by set_metadata before any worker processes are forked
+_state = {}
+
+
+def get_metadata_pool():
+    """
+    Return a pool of as many processes as slots were allocated to the job
+    (metadata is set at the end of the job's script) or None for one slot.
+    """
+    try:
+        processes = int( os.environ.get( 'GALAXY_SLOTS', 1 ) )
+    except ValueError:
+        processes = 1
+    if processes <= 1:
+        return None
+    try:
+        return multiprocessing.Pool( processes )
+    except Exception:
+        # e.g. no shared memory for the pool's semaphores on this node
+        log.exception( 'Failed to start %d processes to set metadata in, setting it in this one', processes )
+        return None
+
+
+def set_outputs_meta( pool, outputs ):
+    """
+    Set the metadata of the (set_meta, args) outputs and return what each
+    set_meta( *args ) returned.
+
+    With a pool, outputs are set in parallel and the metadata of big datasets
+    that can be is set by computing it for chunks of the dataset in parallel
+    and merging those.
+    """
+    if pool is None:
+        return [ set_meta( *args ) for set_meta, args in outputs ]
+    results = [ pool.apply_async( set_meta, args, dict( chunked=True ) ) for set_meta, args in outputs ]
+    results = [ result.get() for result in results ]
+    for result in results:
+        if isinstance( result, ChunkedOutput ):
+            result.start( pool )
+    return [ result.finish() if isinstance( result, ChunkedOutput ) else result for result in results ]
+
+
+class ChunkedOutput( object ):
+    """
+    An output whose metadata is set from chunks computed in a pool.
+    """
+
+    def __init__( self, set_meta, args, size, chunk_size ):
+        self.set_meta = set_meta
+        self.args = args
+        self.ranges = line_scanner.byte_ranges( size, chunk_size )
+        self.chunks = None
+
+    def start( self, pool ):
+        self.chunks = [ pool.apply_async( self.set_meta, self.args, dict( chunk=chunk ) ) for chunk in self.ranges ]
+
+    def finish( self ):
+        try:
+            chunks = [ chunk.get() for chunk in self.chunks ]
+        except Exception, e:
+            chunks = e
+        return self.set_meta( *self.args, chunks=chunks )
+
+
+def _set_meta( dataset, file_dict, set_meta_kwds, set_meta, args, chunked, chunk, chunks ):
+    """
+    Set the metadata of dataset - or return a ChunkedOutput if that's to be
+    done in chunks or the metadata of chunk if it's set.
+    """
+    if chunk:
+        return dataset.datatype.get_meta_chunk( dataset, *chunk, **set_meta_kwds )
+    if chunked and dataset.extension != "_sniff_" and dataset.datatype.can_set_meta_in_chunks( dataset ):
+        return ChunkedOutput( set_meta, args, dataset.get_size(), dataset.datatype.set_meta_chunk_size )
+    if isinstance( chunks, Exception ):
+        raise chunks
+    set_meta_with_tool_provided( dataset, file_dict, set_meta_kwds, _state[ 'datatypes_registry' ], chunks=chunks )
+    return None
+
+
+def _set_existing_dataset_meta( filenames, chunked=False, chunk=None, chunks=None ):
+    tool_job_working_directory = _state[ 'tool_job_working_directory' ]
+    existing_job_metadata_dict = _state[ 'existing_job_metadata_dict' ]
+    fields = filenames.split( ',' )
+    filename_in = fields.pop( 0 )
+    filename_kwds = fields.pop( 0 )
+    filename_out = fields.pop( 0 )
+    filename_results_code = fields.pop( 0 )
+    dataset_filename_override = fields.pop( 0 )
+    # Need to be careful with the way that these parameters are populated from the filename splitting,
+    # because if a job is running when the server is updated, any existing external metadata command-lines
+    #will not have info about the newly added override_metadata file
+    if fields:
+        override_metadata = fields.pop( 0 )
+    else:
+        override_metadata = None
+    set_meta_kwds = stringify_dictionary_keys( json.load( open( filename_kwds ) ) )  # load kwds; need to ensure our keywords are not unicode
+    try:
+        dataset = cPickle.load( open( filename_in ) )  # load DatasetInstance
+        dataset.dataset.external_filename = dataset_filename_override
+        files_path = os.path.abspath(os.path.join( tool_job_working_directory, "dataset_%s_files" % (dataset.dataset.id) ))
+        dataset.dataset.external_extra_files_path = files_path
+        if dataset.dataset.id in existing_job_metadata_dict:
+            dataset.extension = existing_job_metadata_dict[ dataset.dataset.id ].get( 'ext', dataset.extension )
+        # Metadata FileParameter types may not be writable on a cluster node, and are therefore temporarily substituted with MetadataTempFiles
+        if override_metadata:
+            override_metadata = json.load( open( override_metadata ) )
+            for metadata_name, metadata_file_override in override_metadata:
+                if galaxy.datatypes.metadata.MetadataTempFile.is_JSONified_value( metadata_file_override ):
+                    metadata_file_override = galaxy.datatypes.metadata.MetadataTempFile.from_JSON( metadata_file_override )
+                setattr( dataset.metadata, metadata_name, metadata_file_override )
+        file_dict = existing_job_metadata_dict.get( dataset.dataset.id, {} )
+        result = _set_meta( dataset, file_dict, set_meta_kwds, _set_existing_dataset_meta, ( filenames, ), chunked, chunk, chunks )
+        if chunk or result is not None:
+            return result
+        dataset.metadata.to_JSON_dict( filename_out )  # write out results of set_meta
+        json.dump( ( True, 'Metadata has been set successfully' ), open( filename_results_code, 'wb+' ) )  # setting metadata has succeeded
+    except Exception, e:
+        if chunk:
+            # the dataset fails when the chunks are merged
+            raise
+        json.dump( ( False, str( e ) ), open( filename_results_code, 'wb+' ) )  # setting metadata has failed somehow
+
+
+def _set_new_dataset_meta( i, filename, chunked=False, chunk=None, chunks=None ):
+    tool_job_working_directory = _state[ 'tool_job_working_directory' ]
+    file_dict = _state[ 'new_job_metadata_dict' ][ filename ]
+    new_dataset = galaxy.model.Dataset( id=-i, external_filename=os.path.join( tool_job_working_directory, file_dict[ 'filename' ] ) )
+    extra_files = file_dict.get( 'extra_files', None )
+    if extra_files is not None:
+        new_dataset._extra_files_path = os.path.join( tool_job_working_directory, extra_files )
+    new_dataset.state = new_dataset.states.OK
+    new_dataset_instance = galaxy.model.HistoryDatasetAssociation( id=-i, dataset=new_dataset, extension=file_dict.get( 'ext', 'data' ) )
+    set_meta_kwds = _state.get( 'new_dataset_set_meta_kwds', {} )
+    result = _set_meta( new_dataset_instance, file_dict, set_meta_kwds, _set_new_dataset_meta, ( i, filename ), chunked, chunk, chunks )
+    if chunk or result is not None:
+        return result
+    # storing metadata in external form, need to turn back into dict
+    return json.loads( new_dataset_instance.metadata.to_JSON_dict() )
@@ -24,6 +24,7 @@ parser.add_option( '-c', '--config', dest='config', help='Path to Galaxy config
 parser.add_option( '-u', '--username', dest='username', help='Username of user to update', default='all' )
 parser.add_option( '-e', '--email', dest='email', help='Email address of user to update', default='all' )
 parser.add_option( '--dry-run', dest='dryrun', help='Dry run (show changes but do not save to database)', action='store_true', default=False )
+parser.add_option( '--bulk', dest='bulk', help='Recalculate the usage of all users at once (in a few queries)', action='store_true', default=False )
 ( options, args ) = parser.parse_args()
 
 
@@ -80,11 +81,68 @@ def quotacheck( sa_session, users, engine ):
             sa_session.add( user )
             sa_session.flush()
 
+def bulk_quotacheck( sa_session, model ):
+    """
+    Recalculate the disk usage of every user in one pass: the usages are
+    summed into a temporary table, reported on and copied over to the users.
+    """
+    from sqlalchemy import Column, func, Integer, MetaData, Numeric, or_, select, Table
+
+    datasets = model.User.disk_usage_datasets().alias( 'datasets' )
+    model.User.set_unset_total_sizes( sa_session, datasets )
+
+    # temporary tables only exist for the connection that created them
+    connection = model.engine.connect()
+
+    user_table = model.User.table
+    usage_table = Table( 'tmp_user_disk_usage', MetaData(),
+                         Column( 'user_id', Integer, primary_key=True ),
+                         Column( 'disk_usage', Numeric( 15, 0 ) ),
+                         prefixes=[ 'TEMPORARY' ] )
+    usage_table.create( bind=connection )
+    transaction = connection.begin()
+    try:
+        connection.execute( usage_table.insert().from_select( [ 'user_id', 'disk_usage' ],
+            select( [ datasets.c.user_id, func.sum( datasets.c.total_size ) ] ).group_by( datasets.c.user_id ) ) )
+
+        # users without any datasets counting toward their usage have none
+        new_usage = func.coalesce( select( [ usage_table.c.disk_usage ], usage_table.c.user_id == user_table.c.id ).as_scalar(), 0 )
+        changed = connection.execute( select( [ user_table.c.username, user_table.c.email, user_table.c.disk_usage, new_usage ],
+                                              or_( user_table.c.disk_usage == None, user_table.c.disk_usage != new_usage ) ) ).fetchall()
+        for username, email, current, new in changed:
+            current = current or 0
+            print username, '<' + email + '>:', 'old usage:', nice_size( current ), 'change:',
+            if new > current:
+                print '+%s' % ( nice_size( new - current ) )
+            else:
+                print '-%s' % ( nice_size( current - new ) )
+        print '%i users changed' % len( changed )
+
+        if not options.dryrun:
+            connection.execute( user_table.update()
+                                          .where( or_( user_table.c.disk_usage == None, user_table.c.disk_usage != new_usage ) )
+                                          .values( disk_usage=new_usage ) )
+        transaction.commit()
+    except:
+        transaction.rollback()
+        raise
+    finally:
+        usage_table.drop( bind=connection )
+        connection.close()
+
 if __name__ == '__main__':
     print 'Loading Galaxy model...'
     model, object_store, engine = init()
     sa_session = model.context.current
 
+    if options.bulk:
+        if options.username or options.email:
+            print '--bulk recalculates the usage of all users, do not give a username or email'
+            sys.exit( 1 )
+        bulk_quotacheck( sa_session, model )
+        object_store.shutdown()
+        sys.exit( 0 )
+
     if not options.username and not options.email:
         user_count = sa_session.query( model.User ).count()
         print 'Processing %i users...' % user_count
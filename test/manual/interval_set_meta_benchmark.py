@@ -0,0 +1,145 @@
+"""
+Benchmark setting the metadata and peek of big interval datasets.
+
+Files of the requested size are written to a temporary directory for a few
+interval datatypes and have their metadata and peek set the way a finished job
+does it. For each file the number of times it was opened (i.e. read), the
+bytes read by the process (on Linux) and the time taken are reported.
+
+    python test/manual/interval_set_meta_benchmark.py --size 2048
+"""
+import __builtin__
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(__file__)
+galaxy_root = os.path.abspath(os.path.join(script_dir, os.path.pardir, os.path.pardir))
+new_path = [ os.path.join( galaxy_root, "lib" ) ]
+new_path.extend( sys.path[1:] )
+sys.path = new_path
+
+try:
+    from argparse import ArgumentParser
+except ImportError:
+    ArgumentParser = None
+
+from galaxy import model
+from galaxy.datatypes import registry
+from galaxy.model import mapping
+
+DESCRIPTION = "Script to benchmark setting the metadata of big interval datasets."
+DATASETS = [
+    # (extension, header, line)
+    ("bed", "track name=benchmark\n", "chr%d\t%d\t%d\tfeature_%d\t0\t+\n"),
+    # no recognized chromosome names, so the first data line is never found
+    ("bed", "", "%d\t%d\t%d\tfeature_%d\t0\t+\n"),
+    ("interval", "#chrom\tstart\tend\tstrand\n", "chr%d\t%d\t%d\t+\tfeature_%d\n"),
+    ("gff", "##gff-version 2\n", "chr%d\tsource\texon\t%d\t%d\t.\t+\t.\tgene_id \"gene_%d\";\n"),
+    ("wig", "track type=wiggle_0\n", "chr%d\t%d\t%d\t%d\n"),
+]
+
+
+def main(argv=None):
+    if ArgumentParser is None:
+        raise Exception("Test requires Python 2.7")
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--size", type=int, default=1024, help="size of each dataset in MB")
+    args = arg_parser.parse_args(argv)
+
+    datatypes_registry = registry.Registry()
+    datatypes_registry.load_datatypes(root_dir=galaxy_root, config=os.path.join(galaxy_root, "config", "datatypes_conf.xml.sample"))
+    model.set_datatypes_registry(datatypes_registry)
+    mapping.init("/tmp", "sqlite:///:memory:", create_tables=True)
+
+    directory = tempfile.mkdtemp()
+    try:
+        print "datasets: %d MB" % args.size
+        for i, (extension, header, line) in enumerate(DATASETS):
+            path = os.path.join(directory, "dataset_%d.%s" % (i, extension))
+            _write_dataset(path, header, line, args.size * 1024 * 1024)
+            _set_meta(path, extension)
+            os.remove(path)
+    finally:
+        shutil.rmtree(directory)
+
+
+def _write_dataset(path, header, line, size):
+    with open(path, "w") as f:
+        f.write(header)
+        written = 0
+        lines = "".join(line % (i % 22, i * 10, i * 10 + 5, i) for i in range(10000))
+        while written < size:
+            f.write(lines)
+            written += len(lines)
+
+
+def _set_meta(path, extension):
+    dataset = model.Dataset()
+    dataset.external_filename = path
+    hda = model.HistoryDatasetAssociation(extension=extension, dataset=dataset)
+    opened = _count_opens(path)
+    bytes_read = _bytes_read()
+    start = time.time()
+    try:
+        hda.datatype.set_meta(hda)
+        hda.datatype.set_peek(hda)
+    finally:
+        elapsed = time.time() - start
+        _restore_opens()
+    bytes_read = _bytes_read() - bytes_read if bytes_read is not None else None
+    print "%s: opened %d times, read %s MB in %.2fs, blurb %r" % (
+        os.path.basename(path), opened[0],
+        "%.1f" % (bytes_read / 1024.0 / 1024.0) if bytes_read is not None else "?",
+        elapsed, hda.blurb)
+
+
+_builtin_open = __builtin__.open
+_builtin_file = __builtin__.file
+
+
+def _count_opens(path):
+    """
+    Count the number of times `path` is opened with `open` or `file`.
+    """
+    opened = [0]
+
+    def count(name):
+        if os.path.abspath(name) == path:
+            opened[0] += 1
+
+    def counting_open(name, *args, **kwds):
+        count(name)
+        return _builtin_open(name, *args, **kwds)
+
+    class CountingFile(_builtin_file):
+
+        def __init__(self, name, *args, **kwds):
+            count(name)
+            _builtin_file.__init__(self, name, *args, **kwds)
+
+    __builtin__.open = counting_open
+    __builtin__.file = CountingFile
+    return opened
+
+
+def _restore_opens():
+    __builtin__.open = _builtin_open
+    __builtin__.file = _builtin_file
+
+
+def _bytes_read():
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except IOError:
+        pass
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Benchmark the job handler's readiness checking with and without event driven
+readiness (see ``event_driven_job_readiness`` in galaxy.ini).
+
+Chains of dependent jobs are queued in a scratch sqlite database along with a
+backlog of jobs whose inputs never become ready. A JobHandlerQueue then
+schedules the chains using a fake dispatcher that "runs" every job instantly,
+and the scheduling latency (time from a job's inputs becoming ready until it is
+dispatched) and the number of database queries issued by the handler's monitor
+thread per second are reported for each mode.
+
+    python test/manual/job_scheduling_benchmark.py --chains 50 --depth 5 --backlog 5000
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from Queue import Queue
+
+script_dir = os.path.dirname(__file__)
+galaxy_root = os.path.join(script_dir, os.path.pardir, os.path.pardir)
+new_path = [ os.path.join( galaxy_root, "lib" ) ]
+new_path.extend( sys.path[1:] )
+sys.path = new_path
+
+try:
+    from argparse import ArgumentParser
+except ImportError:
+    ArgumentParser = None
+
+from galaxy import eggs
+eggs.require( "SQLAlchemy" )
+from sqlalchemy import event
+
+from galaxy import model
+from galaxy.model import mapping
+from galaxy.jobs import JobDestination
+from galaxy.jobs.handler import JobHandlerQueue
+from galaxy.util.bunch import Bunch
+
+DESCRIPTION = "Script to benchmark job handler scheduling latency and query load."
+SERVER_NAME = "handler0"
+MONITOR_THREAD_NAME = "JobHandlerQueue.monitor_thread"
+
+
+def main(argv=None):
+    if ArgumentParser is None:
+        raise Exception("Test requires Python 2.7")
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--chains", type=int, default=50, help="number of independent job chains")
+    arg_parser.add_argument("--depth", type=int, default=5, help="number of jobs in each chain")
+    arg_parser.add_argument("--backlog", type=int, default=2000, help="number of queued jobs whose inputs never become ready")
+    arg_parser.add_argument("--idle", type=float, default=5.0, help="seconds to keep measuring after all jobs were dispatched")
+    arg_parser.add_argument("--max_jobs_per_iteration", type=int, default=0, help="cap on the jobs checked per handler iteration")
+    args = arg_parser.parse_args(argv)
+
+    for event_driven in (False, True):
+        result = _benchmark(args, event_driven)
+        print "%s:" % ("event driven" if event_driven else "polling")
+        print "  scheduling: %d jobs dispatched in %.2fs, latency mean %.3fs / max %.3fs" % (
+            result.dispatched, result.elapsed, result.mean_latency, result.max_latency)
+        print "  scheduling: %d monitor queries (%.1f/s), %.3fs in database" % (
+            result.queries, result.queries / result.elapsed, result.query_time)
+        print "  idle:       %d monitor queries (%.1f/s), %.3fs in database" % (
+            result.idle_queries, result.idle_queries / args.idle, result.idle_query_time)
+
+
+def _benchmark(args, event_driven):
+    directory = tempfile.mkdtemp()
+    try:
+        app = _app(directory, event_driven, args.max_jobs_per_iteration)
+        jobs_by_level = _queue_jobs(app, args)
+        queries = _count_monitor_queries(app)
+        dispatcher = FakeDispatcher(app, event_driven)
+        queue = BenchmarkJobHandlerQueue(app, dispatcher)
+        dispatcher.queue = queue
+        total = args.chains * args.depth
+        for job_id in jobs_by_level[0]:
+            dispatcher.ready_times[job_id] = time.time()
+        start = time.time()
+        queue.start()
+        while len(dispatcher.dispatch_times) < total and time.time() - start < 600:
+            time.sleep(0.01)
+        elapsed = time.time() - start
+        scheduling_queries = Bunch(count=queries.count, time=queries.time)
+        time.sleep(args.idle)
+        queue.running = False
+        queue.sleeper.wake()
+        dispatcher.shutdown()
+        latencies = [dispatch_time - dispatcher.ready_times[job_id] for job_id, dispatch_time in dispatcher.dispatch_times.items() if job_id in dispatcher.ready_times]
+        return Bunch(
+            dispatched=len(latencies),
+            elapsed=elapsed,
+            mean_latency=sum(latencies) / max(len(latencies), 1),
+            max_latency=max(latencies or [0]),
+            queries=scheduling_queries.count,
+            query_time=scheduling_queries.time,
+            idle_queries=queries.count - scheduling_queries.count,
+            idle_query_time=queries.time - scheduling_queries.time,
+        )
+    finally:
+        shutil.rmtree(directory)
+
+
+def _app(directory, event_driven, max_jobs_per_iteration):
+    database = "sqlite:///%s?isolation_level=IMMEDIATE" % os.path.join(directory, "benchmark.sqlite")
+    config = Bunch(
+        server_name=SERVER_NAME,
+        track_jobs_in_database=True,
+        event_driven_job_readiness=event_driven,
+        job_readiness_reconcile_interval=60,
+        job_handler_max_jobs_per_iteration=max_jobs_per_iteration,
+        user_activation_on=False,
+        enable_quotas=False,
+        cache_user_job_count=True,
+        track_running_job_counts=False,
+    )
+    limits = Bunch(
+        registered_user_concurrent_jobs=None,
+        anonymous_user_concurrent_jobs=None,
+        destination_user_concurrent_jobs={},
+        destination_total_concurrent_jobs={},
+    )
+    return Bunch(
+        config=config,
+        model=mapping.init(directory, database, create_tables=True),
+        job_config=Bunch(limits=limits),
+        job_manager=Bunch(job_lock=False),
+    )
+
+
+def _queue_jobs(app, args):
+    sa_session = app.model.context
+    user = model.User(email="benchmark@example.org", password="benchmark")
+    history = model.History(user=user)
+    sa_session.add_all((user, history))
+    sa_session.flush()
+
+    def new_job(input_hda, output_hda=None):
+        job = model.Job()
+        job.user = user
+        job.history = history
+        job.tool_id = "cat1"
+        job.handler = SERVER_NAME
+        job.state = model.Job.states.NEW
+        job.add_input_dataset("input1", input_hda)
+        if output_hda is not None:
+            job.add_output_dataset("out_file1", output_hda)
+        sa_session.add(job)
+        return job
+
+    def new_hda(state):
+        hda = model.HistoryDatasetAssociation(history=history, extension="txt", create_dataset=True, sa_session=sa_session)
+        hda.dataset.state = state
+        sa_session.add(hda)
+        return hda
+
+    # The backlog waits on a dataset that never finishes
+    never_ready = new_hda(model.Dataset.states.QUEUED)
+    for i in range(args.backlog):
+        new_job(never_ready)
+    sa_session.flush()
+
+    jobs_by_level = [[] for i in range(args.depth)]
+    for i in range(args.chains):
+        hda = new_hda(model.Dataset.states.OK)
+        for level in range(args.depth):
+            output_hda = new_hda(model.Dataset.states.NEW)
+            jobs_by_level[level].append(new_job(hda, output_hda))
+            hda = output_hda
+    sa_session.flush()
+    jobs_by_level = [[job.id for job in jobs] for jobs in jobs_by_level]
+    sa_session.expunge_all()
+    return jobs_by_level
+
+
+def _count_monitor_queries(app):
+    """
+    Count the queries issued by the handler's monitor thread and the time
+    spent executing them.
+    """
+    queries = Bunch(count=0, time=0.0, start=None)
+
+    def before_cursor_execute(*args):
+        if threading.current_thread().name == MONITOR_THREAD_NAME:
+            queries.count += 1
+            queries.start = time.time()
+
+    def after_cursor_execute(*args):
+        if threading.current_thread().name == MONITOR_THREAD_NAME:
+            queries.time += time.time() - queries.start
+
+    event.listen(app.model.engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(app.model.engine, "after_cursor_execute", after_cursor_execute)
+    return queries
+
+
+class BenchmarkJobHandlerQueue(JobHandlerQueue):
+
+    def job_wrapper(self, job, use_persisted_destination=False):
+        return Bunch(job_id=job.id, tool=True, job_destination=JobDestination(id="local", runner="local"))
+
+
+class FakeDispatcher(object):
+    """
+    Runs dispatched jobs instantly on a separate thread, marking their outputs
+    as OK and notifying the handler the way JobWrapper.finish does.
+    """
+
+    def __init__(self, app, event_driven):
+        self.app = app
+        self.event_driven = event_driven
+        self.queue = None
+        self.ready_times = {}
+        self.dispatch_times = {}
+        self.work_queue = Queue()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, job_wrapper):
+        self.dispatch_times[job_wrapper.job_id] = time.time()
+        self.work_queue.put(job_wrapper.job_id)
+
+    def run(self):
+        sa_session = self.app.model.context
+        while True:
+            job_id = self.work_queue.get()
+            if job_id is None:
+                return
+            sa_session.expunge_all()
+            job = sa_session.query(model.Job).get(job_id)
+            job.set_state(model.Job.states.OK)
+            dataset_ids = []
+            dependent_job_ids = []
+            for dataset_assoc in job.output_datasets:
+                dataset_assoc.dataset.dataset.state = model.Dataset.states.OK
+                dataset_ids.append(dataset_assoc.dataset.dataset.id)
+                dependent_job_ids.extend(dependent_job_assoc.job_id for dependent_job_assoc in dataset_assoc.dataset.dependent_jobs)
+            sa_session.flush()
+            ready_time = time.time()
+            for dependent_job_id in dependent_job_ids:
+                self.ready_times[dependent_job_id] = ready_time
+            if self.event_driven:
+                self.queue.notify_datasets_ready(dataset_ids)
+
+    def shutdown(self):
+        self.work_queue.put(None)
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    main()
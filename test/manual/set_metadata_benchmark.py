@@ -0,0 +1,103 @@
+"""
+Benchmark setting the metadata of a job's outputs externally.
+
+A job working directory with the requested number of FASTA outputs of the
+requested size is written to a temporary directory and their metadata is set
+by galaxy_ext.metadata.set_metadata the way it is at the end of a job's script,
+using as many processes as given by --slots (i.e. $GALAXY_SLOTS). The time
+taken is reported. Compare e.g.
+
+    python test/manual/set_metadata_benchmark.py --outputs 8 --size 512 --slots 1
+    python test/manual/set_metadata_benchmark.py --outputs 8 --size 512 --slots 8
+"""
+import cPickle
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(__file__)
+galaxy_root = os.path.abspath(os.path.join(script_dir, os.path.pardir, os.path.pardir))
+new_path = [ os.path.join( galaxy_root, "lib" ) ]
+new_path.extend( sys.path[1:] )
+sys.path = new_path
+
+try:
+    from argparse import ArgumentParser
+except ImportError:
+    ArgumentParser = None
+
+from galaxy import model
+from galaxy.datatypes import registry
+from galaxy.model import mapping
+
+DESCRIPTION = "Script to benchmark setting the metadata of a job's outputs."
+RECORD = ">sequence_%d\n" + "ACGT" * 20 + "\n" + "ACGT" * 20 + "\n"
+
+
+def main(argv=None):
+    if ArgumentParser is None:
+        raise Exception("Test requires Python 2.7")
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--outputs", type=int, default=8, help="number of outputs")
+    arg_parser.add_argument("--size", type=int, default=256, help="size of each output in MB")
+    arg_parser.add_argument("--slots", type=int, default=1, help="number of slots allocated to the job")
+    arg_parser.add_argument("--chunk_size", type=int, default=None, help="size of the chunks metadata is set in in MB")
+    args = arg_parser.parse_args(argv)
+
+    datatypes_config = os.path.join(galaxy_root, "config", "datatypes_conf.xml.sample")
+    datatypes_registry = registry.Registry()
+    datatypes_registry.load_datatypes(root_dir=galaxy_root, config=datatypes_config)
+    model.set_datatypes_registry(datatypes_registry)
+    mapping.init("/tmp", "sqlite:///:memory:", create_tables=True)
+    if args.chunk_size:
+        from galaxy.datatypes import data
+        data.Data.set_meta_chunk_size = args.chunk_size * 1024 * 1024
+
+    directory = tempfile.mkdtemp()
+    try:
+        outputs = []
+        for i in range(1, args.outputs + 1):
+            path = os.path.join(directory, "dataset_%d.dat" % i)
+            _write_fasta(path, args.size * 1024 * 1024)
+            outputs.append(_write_metadata_files(directory, i, path))
+        os.environ["GALAXY_SLOTS"] = str(args.slots)
+        sys.argv = ["set_metadata.py", datatypes_config, "None"] + outputs
+        os.chdir(directory)
+        from galaxy_ext.metadata.set_metadata import set_metadata
+        start = time.time()
+        set_metadata()
+        elapsed = time.time() - start
+        for i in range(1, args.outputs + 1):
+            success, message = json.load(open(os.path.join(directory, "metadata_results_%d" % i)))
+            if not success:
+                print "output %d failed: %s" % (i, message)
+        print "%d outputs of %d MB with %d slots: %.2fs" % (args.outputs, args.size, args.slots, elapsed)
+    finally:
+        shutil.rmtree(directory)
+
+
+def _write_fasta(path, size):
+    with open(path, "w") as f:
+        records = "".join(RECORD % i for i in range(10000))
+        written = 0
+        while written < size:
+            f.write(records)
+            written += len(records)
+
+
+def _write_metadata_files(directory, i, path):
+    dataset = model.Dataset(id=i, external_filename=path)
+    hda = model.HistoryDatasetAssociation(id=i, extension="fasta", dataset=dataset)
+    names = [ os.path.join(directory, "metadata_%s_%d" % (kind, i)) for kind in ("in", "kwds", "out", "results", "override") ]
+    filename_in, filename_kwds, filename_out, filename_results_code, filename_override = names
+    cPickle.dump(hda, open(filename_in, "wb"))
+    json.dump({}, open(filename_kwds, "w"))
+    json.dump([], open(filename_override, "w"))
+    return ",".join([filename_in, filename_kwds, filename_out, filename_results_code, path, filename_override])
+
+
+if __name__ == "__main__":
+    main()
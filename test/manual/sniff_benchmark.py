@@ -0,0 +1,121 @@
+"""
+Benchmark datatype detection (galaxy.datatypes.sniff.guess_ext).
+
+Every file in the given directories (by default test-data and the datatypes
+test directory) is sniffed twice: calling the sniff method of every datatype
+in the sniff order until one matches, the way guess_ext used to, and with
+guess_ext, which skips datatypes whose declared prefixes the file doesn't
+start with and shares the start of the file between the sniffers. The number
+of sniff calls and the time taken are reported for both, along with any file
+for which they disagree.
+
+    python test/manual/sniff_benchmark.py --repeat 3 test-data
+"""
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(__file__)
+galaxy_root = os.path.join(script_dir, os.path.pardir, os.path.pardir)
+new_path = [ os.path.join( galaxy_root, "lib" ) ]
+new_path.extend( sys.path[1:] )
+sys.path = new_path
+
+try:
+    from argparse import ArgumentParser
+except ImportError:
+    ArgumentParser = None
+
+from galaxy import eggs
+eggs.require( "bx-python" )
+
+import galaxy.model  # noqa, import the datatypes in the right order
+from galaxy.datatypes import registry, sniff
+
+DESCRIPTION = "Script to benchmark datatype sniffing."
+DEFAULT_DIRECTORIES = [
+    os.path.join(galaxy_root, "test-data"),
+    os.path.join(galaxy_root, "lib", "galaxy", "datatypes", "test"),
+]
+
+
+def main(argv=None):
+    if ArgumentParser is None:
+        raise Exception("Test requires Python 2.7")
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("directories", nargs="*", help="directories containing the files to sniff")
+    arg_parser.add_argument("--repeat", type=int, default=1, help="number of times to sniff every file")
+    args = arg_parser.parse_args(argv)
+
+    datatypes_registry = registry.Registry()
+    datatypes_registry.load_datatypes(root_dir=galaxy_root, config=os.path.join(galaxy_root, "config", "datatypes_conf.xml.sample"))
+    sniff_order = datatypes_registry.sniff_order
+    calls = _count_sniff_calls(sniff_order)
+
+    paths = _files(args.directories or DEFAULT_DIRECTORIES)
+    print "%d files, %d sniffers" % (len(paths), len(sniff_order))
+
+    naive_results = {}
+    calls["count"] = 0
+    start = time.time()
+    for i in range(args.repeat):
+        for path in paths:
+            naive_results[path] = _naive_guess_ext(path, sniff_order)
+    _report("every sniffer", calls["count"], time.time() - start, args.repeat)
+
+    results = {}
+    calls["count"] = 0
+    start = time.time()
+    for i in range(args.repeat):
+        for path in paths:
+            results[path] = sniff.guess_ext(path, sniff_order=sniff_order)
+    _report("guess_ext", calls["count"], time.time() - start, args.repeat)
+
+    for path in paths:
+        naive_result = naive_results[path]
+        if naive_result is not None and naive_result != results[path]:
+            print "  mismatch for %s: %s versus %s" % (path, naive_result, results[path])
+
+
+def _files(directories):
+    paths = []
+    for directory in directories:
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                paths.append(path)
+    return paths
+
+
+def _count_sniff_calls(sniff_order):
+    calls = {"count": 0}
+
+    def counting(sniff_method):
+        def wrapped(filename):
+            calls["count"] += 1
+            return sniff_method(filename)
+        return wrapped
+
+    for datatype in sniff_order:
+        if hasattr(datatype, "sniff"):
+            datatype.sniff = counting(datatype.sniff)
+    return calls
+
+
+def _naive_guess_ext(path, sniff_order):
+    # Return None when no sniffer matches, both then use the same fallback
+    for datatype in sniff_order:
+        try:
+            if datatype.sniff(path):
+                return datatype.file_ext
+        except:
+            pass
+    return None
+
+
+def _report(name, calls, elapsed, repeat):
+    print "%s: %d sniff calls in %.2fs (%.2fs per pass)" % (name, calls, elapsed, elapsed / repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark checking a tool's stdio rules against a huge stderr.
+
+A stderr file of the requested size is written to a temporary directory and
+checked against a few regular expressions (only the last of which matches,
+near the end of the file) the way the job runners do it: streaming the
+complete file, and reading the complete file into memory. The time taken and
+the peak memory usage of the process after each check are reported.
+
+    python test/manual/stdio_checker_benchmark.py --size 1024
+"""
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(__file__)
+galaxy_root = os.path.join(script_dir, os.path.pardir, os.path.pardir)
+new_path = [ os.path.join( galaxy_root, "lib" ) ]
+new_path.extend( sys.path[1:] )
+sys.path = new_path
+
+try:
+    from argparse import ArgumentParser
+except ImportError:
+    ArgumentParser = None
+
+from galaxy.jobs.error_level import StdioErrorLevel
+from galaxy.jobs.output_checker import check_output
+from galaxy.util import DATABASE_MAX_STRING_SIZE, shrink_stream_by_size
+from galaxy.util.bunch import Bunch
+
+DESCRIPTION = "Script to benchmark checking tool stdio rules against a huge stderr."
+LINE = "INFO processed record %d of the input, nothing to see here\n"
+
+
+def main(argv=None):
+    if ArgumentParser is None:
+        raise Exception("Test requires Python 2.7")
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--size", type=int, default=1024, help="size of stderr in MB")
+    arg_parser.add_argument("--skip_in_memory", action="store_true", default=False, help="skip reading stderr into memory")
+    args = arg_parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    try:
+        stderr_path = os.path.join(directory, "stderr")
+        _write_stderr(stderr_path, args.size * 1024 * 1024)
+        tool = Bunch(
+            stdio_exit_codes=[],
+            stdio_regexes=[
+                _regex(r"segmentation fault", StdioErrorLevel.FATAL),
+                _regex(r"^warning: .* deprecated$", StdioErrorLevel.WARNING),
+                _regex(r"exception in thread", StdioErrorLevel.FATAL),
+                _regex(r"out of memory", StdioErrorLevel.FATAL),
+            ],
+        )
+        print "stderr: %d MB" % args.size
+        # Streaming first, so the peak memory reported for it is its own
+        _check(tool, stderr_path, stream=True)
+        if not args.skip_in_memory:
+            _check(tool, stderr_path, stream=False)
+    finally:
+        shutil.rmtree(directory)
+
+
+def _regex(match, error_level):
+    return Bunch(match=match, stdout_match=False, stderr_match=True, error_level=error_level, desc=None)
+
+
+def _write_stderr(path, size):
+    with open(path, "w") as f:
+        written = 0
+        lines = "".join(LINE % i for i in range(10000))
+        while written < size:
+            f.write(lines)
+            written += len(lines)
+        f.write("java.lang.OutOfMemoryError: Out of memory\n")
+        f.write(lines)
+
+
+def _check(tool, stderr_path, stream):
+    job = Bunch(stdout=None, stderr=None, get_id_tag=lambda: "benchmark")
+    start = time.time()
+    if stream:
+        stderr = shrink_stream_by_size(open(stderr_path), DATABASE_MAX_STRING_SIZE, join_by="\n..\n", left_larger=True, beginning_on_size_error=True)
+        success = check_output(tool, "", stderr, 0, job, stderr_path=stderr_path)
+    else:
+        stderr = open(stderr_path).read()
+        success = check_output(tool, "", stderr, 0, job)
+    elapsed = time.time() - start
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print "%s: success=%s in %.2fs, peak memory %.1f MB, %d bytes of stderr kept" % (
+        "streaming" if stream else "in memory", success, elapsed, max_rss, len(job.stderr))
+
+
+if __name__ == "__main__":
+    main()
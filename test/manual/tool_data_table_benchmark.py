@@ -0,0 +1,110 @@
+"""
+Benchmark tool data table lookups (TabularToolDataTable.get_entries).
+
+A synthetic all_fasta style .loc file with --rows rows is written to a
+temporary directory and loaded as a tool data table, then --lookups random
+dbkeys are looked up: scanning every row, the way get_entries used to, with
+get_entries, which builds an index of the column on the first lookup, and
+with a single get_entries_for_values call. The time taken is reported for
+each, along with any dbkey for which they disagree.
+
+    python test/manual/tool_data_table_benchmark.py --rows 100000 --lookups 1000
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(__file__)
+galaxy_root = os.path.join(script_dir, os.path.pardir, os.path.pardir)
+new_path = [ os.path.join( galaxy_root, "lib" ) ]
+new_path.extend( sys.path[1:] )
+sys.path = new_path
+
+try:
+    from argparse import ArgumentParser
+except ImportError:
+    ArgumentParser = None
+
+from galaxy.util import parse_xml_string
+from galaxy.tools.data import TabularToolDataTable
+
+DESCRIPTION = "Script to benchmark tool data table lookups."
+TABLE_XML = """<table name="all_fasta" comment_char="#">
+    <columns>value, dbkey, name, path</columns>
+    <file path="%s" />
+</table>"""
+
+
+def main(argv=None):
+    if ArgumentParser is None:
+        raise Exception("Test requires Python 2.7")
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--rows", type=int, default=100000, help="number of rows in the .loc file")
+    arg_parser.add_argument("--lookups", type=int, default=1000, help="number of dbkeys to look up")
+    arg_parser.add_argument("--seed", type=int, default=1, help="random seed for the looked up dbkeys")
+    args = arg_parser.parse_args(argv)
+
+    temp_directory = tempfile.mkdtemp()
+    try:
+        loc_path = os.path.join(temp_directory, "all_fasta.loc")
+        _write_loc(loc_path, args.rows)
+        start = time.time()
+        table = TabularToolDataTable(parse_xml_string(TABLE_XML % loc_path), temp_directory)
+        print "loaded %d rows in %.2fs" % (len(table.get_fields()), time.time() - start)
+
+        # Every dbkey has two builds, look up some that don't exist too.
+        random.seed(args.seed)
+        dbkeys = ["dbkey%d" % random.randint(0, args.rows // 2 + args.rows // 10) for i in range(args.lookups)]
+
+        start = time.time()
+        scanned = dict((dbkey, _scan_entries(table, 'dbkey', dbkey, 'path')) for dbkey in dbkeys)
+        _report("scanning rows", time.time() - start, args.lookups)
+
+        start = time.time()
+        table.get_entries('dbkey', dbkeys[0], 'path')
+        print "building the dbkey index: %.3fs" % (time.time() - start)
+
+        start = time.time()
+        indexed = dict((dbkey, table.get_entries('dbkey', dbkey, 'path')) for dbkey in dbkeys)
+        _report("get_entries", time.time() - start, args.lookups)
+
+        start = time.time()
+        bulk = table.get_entries_for_values('dbkey', dbkeys, 'path')
+        _report("get_entries_for_values", time.time() - start, args.lookups)
+
+        for dbkey in dbkeys:
+            if not (scanned[dbkey] == indexed[dbkey] == bulk[dbkey]):
+                print "  mismatch for %s: %s versus %s versus %s" % (dbkey, scanned[dbkey], indexed[dbkey], bulk[dbkey])
+    finally:
+        shutil.rmtree(temp_directory)
+
+
+def _write_loc(path, rows):
+    with open(path, "w") as f:
+        f.write("#value\tdbkey\tname\tpath\n")
+        for i in range(rows):
+            dbkey = "dbkey%d" % (i // 2)
+            value = "%s_%d" % (dbkey, i % 2)
+            f.write("%s\t%s\tGenome %s\t/data/%s.fa\n" % (value, dbkey, value, value))
+
+
+def _scan_entries(table, query_attr, query_val, return_attr):
+    # get_entries before the column indexes.
+    query_col = table.columns[query_attr]
+    return_col = table.columns[return_attr]
+    rval = []
+    for fields in table.get_fields():
+        if fields[query_col] == query_val:
+            rval.append(fields[return_col])
+    return rval or None
+
+
+def _report(name, elapsed, lookups):
+    print "%s: %.3fs (%.1f microseconds per lookup)" % (name, elapsed, elapsed / lookups * 1000000)
+
+
+if __name__ == "__main__":
+    main()
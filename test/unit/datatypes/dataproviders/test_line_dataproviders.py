@@ -5,6 +5,8 @@ Unit tests for base DataProviders.
 
 import imp
 import os
+import shutil
+import tempfile
 import unittest
 
 import logging
@@ -300,5 +302,119 @@ class Test_BlockDataProvider( test_base_dataproviders.Test_FilteredDataProvider
         self.assertEqual( data, [{ 'id': 'One', 'seq': 'ABCD' }, { 'id': 'Two', 'seq': 'ABCDEFGH' }] )
         self.assertCounters( provider, 2, 2, 2 )
 
+
+class IndexedFileSource( object ):
+    """
+    A file source that provides a line offset index stored next to the file
+    (as DatasetDataProvider does for datasets).
+    """
+    def __init__( self, filename, interval ):
+        self.file = open( filename )
+        self.interval = interval
+        self.indexes = []
+
+    def __iter__( self ):
+        return iter( self.file )
+
+    def seek( self, *args ):
+        return self.file.seek( *args )
+
+    def close( self ):
+        self.file.close()
+
+    def line_offset_index( self, key, line_filter=None ):
+        index_file_name = '%s.%s.line_index' % ( self.file.name, key )
+        line_index = line.LineOffsetIndex( self.file.name, index_file_name, line_filter=line_filter, interval=self.interval )
+        self.indexes.append( line_index )
+        return line_index
+
+
+class Test_LineOffsetIndex( unittest.TestCase ):
+
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join( self.tmpdir, 'dataset_1.dat' )
+        self.lines = []
+        for i in xrange( 25 ):
+            if i % 4 == 0:
+                self.lines.append( '# comment %d\n' % i )
+            self.lines.append( 'line %d\n' % i )
+        with open( self.filename, 'w' ) as f:
+            f.write( ''.join( self.lines ) )
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def index_file_name( self, key='all' ):
+        return '%s.%s.line_index' % ( self.filename, key )
+
+    def offset_of( self, line_number ):
+        return len( ''.join( self.lines[ :line_number ] ) )
+
+    def test_find( self ):
+        """should find the closest indexed line and write the index next to the file
+        """
+        line_index = line.LineOffsetIndex( self.filename, self.index_file_name(), interval=10 )
+        self.assertEqual( line_index.find( 5 ), ( 0, 0 ) )
+        self.assertFalse( os.path.exists( self.index_file_name() ) )
+        self.assertEqual( line_index.find( 15 ), ( 10, self.offset_of( 10 ) ) )
+        self.assertTrue( os.path.exists( self.index_file_name() ) )
+        self.assertEqual( line_index.find( 20 ), ( 20, self.offset_of( 20 ) ) )
+        # past the end of the file: the last indexed line
+        self.assertEqual( line_index.find( 1000 ), ( 30, self.offset_of( 30 ) ) )
+
+    def test_line_filter( self ):
+        """should only count the lines that pass the line filter
+        """
+        line_filter = lambda l: not l.startswith( '#' )
+        line_index = line.LineOffsetIndex( self.filename, self.index_file_name( 'data' ), line_filter=line_filter, interval=10 )
+        self.assertEqual( line_index.find( 12 ), ( 10, self.offset_of( self.lines.index( 'line 10\n' ) ) ) )
+
+    def test_reuses_and_rebuilds_index( self ):
+        """should read an up to date index from its file and rebuild a stale one
+        """
+        line.LineOffsetIndex( self.filename, self.index_file_name(), interval=10 ).find( 15 )
+
+        def fail_to_build():
+            raise AssertionError( 'index rebuilt' )
+        line_index = line.LineOffsetIndex( self.filename, self.index_file_name(), interval=10 )
+        line_index.build = fail_to_build
+        self.assertEqual( line_index.find( 15 ), ( 10, self.offset_of( 10 ) ) )
+
+        with open( self.filename, 'w' ) as f:
+            f.write( 'new first line\n' + ''.join( self.lines ) )
+        line_index = line.LineOffsetIndex( self.filename, self.index_file_name(), interval=10 )
+        self.assertEqual( line_index.find( 15 ), ( 10, self.offset_of( 9 ) + len( 'new first line\n' ) ) )
+
+    def test_unwritable_index( self ):
+        """should still seek when the index can't be written
+        """
+        index_file_name = os.path.join( self.tmpdir, 'missing', 'dataset_1.dat.all.line_index' )
+        line_index = line.LineOffsetIndex( self.filename, index_file_name, interval=10 )
+        self.assertEqual( line_index.find( 15 ), ( 10, self.offset_of( 10 ) ) )
+        self.assertFalse( os.path.exists( index_file_name ) )
+
+    def test_provider_seeks_to_offset( self ):
+        """should provide the same lines as reading from the start and read fewer lines
+        """
+        for provider_class, kwargs in ( ( line.FilteredLineDataProvider, {} ),
+                                        ( line.FilteredLineDataProvider, { 'comment_char': None } ),
+                                        ( line.RegexLineDataProvider, {} ) ):
+            for offset in ( 0, 3, 9, 10, 11, 21, 24, 25, 40 ):
+                unindexed = provider_class( open( self.filename ), offset=offset, limit=3, **kwargs )
+                source = IndexedFileSource( self.filename, interval=4 )
+                indexed = provider_class( source, offset=offset, limit=3, **kwargs )
+                self.assertEqual( list( indexed ), list( unindexed ) )
+                if offset >= 8:
+                    self.assertTrue( indexed.num_data_read < unindexed.num_data_read )
+
+    def test_provider_filters_disable_seeking( self ):
+        """should not use an index when lines are filtered by more than the line settings
+        """
+        source = IndexedFileSource( self.filename, interval=4 )
+        provider = line.RegexLineDataProvider( source, offset=10, limit=2, regex_list=[ 'line 1' ] )
+        self.assertEqual( list( provider ), [ 'line 19' ] )
+        self.assertEqual( source.indexes, [] )
+
 if __name__ == '__main__':
     unittest.main()
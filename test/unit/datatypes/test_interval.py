@@ -0,0 +1,80 @@
+import __builtin__
+import os
+import shutil
+import tempfile
+import unittest
+
+# galaxy.model has to be imported before galaxy.datatypes
+from galaxy import model  # noqa
+from galaxy.datatypes import interval
+from galaxy.datatypes.util import line_scanner
+
+from .test_tabular import MockDataset
+
+BED = "track name=test\n#comment\n\nchr1\t10\t20\tgene1\t0\t+\nchr1\t30\t40\tgene2\t0\t-\n"
+GFF = "##gff-version 3\nchr1\tsrc\texon\t10\t20\t.\t+\t.\tID=e1;score=5\nchr1\tsrc\texon\t30\t40\t.\t+\t.\tID=e2;score=1.5\n"
+
+
+class IntervalSetMetaTestCase( unittest.TestCase ):
+
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def test_bed( self ):
+        for block_size in ( 1, 16, 2 ** 20 ):
+            metadata = self._set_meta( interval.Bed(), BED, set_meta_block_size=block_size )
+            assert metadata.nameCol == 4
+            assert metadata.strandCol == 6
+            assert metadata.comment_lines == 3
+            assert metadata.data_lines == 2
+            assert metadata.column_types == [ "str", "int", "int", "str", "int", "str" ]
+
+    def test_bed_without_data_lines( self ):
+        # without a recognized first data line the data starts at the last line
+        metadata = self._set_meta( interval.Bed(), "#comment\n1\t10\t20\n2\t30\t40\n" )
+        assert metadata.comment_lines == 2
+        assert metadata.data_lines == 1
+        assert metadata.column_types == [ "int", "int", "int" ]
+        metadata = self._set_meta( interval.Bed(), "1\t10\t20\n#comment\n" )
+        assert metadata.comment_lines == 2
+        assert metadata.data_lines == 0
+
+    def test_interval( self ):
+        metadata = self._set_meta( interval.Interval(), "#name\tchrom\tstart\tend\n" + "n1\tchr1\t10\t20\n" )
+        assert ( metadata.chromCol, metadata.startCol, metadata.endCol ) == ( 2, 3, 4 )
+        assert metadata.data_lines == 1
+        assert metadata.columns == 4
+
+    def test_gff( self ):
+        metadata = self._set_meta( interval.Gff(), GFF, set_meta_block_size=16 )
+        assert metadata.attribute_types == { "ID": "str", "score": "float" }
+        assert metadata.attributes == 2
+        assert metadata.comment_lines == 1
+        assert metadata.data_lines == 2
+
+    def test_read_once( self ):
+        opened = []
+        builtin_open = __builtin__.open
+
+        def counting_open( name, *args, **kwds ):
+            opened.append( name )
+            return builtin_open( name, *args, **kwds )
+        line_scanner.open = counting_open
+        try:
+            self._set_meta( interval.Gff(), GFF )
+        finally:
+            del line_scanner.open
+        assert len( opened ) == 1
+
+    def _set_meta( self, datatype, contents, set_meta_block_size=None, **kwds ):
+        path = os.path.join( self.tmpdir, "dataset" )
+        with open( path, "w" ) as f:
+            f.write( contents )
+        if set_meta_block_size:
+            datatype.set_meta_block_size = set_meta_block_size
+        dataset = MockDataset( path )
+        datatype.set_meta( dataset, **kwds )
+        return dataset.metadata
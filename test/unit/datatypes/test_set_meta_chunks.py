@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+# galaxy.model has to be imported before galaxy.datatypes
+from galaxy import model  # noqa
+from galaxy.datatypes import data, interval, sequence
+from galaxy.datatypes.util import line_scanner
+
+from .test_tabular import MockDataset
+
+FASTA = "#comment\n>seq1\nACGT\nAC\n\n>seq2 description\nGGGG\n>seq3\n"
+TEXT = "line 1\n#comment\n\n  \nline 2\r\nlast line"
+
+
+class SetMetaChunksTestCase( unittest.TestCase ):
+
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def test_chunks_match_set_meta( self ):
+        for datatype, contents in [ ( sequence.Fasta(), FASTA ), ( data.Text(), TEXT ) ]:
+            dataset = self._dataset( contents )
+            datatype.set_meta( dataset )
+            expected = dataset.metadata.__dict__
+            for chunk_size in range( 1, len( contents ) + 1 ):
+                dataset = self._dataset( contents )
+                ranges = line_scanner.byte_ranges( dataset.get_size(), chunk_size )
+                chunks = [ datatype.get_meta_chunk( dataset, start, end ) for start, end in ranges ]
+                datatype.set_meta_from_chunks( dataset, chunks )
+                assert dataset.metadata.__dict__ == expected, ( datatype, chunk_size )
+
+    def test_read_line_blocks( self ):
+        path = self._dataset( TEXT ).file_name
+        for chunk_size in range( 1, len( TEXT ) + 1 ):
+            lines = []
+            for start, end in line_scanner.byte_ranges( len( TEXT ), chunk_size ):
+                for block in line_scanner.read_line_blocks( path, start, end, block_size=4 ):
+                    lines.extend( block )
+            assert "".join( lines ) == TEXT, chunk_size
+
+    def test_can_set_meta_in_chunks( self ):
+        dataset = self._dataset( FASTA )
+        for datatype, expected in [ ( sequence.Fasta(), True ), ( data.Text(), True ), ( sequence.Fastq(), False ), ( interval.Bed(), False ), ( data.Data(), False ) ]:
+            datatype.set_meta_chunk_size = 4
+            assert datatype.can_set_meta_in_chunks( dataset ) == expected, datatype
+        datatype = sequence.Fasta()
+        datatype.set_meta_chunk_size = len( FASTA )
+        assert not datatype.can_set_meta_in_chunks( dataset )
+
+    def _dataset( self, contents ):
+        path = os.path.join( self.tmpdir, "dataset" )
+        with open( path, "w" ) as f:
+            f.write( contents )
+        return MockDataset( path )
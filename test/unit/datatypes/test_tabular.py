@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+# galaxy.model has to be imported before galaxy.datatypes
+from galaxy import model  # noqa
+from galaxy.datatypes import tabular
+from galaxy.util.bunch import Bunch
+
+
+class TabularSetMetaTestCase( unittest.TestCase ):
+
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def test_column_types( self ):
+        metadata = self._set_meta( "id\tscore\tnames\n#comment\nchr1\t1\ta,b\n\nchr2\t2.5\tc,d\nchr3\tNA\t\n" )
+        assert metadata.column_types == [ "str", "float", "list" ]
+        assert metadata.columns == 3
+        assert metadata.data_lines == 4
+        assert metadata.comment_lines == 2
+
+    def test_first_line_used_for_missing_columns( self ):
+        metadata = self._set_meta( "1\t1.5\tx\t7\n2\t3\n3\t4\n" )
+        assert metadata.column_types == [ "int", "int", "str", "int" ]
+
+    def test_skip( self ):
+        metadata = self._set_meta( "name\tvalue\na\t1\nb\t2\n", skip=1 )
+        assert metadata.column_types == [ "str", "int" ]
+        assert metadata.comment_lines == 1
+
+    def test_max_data_lines( self ):
+        contents = "".join( "%d\t%d\n" % ( i, i ) for i in range( 10 ) )
+        metadata = self._set_meta( contents, max_data_lines=5 )
+        assert metadata.data_lines is None
+        assert metadata.comment_lines is None
+        metadata = self._set_meta( contents, max_data_lines=10 )
+        assert metadata.data_lines == 10
+
+    def test_blocks( self ):
+        contents = "h1\th2\n" + "".join( "%d\t%d\n" % ( i, i ) for i in range( 100 ) ) + "1\tx\n"
+        for block_size in ( 1, 16, 2 ** 20 ):
+            metadata = self._set_meta( contents, set_meta_block_size=block_size )
+            assert metadata.column_types == [ "int", "str" ]
+            assert metadata.data_lines == 102
+
+    def _set_meta( self, contents, set_meta_block_size=None, **kwds ):
+        path = os.path.join( self.tmpdir, "dataset.tabular" )
+        with open( path, "w" ) as f:
+            f.write( contents )
+        datatype = tabular.Tabular()
+        if set_meta_block_size:
+            datatype.set_meta_block_size = set_meta_block_size
+        dataset = MockDataset( path )
+        datatype.set_meta( dataset, **kwds )
+        return dataset.metadata
+
+
+class MockDataset( object ):
+
+    def __init__( self, file_name ):
+        self.file_name = file_name
+        self.metadata = Bunch()
+
+    def has_data( self ):
+        return os.path.getsize( self.file_name ) > 0
+
+    def get_size( self ):
+        return os.path.getsize( self.file_name )
@@ -1,5 +1,9 @@
+import os
+import shutil
+import tempfile
 from unittest import TestCase
 from galaxy.util.bunch import Bunch
+from galaxy.jobs import output_checker
 from galaxy.jobs.output_checker import check_output
 from galaxy.jobs.error_level import StdioErrorLevel
 from galaxy.tools.parser.interface import ToolStdioRegex
@@ -20,6 +24,16 @@ class OutputCheckerTestCase( TestCase ):
         self.stdout = ''
         self.stderr = ''
         self.tool_exit_code = None
+        self.stdout_path = None
+        self.stderr_path = None
+        self.test_directory = tempfile.mkdtemp()
+        self.chunk_size = output_checker.CHUNK_SIZE
+        self.chunk_overlap = output_checker.CHUNK_OVERLAP
+
+    def tearDown( self ):
+        output_checker.CHUNK_SIZE = self.chunk_size
+        output_checker.CHUNK_OVERLAP = self.chunk_overlap
+        shutil.rmtree( self.test_directory )
 
     def test_default_no_stderr_success( self ):
         self.__assertSuccessful()
@@ -84,6 +98,42 @@ class OutputCheckerTestCase( TestCase ):
         self.stderr = "foobar"
         self.__assertSuccessful()
  
+    def test_stderr_file_scanned_beyond_truncated_stderr( self ):
+        self.__add_regex( Bunch( match=r'out of memory', stdout_match=False, stderr_match=True, error_level=StdioErrorLevel.FATAL, desc=None ) )
+        self.stderr = "start\n..\nend"
+        self.__assertSuccessful()
+        self.stderr_path = self.__write( "stderr", "start\n" + "x" * 100000 + "\nOut of memory\n" + "y" * 100000 + "\nend" )
+        self.__assertNotSuccessful()
+        assert self.job.stderr == "Fatal error: Matched on Out of memory\nstart\n..\nend"
+
+    def test_match_spanning_chunks( self ):
+        output_checker.CHUNK_SIZE = 16
+        output_checker.CHUNK_OVERLAP = 8
+        self.__add_regex( Bunch( match=r'error', stdout_match=True, stderr_match=False, error_level=StdioErrorLevel.FATAL, desc=None ) )
+        self.stdout_path = self.__write( "stdout", "a" * 13 + "error" + "b" * 30 )
+        self.__assertNotSuccessful()
+
+    def test_anchor_only_matches_start_of_file( self ):
+        output_checker.CHUNK_SIZE = 16
+        output_checker.CHUNK_OVERLAP = 8
+        self.__add_regex( Bunch( match=r'^b', stdout_match=True, stderr_match=False, error_level=StdioErrorLevel.FATAL, desc=None ) )
+        self.stdout_path = self.__write( "stdout", "a" * 20 + "b" * 40 )
+        self.__assertSuccessful()
+
+    def test_messages_up_to_first_fatal_match( self ):
+        self.__add_regex( Bunch( match=r'warn', stdout_match=False, stderr_match=True, error_level=StdioErrorLevel.WARNING, desc=None ) )
+        self.__add_regex( Bunch( match=r'fail', stdout_match=False, stderr_match=True, error_level=StdioErrorLevel.FATAL, desc=None ) )
+        self.__add_regex( Bunch( match=r'other', stdout_match=False, stderr_match=True, error_level=StdioErrorLevel.WARNING, desc=None ) )
+        self.stderr = "other fail warn"
+        self.stderr_path = self.__write( "stderr", self.stderr )
+        self.__assertNotSuccessful()
+        assert self.job.stderr == "Fatal error: Matched on fail\nWarning: Matched on warn\nother fail warn"
+
+    def __write( self, name, contents ):
+        path = os.path.join( self.test_directory, name )
+        open( path, "w" ).write( contents )
+        return path
+
     def __add_regex( self, regex ):
         self.tool.stdio_regexes.append( regex )
 
@@ -94,4 +144,4 @@ class OutputCheckerTestCase( TestCase ):
         self.assertFalse( self.__check_output() )
 
     def __check_output( self ):
-        return check_output( self.tool, self.stdout, self.stderr, self.tool_exit_code, self.job )
+        return check_output( self.tool, self.stdout, self.stderr, self.tool_exit_code, self.job, stdout_path=self.stdout_path, stderr_path=self.stderr_path )
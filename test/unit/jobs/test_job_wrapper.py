@@ -1,4 +1,7 @@
 import os
+import threading
+from shutil import rmtree
+from tempfile import mkdtemp
 from contextlib import contextmanager
 
 from unittest import TestCase
@@ -7,6 +10,9 @@ from galaxy.model import Task
 from galaxy.model import User
 from galaxy.jobs import JobWrapper
 from galaxy.jobs import TaskWrapper
+from galaxy.jobs import map_threaded
+from galaxy.jobs import OutputDatasetFiles
+from galaxy.objectstore import DiskObjectStore
 from galaxy.util.bunch import Bunch
 
 from galaxy.tools import evaluation
@@ -91,6 +97,43 @@ class TaskWrapperTestCase(BaseWrapperTestCase, TestCase):
             assert wrapper.write_version_cmd is None
 
 
+def test_map_threaded():
+    thread_names = set()
+
+    def square(x):
+        thread_names.add(threading.current_thread().name)
+        return x * x
+
+    assert map_threaded(square, range(10), 4) == [x * x for x in range(10)]
+    assert threading.current_thread().name not in thread_names
+    thread_names.clear()
+    # A single thread maps in the calling thread
+    assert map_threaded(square, range(3), 1) == [0, 1, 4]
+    assert thread_names == set([threading.current_thread().name])
+
+
+def test_output_dataset_files():
+    file_path = mkdtemp()
+    try:
+        object_store = DiskObjectStore(Bunch(umask=077, job_working_directory=file_path, new_file_path=file_path, object_store_check_old_style=False), file_path=file_path)
+        dataset = Bunch(id=1, object_store_id=None, external_filename=None, _extra_files_path=None, file_size=None)
+        output_file = OutputDatasetFiles(dataset, object_store)
+        object_store.create(output_file)
+        assert output_file.file_name == object_store.get_filename(dataset)
+        open(output_file.file_name, "w").write("12345")
+        assert output_file.calculate_size() == 5
+        assert output_file.calculate_extra_files_size() == 0
+
+        object_store.create(output_file, extra_dir="dataset_1_files", dir_only=True)
+        extra_files_path = object_store.get_filename(output_file, extra_dir="dataset_1_files", dir_only=True)
+        os.makedirs(os.path.join(extra_files_path, "sub"))
+        open(os.path.join(extra_files_path, "a"), "w").write("123")
+        open(os.path.join(extra_files_path, "sub", "b"), "w").write("1234")
+        assert output_file.calculate_extra_files_size() == 7
+    finally:
+        rmtree(file_path)
+
+
 class MockEvaluator(object):
 
     def __init__(self, app, tool, job, local_working_directory):
@@ -74,6 +74,23 @@ class TestLocalJobRunner( TestCase, UsesApp, UsesTools ):
         runner.queue_job( self.job_wrapper )
         assert os.path.exists( self.job_wrapper.mock_metadata_path )
 
+    def test_preparation_stage( self ):
+        self.app.config.job_preparation_workers = 1
+        self.app.config.job_preparation_queue_size = 0
+        runner = local.LocalJobRunner( self.app, 1 )
+        runner.put( self.job_wrapper )
+        for i in range( 500 ):
+            if hasattr( self.job_wrapper, "stdout" ):
+                break
+            time.sleep( .01 )
+        runner.shutdown()
+        assert self.job_wrapper.stdout.strip() == "HelloWorld"
+        # The job was prepared once, by the preparation thread
+        assert self.job_wrapper.prepare_threads == [ "LocalRunner.prepare_thread-0" ]
+        stage_stats = runner.get_stage_stats()
+        assert stage_stats[ "prepare" ][ "processed" ] == 1
+        assert stage_stats[ "submit" ][ "processed" ] == 1
+
     def test_stopping_job( self ):
         self.job_wrapper.command_line = '''python -c "import time; time.sleep(15)"'''
         runner = local.LocalJobRunner( self.app, 1 )
@@ -108,6 +125,7 @@ class MockJobWrapper( object ):
         self.command_line = "echo HelloWorld"
         self.commands_in_new_shell = False
         self.prepare_called = False
+        self.prepare_threads = []
         self.write_version_cmd = None
         self.dependency_shell_commands = None
         self.working_directory = working_directory
@@ -130,6 +148,7 @@ class MockJobWrapper( object ):
 
     def prepare( self ):
         self.prepare_called = True
+        self.prepare_threads.append( threading.current_thread().name )
 
     def set_job_destination( self, job_destination, external_id ):
         self.external_id = external_id
@@ -161,7 +180,9 @@ class MockJobWrapper( object ):
     def has_limits( self ):
         return False
 
-    def finish( self, stdout, stderr, exit_code ):
+    def finish( self, stdout, stderr, exit_code, stdout_path=None, stderr_path=None ):
+        self.stdout_path = stdout_path
+        self.stderr_path = stderr_path
         self.stdout = stdout
         self.stderr = stderr
         self.exit_code = exit_code
@@ -0,0 +1,60 @@
+import time
+
+from galaxy.jobs.runners import AsynchronousJobRunner, AsynchronousJobState
+from galaxy.util.bunch import Bunch
+
+
+class MockAsynchronousJobRunner( AsynchronousJobRunner ):
+    runner_name = "MockRunner"
+
+    def __init__( self, app ):
+        super( MockAsynchronousJobRunner, self ).__init__( app, 1 )
+        self.states = {}
+        self.checked = []
+
+    def check_watched_item( self, job_state ):
+        self.checked.append( job_state.job_id )
+        job_state.old_state = self.states.get( job_state.job_id, "queued" )
+        return job_state
+
+
+def _runner( max_interval ):
+    app = Bunch( config=Bunch( job_status_poll_max_interval=max_interval ), model=Bunch( context=None ) )
+    runner = MockAsynchronousJobRunner( app )
+    for job_id in ( "1", "2" ):
+        runner.watched.append( AsynchronousJobState( job_id=job_id ) )
+    return runner
+
+
+def test_every_job_checked_without_max_interval():
+    runner = _runner( 0 )
+    runner._check_due_watched_items()
+    runner._check_due_watched_items()
+    assert runner.checked == [ "1", "2", "1", "2" ]
+
+
+def test_unchanged_jobs_backed_off():
+    runner = _runner( 60 )
+    for job_state in runner.watched:
+        # Pretend the jobs have been sitting in the same state for 100 seconds
+        job_state.old_state = "queued"
+        job_state.last_state_change = time.time() - 100
+    runner._check_due_watched_items()
+    assert runner.checked == [ "1", "2" ]
+    for job_state in runner.watched:
+        assert job_state.next_check_time > time.time() + 5
+    runner._check_due_watched_items()
+    assert runner.checked == [ "1", "2" ]
+    assert len( runner.watched ) == 2
+
+
+def test_state_change_resets_interval():
+    runner = _runner( 60 )
+    for job_state in runner.watched:
+        job_state.old_state = "queued"
+        job_state.last_state_change = time.time() - 100
+    runner.states[ "2" ] = "running"
+    runner._check_due_watched_items()
+    intervals = dict( ( job_state.job_id, job_state.next_check_time - time.time() ) for job_state in runner.watched )
+    assert intervals[ "1" ] > 5
+    assert intervals[ "2" ] < 1
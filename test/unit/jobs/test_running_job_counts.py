@@ -0,0 +1,80 @@
+from galaxy import model
+from galaxy.model import mapping
+
+from galaxy.jobs.handler import RunningJobCounts
+
+QUEUED = model.Job.states.QUEUED
+RUNNING = model.Job.states.RUNNING
+RESUBMITTED = model.Job.states.RESUBMITTED
+OK = model.Job.states.OK
+
+
+def test_update_counts():
+    counts = RunningJobCounts( 60 )
+    counts.update( 1, 10, None, "cluster1", QUEUED )
+    counts.update( 2, 10, None, "local", QUEUED )
+    counts.update( 3, 11, None, "cluster1", QUEUED )
+    assert counts.user_job_count == { 10: 2, 11: 1 }
+    assert counts.user_job_count_per_destination == { 10: { "cluster1": 1, "local": 1 }, 11: { "cluster1": 1 } }
+    assert counts.total_job_count_per_destination == { "cluster1": 2, "local": 1 }
+
+    # Transitions between counted states don't change the counts
+    counts.update( 1, 10, None, "cluster1", RUNNING )
+    assert counts.user_job_count[ 10 ] == 2
+    assert counts.total_job_count_per_destination[ "cluster1" ] == 2
+
+    # Finished jobs are no longer counted
+    counts.update( 1, 10, None, "cluster1", OK )
+    assert counts.user_job_count[ 10 ] == 1
+    assert counts.user_job_count_per_destination[ 10 ][ "cluster1" ] == 0
+    assert counts.total_job_count_per_destination[ "cluster1" ] == 1
+
+
+def test_resubmitted_jobs_only_count_against_user():
+    counts = RunningJobCounts( 60 )
+    counts.update( 1, 10, None, "cluster1", RUNNING )
+    counts.update( 1, 10, None, "cluster1", RESUBMITTED )
+    assert counts.user_job_count[ 10 ] == 1
+    assert counts.total_job_count_per_destination[ "cluster1" ] == 0
+
+
+def test_destination_change():
+    counts = RunningJobCounts( 60 )
+    counts.update( 1, 10, None, "cluster1", QUEUED )
+    counts.update( 1, 10, None, "cluster2", QUEUED )
+    assert counts.user_job_count[ 10 ] == 1
+    assert counts.total_job_count_per_destination == { "cluster1": 0, "cluster2": 1 }
+
+
+def test_session_counts():
+    counts = RunningJobCounts( 60 )
+    counts.update( 1, None, 5, "local", QUEUED )
+    counts.update( 2, None, 5, "local", RUNNING )
+    assert counts.session_job_count[ 5 ] == 2
+    assert 5 not in counts.user_job_count
+    counts.update( 2, None, 5, "local", OK )
+    assert counts.session_job_count[ 5 ] == 1
+
+
+def test_reconcile():
+    app = mapping.init( "/tmp", "sqlite:///:memory:", create_tables=True )
+    sa_session = app.context
+    user = model.User( email="u1@example.com", password="pass1" )
+    sa_session.add( user )
+    for state, destination_id in [ ( QUEUED, "cluster1" ), ( RUNNING, "cluster1" ), ( RESUBMITTED, "local" ), ( OK, "local" ) ]:
+        job = model.Job()
+        job.user = user
+        job.state = state
+        job.destination_id = destination_id
+        sa_session.add( job )
+    sa_session.flush()
+
+    counts = RunningJobCounts( 60 )
+    assert counts.reconcile_due()
+    # Stale counts are replaced by the reconciliation
+    counts.update( 100, user.id, None, "local", QUEUED )
+    counts.reconcile( sa_session )
+    assert not counts.reconcile_due()
+    assert counts.user_job_count == { user.id: 3 }
+    assert counts.user_job_count_per_destination == { user.id: { "cluster1": 2 } }
+    assert counts.total_job_count_per_destination == { "cluster1": 2 }
@@ -436,6 +436,24 @@ class HDASerializerTestCase( HDATestCase ):
         self.log( 'serialized should jsonify well' )
         self.assertIsJsonifyable( serialized )
 
+    def test_serialize_many( self ):
+        hda1 = self._create_vanilla_hda()
+        owner = hda1.history.user
+        hda2 = self.hda_manager.create( history=hda1.history, dataset=self.dataset_manager.create() )
+        self.hda_manager.annotate( hda2, owner, 'an annotation' )
+        self.trans.sa_session.flush()
+        keys = [ 'id', 'annotation', 'tags', 'resubmitted', 'display_apps', 'display_types', 'visualizations' ]
+
+        self.log( 'serialize_many should serialize each item as serialize does' )
+        serialized = self.hda_serializer.serialize_many( [ hda1, hda2 ], keys=keys, user=owner )
+        self.assertEqual( serialized, [ self.hda_serializer.serialize( hda, keys, user=owner ) for hda in ( hda1, hda2 ) ] )
+        self.assertEqual( serialized[1][ 'annotation' ], 'an annotation' )
+
+        self.log( 'serialize_many should use views' )
+        serialized = self.hda_serializer.serialize_many( [ hda1, hda2 ], view='summary' )
+        for serialized_hda in serialized:
+            self.assertKeys( serialized_hda, self.hda_serializer.views[ 'summary' ] )
+
     def test_file_name_serializers( self ):
         hda = self._create_vanilla_hda()
         owner = hda.history.user
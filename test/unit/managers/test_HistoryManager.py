@@ -413,9 +413,10 @@ class HistorySerializerTestCase( BaseTestCase ):
         history1 = self.history_manager.create( name='history1', user=user2 )
 
         self.log( 'a history with no contents should be properly reflected in empty, etc.' )
-        keys = [ 'empty', 'count', 'state_ids', 'state_details', 'state', 'hdas' ]
+        keys = [ 'empty', 'count', 'state_ids', 'state_details', 'state_update_time', 'state', 'hdas' ]
         serialized = self.history_serializer.serialize( history1, keys )
         self.assertEqual( serialized[ 'state' ], 'new' )
+        self.assertEqual( serialized[ 'state_update_time' ], None )
         self.assertEqual( serialized[ 'empty' ], True )
         self.assertEqual( serialized[ 'count' ], 0 )
         self.assertEqual( sum( serialized[ 'state_details' ].values() ), 0 )
@@ -432,6 +433,7 @@ class HistorySerializerTestCase( BaseTestCase ):
         self.assertEqual( serialized[ 'count' ], 1 )
         self.assertEqual( serialized[ 'state_details' ][ 'ok' ], 1 )
         self.assertIsInstance( serialized[ 'state_ids' ][ 'ok' ], list )
+        self.assertDate( serialized[ 'state_update_time' ] )
         self.assertIsInstance( serialized[ 'hdas' ], list )
         self.assertIsInstance( serialized[ 'hdas' ][0], basestring )
 
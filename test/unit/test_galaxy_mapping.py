@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import unittest
 import galaxy.model.mapping as mapping
+from galaxy.model.orm.now import now
 import uuid
 
 
@@ -359,6 +360,155 @@ class MappingTests( unittest.TestCase ):
 
         assert contents_iter_names( ids=[ d1.id, d3.id ] ) == [ "1", "3" ]
 
+        assert contents_iter_names( min_hid=d2.hid ) == [ "2", "3", "4" ]
+        assert contents_iter_names( min_hid=d2.hid, max_hid=d3.hid ) == [ "2", "3" ]
+        assert contents_iter_names( limit=2 ) == [ "1", "2" ]
+        assert contents_iter_names( min_hid=d2.hid, limit=1 ) == [ "2" ]
+        assert contents_iter_names( types=[ "dataset", "dataset_collection" ], limit=3 ) == [ "1", "2", "3" ]
+        assert contents_iter_names( ids=[ d2.id, d3.id, d4.id ], max_in_filter_length=1, limit=2 ) == [ "2", "3" ]
+
+        since = now()
+        assert contents_iter_names( since=since ) == []
+        d3.name = "3a"
+        d1.dataset.state = model.Dataset.states.OK
+        self.session().flush()
+        assert contents_iter_names( since=since ) == [ "1", "3a" ]
+
+    def test_add_datasets( self ):
+        model = self.model
+        u = model.User( email="adddatasets@foo.bar.baz", password="password" )
+        h1 = model.History( name="AddDatasetsHistory1", user=u)
+        self.persist( u, h1, expunge=False )
+
+        d1 = self.new_hda( h1, name="1" )
+        self.session().flush()
+        datasets = [ model.HistoryDatasetAssociation( create_dataset=True, sa_session=model.session, name=name ) for name in [ "2", "3", "4" ] ]
+        h1.add_datasets( self.session(), datasets, genome_build="hg19", flush=True )
+        assert [ d.hid for d in datasets ] == [ d1.hid + 1, d1.hid + 2, d1.hid + 3 ]
+        assert all( d.id is not None and d.history == h1 for d in datasets )
+        assert h1.genome_build == "hg19"
+        # The reserved hids are not handed out again
+        d5 = self.new_hda( h1, name="5" )
+        assert d5.hid == d1.hid + 4
+
+    def test_dataset_state_summaries( self ):
+        model = self.model
+        states = model.Dataset.states
+        u = model.User( email="summaries@foo.bar.baz", password="password" )
+        h1 = model.History( name="SummariesHistory1", user=u )
+        h2 = model.History( name="SummariesHistory2", user=u )
+        self.persist( u, h1, h2, expunge=False )
+
+        def assert_summaries_current():
+            for history in self.query( model.History ).filter( model.History.id.in_( [ h1.id, h2.id ] ) ):
+                hdas = self.query( model.HistoryDatasetAssociation ).filter_by( history_id=history.id ).all()
+                for exclude_deleted in ( False, True ):
+                    for exclude_hidden in ( False, True ):
+                        expected = dict( ( state, 0 ) for state in states.values() )
+                        for hda in hdas:
+                            if not ( exclude_deleted and hda.deleted ) and not ( exclude_hidden and not hda.visible ):
+                                expected[ hda.state ] += 1
+                        counts = history.get_dataset_state_counts( exclude_deleted=exclude_deleted, exclude_hidden=exclude_hidden )
+                        self.assertEquals( counts, expected )
+
+        d1 = self.new_hda( h1, name="1" )
+        d2 = self.new_hda( h1, name="2", visible=False )
+        self.session().flush()
+        # building the summaries of h1, h2 has none
+        assert_summaries_current()
+        assert not self.query( model.HistoryDatasetStateSummary ).filter_by( history_id=h2.id ).count()
+
+        d1.state = states.OK
+        d3 = self.new_hda( h1, name="3", deleted=True )
+        d3.state = states.RUNNING
+        assert_summaries_current()
+
+        # changes to expired objects
+        self.session().expire_all()
+        d2.visible = True
+        d2.deleted = True
+        d1.dataset.state = states.ERROR
+        self.session().flush()
+        assert_summaries_current()
+
+        # a dataset shared by two histories, one without summaries yet
+        d4 = model.HistoryDatasetAssociation( dataset=d1.dataset, name="4", sa_session=model.session )
+        h2.add_dataset( d4 )
+        self.session().flush()
+        d1.dataset.state = states.PAUSED
+        d3.state = states.OK
+        self.session().flush()
+        assert_summaries_current()
+        d4.dataset.state = states.QUEUED
+        d4._state = states.FAILED_METADATA
+        self.session().flush()
+        assert_summaries_current()
+
+        # moving and deleting datasets
+        self.expunge()
+        d3 = self.query( model.HistoryDatasetAssociation ).get( d3.id )
+        d3.history = self.query( model.History ).get( h2.id )
+        self.session().delete( self.query( model.HistoryDatasetAssociation ).get( d2.id ) )
+        self.session().flush()
+        assert_summaries_current()
+        self.assertEquals( sum( self.query( model.History ).get( h2.id ).get_dataset_state_counts( exclude_deleted=False ).values() ), 2 )
+
+    def test_calculate_disk_usage( self ):
+        model = self.model
+        u = model.User( email="diskusage@foo.bar.baz", password="password" )
+        h1 = model.History( name="DiskUsageHistory1", user=u )
+        h2 = model.History( name="DiskUsageHistory2", user=u )
+        purged_history = model.History( name="DiskUsageHistory3", user=u )
+        purged_history.purged = True
+        self.persist( u, h1, h2, purged_history, expunge=False )
+
+        def new_hda_of_size( history, total_size, purged=False ):
+            hda = self.new_hda( history )
+            hda.purged = purged
+            hda.dataset.total_size = total_size
+            return hda
+
+        d1 = new_hda_of_size( h1, 1 )
+        new_hda_of_size( h1, 2, purged=True )
+        new_hda_of_size( h2, 4 )
+        new_hda_of_size( purged_history, 8 )
+        # a dataset in two histories counts once
+        h2.add_dataset( model.HistoryDatasetAssociation( dataset=d1.dataset, sa_session=model.session ) )
+        # library datasets don't count
+        library_hda = new_hda_of_size( h2, 16 )
+        self.persist( model.LibraryDatasetDatasetAssociation( dataset=library_hda.dataset, sa_session=model.session ) )
+        self.session().flush()
+
+        assert u.calculate_disk_usage() == 5
+
+    def test_accessible_dataset_ids( self ):
+        from galaxy.security import GalaxyRBACAgent
+        model = self.model
+        security_agent = GalaxyRBACAgent( model )
+        access_action = security_agent.permitted_actions.DATASET_ACCESS.action
+        manage_action = security_agent.permitted_actions.DATASET_MANAGE_PERMISSIONS.action
+        r1 = model.Role( name="AccessRole1" )
+        r2 = model.Role( name="AccessRole2" )
+        h = model.History( name="AccessHistory" )
+        self.persist( r1, r2, h, expunge=False )
+
+        public = self.new_hda( h ).dataset
+        manage_only = self.new_hda( h ).dataset
+        one_role = self.new_hda( h ).dataset
+        two_roles = self.new_hda( h ).dataset
+        self.persist(
+            model.DatasetPermissions( manage_action, manage_only, r2 ),
+            model.DatasetPermissions( access_action, one_role, r1 ),
+            model.DatasetPermissions( access_action, two_roles, r1 ),
+            model.DatasetPermissions( access_action, two_roles, r2 ),
+        )
+        dataset_ids = [ d.id for d in ( public, manage_only, one_role, two_roles ) ]
+
+        assert security_agent.accessible_dataset_ids( [], dataset_ids ) == set( [ public.id, manage_only.id ] )
+        assert security_agent.accessible_dataset_ids( [ r1.id ], dataset_ids ) == set( [ public.id, manage_only.id, one_role.id ] )
+        assert security_agent.accessible_dataset_ids( [ r1.id, r2.id ], dataset_ids ) == set( dataset_ids )
+        assert security_agent.accessible_dataset_ids( [ r2.id ], [ one_role.id ] ) == set()
+
     def test_workflows( self ):
         model = self.model
         user = model.User(
@@ -0,0 +1,76 @@
+import unittest
+
+import galaxy.model.mapping as mapping
+from galaxy.quota import QuotaAgent
+
+
+class QuotaAgentTestCase( unittest.TestCase ):
+
+    def setUp( self ):
+        self.model = mapping.init( "/tmp", "sqlite:///:memory:", create_tables=True )
+        self.sa_session = self.model.context
+        self.quota_agent = QuotaAgent( self.model )
+        self.user = self.model.User( email="quota@example.com", password="password" )
+        self.group = self.model.Group( name="quota_group" )
+        self.persist( self.user, self.group, self.model.UserGroupAssociation( self.user, self.group ) )
+
+    def test_default_quotas( self ):
+        assert self.quota_agent.get_quota( None ) is None
+        assert self.quota_agent.get_quota( self.user ) is None
+
+        self._add_default_quota( 'registered', 20 )
+        self._add_default_quota( 'unregistered', 10 )
+        assert self.quota_agent.get_quota( None ) == 10
+        assert self.quota_agent.get_quota( self.user ) == 20
+
+    def test_quotas( self ):
+        self._add_default_quota( 'registered', 20 )
+        user_quota = self._add_quota( self.model.UserQuotaAssociation, self.user, 30 )
+        assert self.quota_agent.get_quota( self.user ) == 30
+
+        # the highest '=' quota of the user's and their groups' is adjusted by '+' and '-' quotas
+        self._add_quota( self.model.GroupQuotaAssociation, self.group, 40 )
+        self._add_quota( self.model.GroupQuotaAssociation, self.group, 5, operation='+' )
+        self._add_quota( self.model.UserQuotaAssociation, self.user, 3, operation='-' )
+        assert self.quota_agent.get_quota( self.user ) == 42
+        assert self.quota_agent.get_quota( self.user, nice_size=True ) == '42 bytes'
+
+        # ... unless any of them is unlimited
+        user_quota.amount = None
+        self.persist( user_quota )
+        assert self.quota_agent.get_quota( self.user ) is None
+        assert self.quota_agent.get_quota( self.user, nice_size=True ) == 'unlimited'
+
+        # deleted quotas don't count
+        user_quota.deleted = True
+        self.persist( user_quota )
+        assert self.quota_agent.get_quota( self.user ) == 42
+
+    def test_cache_cleared_on_changes( self ):
+        self._add_quota( self.model.UserQuotaAssociation, self.user, 30 )
+        assert self.quota_agent.get_quota( self.user ) == 30
+        assert self.user.id in self.quota_agent._cache
+
+        self._add_quota( self.model.GroupQuotaAssociation, self.group, 40 )
+        assert self.quota_agent.get_quota( self.user ) == 40
+
+        for uga in self.user.groups:
+            self.sa_session.delete( uga )
+        self.sa_session.flush()
+        assert self.quota_agent.get_quota( self.user ) == 30
+
+    def _add_default_quota( self, default_type, amount ):
+        quota = self.model.Quota( name="default_%s" % default_type, amount=amount )
+        self.persist( quota )
+        self.quota_agent.set_default_quota( default_type, quota )
+        return quota
+
+    def _add_quota( self, association_class, item, amount, operation='=' ):
+        quota = self.model.Quota( name="quota_%s_%s" % ( operation, amount ), amount=amount, operation=operation )
+        self.persist( quota, association_class( item, quota ) )
+        return quota
+
+    def persist( self, *items ):
+        for item in items:
+            self.sa_session.add( item )
+        self.sa_session.flush()
@@ -6,6 +6,8 @@ from galaxy.tools import ToolOutput
 from galaxy.tools.actions import DefaultToolAction
 from galaxy.tools.actions import on_text_for_names
 from galaxy.tools.actions import determine_output_format
+from galaxy.tools.execute import execute
+from galaxy.util.bunch import Bunch
 from xml.etree.ElementTree import XML
 
 import tools_support
@@ -103,6 +105,49 @@ class DefaultToolActionTestCase( unittest.TestCase, tools_support.UsesApp, tools
         self.assertEquals( output[ "out1" ].name, "Output (moo)" )
         self.assertEquals( output[ "out2" ].name, "Output 2 (moo)" )
 
+    def test_flush_job_deferred( self ):
+        self._init_tool( TWO_OUTPUTS )
+        job, output = self.action.execute(
+            tool=self.tool,
+            trans=self.trans,
+            history=self.history,
+            incoming=dict( param1="moo" ),
+            flush_job=False,
+        )
+        assert job.id is None
+        assert not self.app.object_store.created_datasets
+        self.assertEquals( output[ "out2" ].hid, output[ "out1" ].hid + 1 )
+
+        self.app.model.context.flush()
+        self.action.create_output_files( self.trans, job )
+        created_datasets = self.app.object_store.created_datasets
+        self.assertEquals( created_datasets, [ output[ "out1" ].dataset, output[ "out2" ].dataset ] )
+        assert all( dataset.id is not None for dataset in created_datasets )
+        self.assertEquals( job.object_store_id, "mycoolid" )
+
+    def test_bulk_execute( self ):
+        self._init_tool( TWO_OUTPUTS )
+        queued = []
+        self.app.job_queue = Bunch( put=lambda job_id, tool_id: queued.append( job_id ) )
+        created_collections = []
+        self.app.dataset_collections_service = Bunch( create=lambda trans, **kwds: created_collections.append( kwds ) )
+        collection_info = Bunch( collections={}, structure=MockStructure( 2 ) )
+        execution_tracker = execute(
+            self.trans,
+            self.tool,
+            [ dict( param1="moo" ), dict( param1="cow" ) ],
+            self.history,
+            collection_info=collection_info,
+        )
+        jobs = execution_tracker.successful_jobs
+        self.assertEquals( len( jobs ), 2 )
+        self.assertEquals( queued, [ job.id for job in jobs ] )
+        assert all( job.object_store_id == "mycoolid" for job in jobs )
+        self.assertEquals( len( self.app.object_store.created_datasets ), 4 )
+        hids = sorted( dataset.hid for _, dataset in execution_tracker.output_datasets )
+        self.assertEquals( hids, range( hids[ 0 ], hids[ 0 ] + 4 ) )
+        self.assertEquals( len( created_collections ), 2 )
+
     def test_params_wrapped( self ):
         hda1 = self.__add_dataset()
         _, output = self._simple_execute(
@@ -229,18 +274,29 @@ class MockTrans( object ):
         pass
 
 
+class MockStructure( object ):
+
+    def __init__( self, size ):
+        self.size = size
+
+    def __len__( self ):
+        return self.size
+
+    def element_identifiers_for_outputs( self, trans, outputs ):
+        return dict( element_identifiers=[], collection_type="list" )
+
+
 class MockObjectStore( object ):
 
     def __init__( self ):
         self.created_datasets = []
-        self.first_create = True
         self.object_store_id = "mycoolid"
 
     def create( self, dataset ):
         self.created_datasets.append( dataset )
-        if self.first_create:
-            self.first_create = False
-            assert dataset.object_store_id is None
+        # The first dataset of each job is created in the default store, the
+        # others in the same store.
+        if dataset.object_store_id is None:
             dataset.object_store_id = self.object_store_id
         else:
             assert dataset.object_store_id == self.object_store_id
@@ -1,6 +1,8 @@
 from unittest import TestCase
 from xml.etree.ElementTree import XML
 
+from sqlalchemy import event
+
 from galaxy import model
 from galaxy.util import bunch
 from galaxy.tools.parameters import basic
@@ -164,3 +166,81 @@ class DatasetMatcherTestCase( TestCase, tools_support.UsesApp ):
             )
 
         return self._test_context
+
+
+class PersistedDatasetMatcherTestCase( TestCase, tools_support.UsesApp ):
+
+    def test_can_access_dataset( self ):
+        model = self.app.model
+        security_agent = self.app.security_agent
+        access_action = security_agent.permitted_actions.DATASET_ACCESS.action
+        r1 = model.Role( name="MatcherRole1" )
+        r2 = model.Role( name="MatcherRole2" )
+        h = model.History( name="MatcherHistory" )
+        self.persist( r1, r2, h )
+        public = self.new_hda( h )
+        accessible = self.new_hda( h )
+        private = self.new_hda( h )
+        self.persist(
+            model.DatasetPermissions( access_action, accessible.dataset, r1 ),
+            model.DatasetPermissions( access_action, private.dataset, r2 ),
+        )
+        hdas = [ public, accessible, private ]
+        expected = [ security_agent.can_access_dataset( [ r1 ], hda.dataset ) for hda in hdas ]
+        assert expected == [ True, True, False ]
+
+        matcher = self.new_matcher( [ r1 ] )
+        assert matcher.hda_accessible( public )
+        # The first lookup checked the whole history, the rest are answered
+        # without querying.
+        queries = self.count_queries()
+        assert [ matcher.hda_accessible( hda ) for hda in hdas ] == expected
+        assert queries == []
+
+    def setUp( self ):
+        self.setup_app( mock_model=False )
+        self.tool = bunch.Bunch(
+            app=self.app,
+            tool_type="default",
+        )
+
+    def tearDown( self ):
+        self.tear_down_app()
+
+    def new_hda( self, history ):
+        model = self.app.model
+        hda = history.add_dataset( model.HistoryDatasetAssociation( create_dataset=True, sa_session=model.context ) )
+        hda.dataset.state = model.Dataset.states.OK
+        self.persist( hda )
+        return hda
+
+    def new_matcher( self, roles ):
+        param = basic.DataToolParameter( self.tool, XML( '''<param name="data1" type="data" ext="txt" />''' ) )
+        return dataset_matcher.DatasetMatcher(
+            trans=bunch.Bunch(
+                app=self.app,
+                get_current_user_roles=lambda: roles,
+                get_current_user_role_ids=lambda: [ role.id for role in roles ],
+                workflow_building_mode=True,
+            ),
+            param=param,
+            value=[ ],
+            other_values={}
+        )
+
+    def count_queries( self ):
+        queries = []
+
+        def before_cursor_execute( conn, cursor, statement, parameters, context, executemany ):
+            queries.append( statement )
+
+        engine = self.app.model.engine
+        event.listen( engine, "before_cursor_execute", before_cursor_execute )
+        self.addCleanup( event.remove, engine, "before_cursor_execute", before_cursor_execute )
+        return queries
+
+    def persist( self, *objects ):
+        sa_session = self.app.model.context
+        for obj in objects:
+            sa_session.add( obj )
+        sa_session.flush()
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from galaxy.util import parse_xml_string
+from galaxy.tools.data import TabularToolDataTable
+
+TABLE_XML = """<table name="all_fasta" comment_char="#">
+    <columns>value, dbkey, name, path</columns>
+    <file path="%s" />
+</table>"""
+
+
+class TabularToolDataTableTestCase( unittest.TestCase ):
+
+    def setUp( self ):
+        self.temp_directory = tempfile.mkdtemp()
+        self.loc_path = os.path.join( self.temp_directory, "all_fasta.loc" )
+        self._write_loc( [ [ "hg19", "hg19", "Human (hg19)", "/data/hg19.fa" ],
+                           [ "hg19_female", "hg19", "Human (hg19) female", "/data/hg19_female.fa" ],
+                           [ "mm9", "mm9", "Mouse (mm9)", "/data/mm9.fa" ] ] )
+        self.table = TabularToolDataTable( parse_xml_string( TABLE_XML % self.loc_path ), self.temp_directory )
+
+    def tearDown( self ):
+        shutil.rmtree( self.temp_directory )
+
+    def test_get_entries( self ):
+        assert self.table.get_entries( 'dbkey', 'hg19', 'value' ) == [ 'hg19', 'hg19_female' ]
+        assert self.table.get_entries( 'dbkey', 'hg19', 'value', limit=1 ) == [ 'hg19' ]
+        assert self.table.get_entry( 'value', 'mm9', 'path' ) == '/data/mm9.fa'
+        assert self.table.get_entries( 'value', 'mm9', None ) == [ { 'value': 'mm9', 'dbkey': 'mm9', 'name': 'Mouse (mm9)', 'path': '/data/mm9.fa' } ]
+        assert self.table.get_entries( 'dbkey', 'rn4', 'value', default='missing' ) == 'missing'
+        assert self.table.get_entries( 'no_such_column', 'hg19', 'value' ) is None
+        assert self.table.get_entries( 'dbkey', 'hg19', 'no_such_column' ) is None
+
+    def test_get_entries_for_values( self ):
+        entries = self.table.get_entries_for_values( 'dbkey', [ 'hg19', 'mm9', 'rn4' ], 'path' )
+        assert entries == { 'hg19': [ '/data/hg19.fa', '/data/hg19_female.fa' ], 'mm9': [ '/data/mm9.fa' ], 'rn4': None }
+
+    def test_lookups_follow_changes( self ):
+        assert self.table.get_entries( 'dbkey', 'rn4', 'value' ) is None
+        self.table.add_entry( [ "rn4", "rn4", "Rat (rn4)", "/data/rn4.fa" ], persist=True )
+        assert self.table.get_entries( 'dbkey', 'rn4', 'value' ) == [ 'rn4' ]
+
+        self.table.remove_entry( [ "hg19_female", "hg19", "Human (hg19) female", "/data/hg19_female.fa" ] )
+        assert self.table.get_entries( 'dbkey', 'hg19', 'value' ) == [ 'hg19' ]
+
+        self._write_loc( [ [ "mm10", "mm10", "Mouse (mm10)", "/data/mm10.fa" ] ] )
+        self.table.reload_from_files()
+        assert self.table.get_entry( 'value', 'mm10', 'path' ) == '/data/mm10.fa'
+        assert self.table.get_entry( 'value', 'mm9', 'path' ) is None
+
+    def _write_loc( self, rows ):
+        with open( self.loc_path, "w" ) as f:
+            f.write( "#value\tdbkey\tname\tpath\n" )
+            for fields in rows:
+                f.write( "%s\n" % "\t".join( fields ) )
@@ -4,6 +4,7 @@ import os
 
 from galaxy.util import parse_xml
 from galaxy.tools.loader import template_macro_params, load_tool
+from galaxy.tools.loader_cache import load_tools_in_pool, ToolXmlCache
 
 def test_loader():
 
@@ -189,3 +190,73 @@ def test_loader():
         tag_el = xml.find("another").find("tag")
         value = tag_el.get('value')
         assert value == "The value.", value
+
+
+def test_loader_cache():
+    tool_directory = mkdtemp()
+    try:
+        tool_path = os.path.join(tool_directory, "tool.xml")
+        macros_path = os.path.join(tool_directory, "external.xml")
+        open(tool_path, "w").write('''
+<tool>
+    <expand macro="inputs" />
+    <macros>
+        <import>external.xml</import>
+    </macros>
+</tool>''')
+
+        def write_macros(input_name):
+            open(macros_path, "w").write('''
+<macros>
+    <macro name="inputs">
+        <inputs><param name="%s" /></inputs>
+    </macro>
+</macros>''' % input_name)
+        write_macros("input1")
+
+        cache = ToolXmlCache(os.path.join(tool_directory, "cache"))
+        assert cache.load_tool(tool_path).find("inputs/param").get("name") == "input1"
+        cache_path = cache._cache_path(tool_path)
+        assert os.path.exists(cache_path)
+
+        # Loaded from the cache by another cache instance (process).
+        cached = ToolXmlCache(os.path.join(tool_directory, "cache"))
+        assert cached._load_cached(tool_path, cache_path) is not None
+        dependencies = []
+        assert cached.load_tool(tool_path, dependencies).find("inputs/param").get("name") == "input1"
+        assert dependencies == [macros_path]
+
+        # Changing an imported macro file invalidates the cached tool.
+        write_macros("input_renamed")
+        assert cached._load_cached(tool_path, cache_path) is None
+        assert cached.load_tool(tool_path).find("inputs/param").get("name") == "input_renamed"
+    finally:
+        rmtree(tool_directory)
+
+
+def test_load_tools_in_pool():
+    tool_directory = mkdtemp()
+    try:
+        paths = []
+        for i in range(3):
+            path = os.path.join(tool_directory, "tool%d.xml" % i)
+            open(path, "w").write('''
+<tool id="tool%d">
+    <expand macro="inputs" />
+    <macros>
+        <macro name="inputs"><inputs /></macro>
+    </macros>
+</tool>''' % i)
+            paths.append(path)
+        broken_path = os.path.join(tool_directory, "broken.xml")
+        open(broken_path, "w").write("<tool>")
+
+        trees = load_tools_in_pool(paths + [broken_path], 2)
+        assert sorted(trees.keys()) == paths
+        for i, path in enumerate(paths):
+            tree, dependencies = trees[path]
+            assert tree.getroot().get("id") == "tool%d" % i
+            assert tree.find("inputs") is not None
+            assert dependencies == []
+    finally:
+        rmtree(tool_directory)
@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from galaxy.tools.search import ToolBoxSearch
+
+
+class ToolBoxSearchTestCase( unittest.TestCase ):
+
+    def setUp( self ):
+        self.temp_directory = tempfile.mkdtemp()
+        self.toolbox = MockToolbox()
+        self.add_tool( "cat1", "Concatenate datasets" )
+        self.add_tool( "sort1", "Sort data" )
+
+    def tearDown( self ):
+        shutil.rmtree( self.temp_directory )
+
+    def test_build_index( self ):
+        search = ToolBoxSearch( self.toolbox )
+        assert self.search( search, "concatenate" ) == [ "cat1" ]
+        assert self.search( search, "sort" ) == [ "sort1" ]
+        assert self.search( search, "help" ) == [ "cat1", "sort1" ]
+
+        self.log_renders()
+        search.build_index()
+        assert self.renders == [], "unchanged tools are not reindexed"
+
+    def test_update_tool( self ):
+        search = ToolBoxSearch( self.toolbox )
+        tool = self.add_tool( "grep1", "Select lines" )
+        assert self.search( search, "select" ) == []
+        search.update_tool( "grep1", tool )
+        assert self.search( search, "select" ) == [ "grep1" ]
+
+        search.update_tool( "grep1" )
+        assert self.search( search, "select" ) == []
+
+    def test_rebuild_after_removal( self ):
+        search = ToolBoxSearch( self.toolbox )
+        del self.toolbox.tools_by_id[ "sort1" ]
+        search.build_index()
+        assert self.search( search, "sort" ) == []
+        assert self.search( search, "concatenate" ) == [ "cat1" ]
+
+    def test_reindex_on_changed_macros( self ):
+        search = ToolBoxSearch( self.toolbox )
+        tool = self.toolbox.tools_by_id[ "cat1" ]
+        macros_path = os.path.join( self.temp_directory, "macros.xml" )
+        open( macros_path, "w" ).write( "<macros />" )
+        tool.config_file_dependencies = [ macros_path ]
+        search.build_index()
+
+        self.log_renders()
+        tool.name = "Join datasets"
+        os.utime( macros_path, ( 1, 1 ) )
+        search.build_index()
+        assert self.renders == [ "cat1" ]
+        assert self.search( search, "join" ) == [ "cat1" ]
+
+    def test_reopen_index_dir( self ):
+        index_dir = os.path.join( self.temp_directory, "index" )
+        ToolBoxSearch( self.toolbox, index_dir=index_dir )
+
+        self.log_renders()
+        search = ToolBoxSearch( self.toolbox, index_dir=index_dir )
+        assert self.renders == [], "tools indexed on disk are not reindexed"
+        assert self.search( search, "concatenate" ) == [ "cat1" ]
+
+    def test_searchers_in_use_stay_open( self ):
+        search = ToolBoxSearch( self.toolbox )
+        boosts = ( 9.0, 3.0, 2.0, 0.5 )
+        searcher = search._acquire_searcher( boosts )
+        search.update_tool( "grep1", self.add_tool( "grep1", "Select lines" ) )
+        new_searcher = search._acquire_searcher( boosts )
+        assert new_searcher is not searcher
+        # Replaced, but still in use.
+        assert not searcher.is_closed
+        search._release_searcher( searcher )
+        assert searcher.is_closed
+        search._release_searcher( new_searcher )
+        assert not new_searcher.is_closed
+        assert search._acquire_searcher( boosts ) is new_searcher
+
+    def add_tool( self, tool_id, name ):
+        config_file = os.path.join( self.temp_directory, "%s.xml" % tool_id )
+        open( config_file, "w" ).write( "<tool />" )
+        tool = MockTool( tool_id, name, config_file, self )
+        self.toolbox.tools_by_id[ tool_id ] = tool
+        return tool
+
+    def log_renders( self ):
+        self.renders = []
+
+    def search( self, search, q ):
+        return sorted( search.search( unicode( q ), 9, 3, 2, 0.5, 20 ) )
+
+
+class MockToolbox( object ):
+
+    def __init__( self ):
+        self.tools_by_id = {}
+
+    def tools( self ):
+        return self.tools_by_id.iteritems()
+
+
+class MockTool( object ):
+    tool_type = 'default'
+    version = '1.0.0'
+    description = ''
+
+    def __init__( self, tool_id, name, config_file, test_case ):
+        self.id = tool_id
+        self.name = name
+        self.config_file = config_file
+        self.config_file_dependencies = []
+        self.help = MockHelp( self, test_case )
+
+    def get_panel_section( self ):
+        return ( 'text', 'Text Manipulation' )
+
+
+class MockHelp( object ):
+
+    def __init__( self, tool, test_case ):
+        self.tool = tool
+        self.test_case = test_case
+
+    def render( self, **kwds ):
+        renders = getattr( self.test_case, "renders", None )
+        if renders is not None:
+            renders.append( self.tool.id )
+        return "Help for %s" % self.tool.name
@@ -2,7 +2,7 @@ import os
 import string
 import unittest
 
-from galaxy.tools import ToolBox
+from galaxy.tools import Tool, ToolBox
 from galaxy import model
 from galaxy.model import tool_shed_install
 from galaxy.model.tool_shed_install import mapping
@@ -373,6 +373,34 @@ class ToolBoxTestCase( BaseToolBoxTestCase ):
         self._add_config( """<toolbox><tool file="tool_v02.xml" /><tool file="tool_v02.xml" /></toolbox>""" )
         self.__verify_tool_panel_for_default_lineage()
 
+    def test_lazy_load_tools( self ):
+        self.app.config.lazy_load_tools = True
+        self.app.config.lazy_load_tools_cache_size = 1
+        self.__init_versioned_tools()
+        self._add_config( """<toolbox><tool file="tool_v01.xml" /><tool file="tool_v02.xml" /></toolbox>""" )
+        mapper = routes.Mapper()
+        mapper.connect( "tool_runner", "/test/tool_runner" )
+
+        # Listing tools doesn't build them.
+        as_dict = self.toolbox.to_dict( mock_trans(), in_panel=False )
+        assert as_dict[0]["id"] == "test_tool"
+        assert as_dict[0]["version"] == "0.2"
+        lazy_tools = self.toolbox._tool_versions_by_id[ "test_tool" ]
+        assert not lazy_tools[ "0.1" ].materialized
+        assert not lazy_tools[ "0.2" ].materialized
+
+        tool_v01 = self.toolbox.get_tool( "test_tool", tool_version="0.1" )
+        assert isinstance( tool_v01, Tool )
+        assert "param1" in tool_v01.inputs
+        assert lazy_tools[ "0.1" ].materialized
+
+        # Only the most recently used tool is kept built.
+        tool_v02 = self.toolbox.get_tool( "test_tool", tool_version="0.2" )
+        assert tool_v02.version == "0.2"
+        assert lazy_tools[ "0.2" ].materialized
+        assert not lazy_tools[ "0.1" ].materialized
+        assert self.toolbox.get_tool( "test_tool", tool_version="0.1" ) is not tool_v01
+
     def __init_versioned_tools( self ):
         self._init_tool( filename="tool_v01.xml", version="0.1" )
         self._init_tool( filename="tool_v02.xml", version="0.2" )
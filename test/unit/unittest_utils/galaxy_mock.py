@@ -106,7 +106,7 @@ class MockTrans( object ):
 
 class MockVisualizationsRegistry( object ):
 
-    def get_visualizations( self, trans, target ):
+    def get_visualizations( self, trans, target, datatype_classes=None ):
         return []
 
 